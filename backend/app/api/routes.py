@@ -1,10 +1,25 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
+import time
 import logging
 from ..services.ai_service import ai_service
 from ..services.analytics_service import analytics_service
+from ..services.anomaly_service import anomaly_service
 from ..services.zabbix_service import zabbix_service
+from ..services.problem_service import problem_service
+from ..services.context_service import context_service
+from ..services.correlation_service import correlation_service
+from ..services.executor_service import executor_service
+from ..services.cache_service import cache_service
+from ..services.response_cache_service import response_cache_service
+from ..services.host_index_service import host_index_service
+from ..services.session_service import session_service
+from ..services.llm_gateway_service import llm_gateway_service
+from ..services.metrics_service import metrics_service
 
 logger = logging.getLogger(__name__)
 
@@ -13,55 +28,134 @@ router = APIRouter()
 class ChatRequest(BaseModel):
     message: str
     context_filter: Optional[str] = None
+    # Continue a server-side session; a new one is created when missing or expired
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     reply: str
+    session_id: Optional[str] = None
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    # Fetch context from Zabbix to pass to AI
-    context = {}
-    
+async def build_chat_context(message):
+    """Fetch context from Zabbix and pack the parts relevant to the message into the token budget"""
     try:
-        # Get active problems
-        problems = zabbix_service.get_problems()
-        if problems:
-            context["active_problems_count"] = len(problems)
-            context["active_problems"] = []
-            for problem in problems[:10]:  # Limit to 10 most recent
-                context["active_problems"].append({
-                    "name": problem.get("name", "Unknown"),
-                    "severity": problem.get("severity", "0"),
-                    "age": problem.get("age", "Unknown"),
-                    "acknowledged": problem.get("acknowledged", "0")
-                })
-        
-        # Get hosts summary
-        hosts = zabbix_service.get_hosts()
-        if hosts:
-            context["total_hosts"] = len(hosts)
-            context["hosts_summary"] = []
-            for host in hosts[:5]:  # First 5 hosts
-                context["hosts_summary"].append({
-                    "name": host.get("name", "Unknown"),
-                    "status": "Enabled" if host.get("status") == "0" else "Disabled"
-                })
+        problems, total_hosts, hosts = await asyncio.gather(
+            executor_service.run_zabbix(problem_service.get_problems),
+            executor_service.run_zabbix(zabbix_service.count_hosts),
+            executor_service.run_zabbix(zabbix_service.get_hosts_page, limit=5)
+        )
+
+        def assemble():
+            anomalies = (anomaly_service.current() or {}).get("anomalies", [])
+            # Hosts named in the message come from the host index; the page only fills the rest
+            candidates = context_service.candidate_hosts(message)
+            known = {h["hostid"] for h in candidates}
+            ranked_hosts = candidates + [h for h in hosts if str(h.get("hostid")) not in known]
+            return context_service.build(message, problems, ranked_hosts, total_hosts, anomalies)
+
+        # Correlation and ranking are CPU work over every active problem; keep them off the event loop
+        return await executor_service.run_zabbix(assemble)
+    except asyncio.TimeoutError:
+        logger.error("Timed out fetching Zabbix context")
+        return {"error": "Could not connect to Zabbix: request timed out"}
     except Exception as e:
         logger.error(f"Error fetching Zabbix context: {e}")
-        context["error"] = f"Could not connect to Zabbix: {str(e)}"
+        return {"error": f"Could not connect to Zabbix: {str(e)}"}
+
+async def open_session(session_id):
+    """The chat session to continue or start; the lookup may hit SQLite, so it runs in the executor"""
+    if not session_service.enabled:
+        return None
+    return await executor_service.run_zabbix(session_service.get_or_create, session_id)
 
-    response = ai_service.chat(request.message, context)
-    return ChatResponse(reply=response)
+@router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    context = await build_chat_context(request.message)
+    session = await open_session(request.session_id)
+
+    try:
+        response = await executor_service.run_llm(ai_service.chat, request.message, context, session)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="AI service timed out")
+    return ChatResponse(reply=response, session_id=session["id"] if session else None)
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the agent reply as Server-Sent Events (token, tool_start, tool_result, error, done)"""
+    started = time.perf_counter()
+    context = await build_chat_context(request.message)
+    session = await open_session(request.session_id)
+
+    async def event_source():
+        try:
+            async for event in executor_service.stream_llm(ai_service.chat_stream, request.message, context, session):
+                if event["type"] == "done":
+                    if session:
+                        event = {**event, "session_id": session["id"]}
+                    # The Server-Timing header is sent before the body runs, so the breakdown rides here
+                    timing = metrics_service.request_timing(time.perf_counter() - started)
+                    if timing:
+                        event = {**event, "server_timing": timing}
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        except asyncio.TimeoutError:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'message': 'AI service timed out'})}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chat/sessions/{session_id}")
+def get_chat_session(session_id: str):
+    session = session_service.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {
+        "session_id": session["id"],
+        "created_at": session["created_at"],
+        "updated_at": session["updated_at"],
+        "summary": session["summary"],
+        "turns": session["turns"]
+    }
+
+@router.delete("/chat/sessions/{session_id}")
+def delete_chat_session(session_id: str):
+    session_service.delete(session_id)
+    return {"status": "success"}
 
 @router.get("/analytics/predictions")
 async def get_predictions():
-    return analytics_service.predict_failures()
+    return await executor_service.run_zabbix(analytics_service.predict_failures)
+
+@router.get("/analytics/anomalies")
+async def get_anomalies(limit: Optional[int] = None):
+    """Last published anomaly run; detection itself runs in the background job"""
+    return await executor_service.run_zabbix(anomaly_service.get_anomalies, limit)
+
+@router.get("/problems/groups")
+async def get_problem_groups(limit: Optional[int] = None):
+    """Active problems grouped into probable root-cause clusters"""
+    problems = await executor_service.run_zabbix(problem_service.get_problems)
+    # Correlating thousands of problems is CPU work; keep it off the event loop
+    clusters = await executor_service.run_zabbix(correlation_service.correlate, problems)
+    return {"problems": len(problems), "groups": len(clusters), "clusters": clusters[:limit] if limit else clusters}
 
 @router.get("/status")
 async def get_zabbix_status():
     try:
         # Check connection
-        hosts = zabbix_service.get_hosts()
-        return {"connected": True, "host_count": len(hosts)}
+        host_count = await executor_service.run_zabbix(zabbix_service.count_hosts)
+        return {"connected": True, "host_count": host_count}
+    except asyncio.TimeoutError:
+        return {"connected": False, "error": "Zabbix request timed out"}
     except Exception as e:
         return {"connected": False, "error": str(e)}
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    stats = cache_service.stats()
+    stats["llm_responses"] = response_cache_service.stats()
+    stats["host_index"] = host_index_service.stats()
+    stats["sessions"] = session_service.stats()
+    stats["llm_gateway"] = llm_gateway_service.stats()
+    return stats
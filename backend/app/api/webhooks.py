@@ -0,0 +1,64 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Header
+from pydantic import BaseModel, field_validator
+from typing import Optional
+from ..services.problem_service import problem_service
+
+router = APIRouter()
+
+# Zabbix severity names ({EVENT.SEVERITY}) to their numbers ({EVENT.NSEVERITY})
+SEVERITY_NAMES = {
+    "not classified": "0", "information": "1", "warning": "2",
+    "average": "3", "high": "4", "disaster": "5"
+}
+
+class ZabbixProblemEvent(BaseModel):
+    eventid: str
+    value: str = "1"  # 1 = problem, 0 = resolved
+    name: Optional[str] = None
+    severity: Optional[str] = None
+    acknowledged: Optional[str] = None
+    clock: Optional[str] = None
+    hostid: Optional[str] = None
+    host: Optional[str] = None
+
+    @field_validator("severity", mode="before")
+    @classmethod
+    def severity_number(cls, value):
+        """Severity as "0".."5"; Zabbix severity names are mapped to their numbers"""
+        if value is None:
+            return None
+        text = str(value).strip()
+        text = SEVERITY_NAMES.get(text.lower(), text)
+        if text not in {"0", "1", "2", "3", "4", "5"}:
+            raise ValueError("severity must be 0-5 or a Zabbix severity name")
+        return text
+
+    @field_validator("value", "acknowledged", mode="before")
+    @classmethod
+    def flag(cls, value):
+        if value is None:
+            return None
+        if str(value).strip() not in {"0", "1"}:
+            raise ValueError("must be 0 or 1")
+        return str(value).strip()
+
+    @field_validator("eventid", "clock", "hostid", mode="before")
+    @classmethod
+    def numeric_id(cls, value):
+        if value is None:
+            return None
+        if not str(value).strip().isdigit():
+            raise ValueError("must be numeric")
+        return str(value).strip()
+
+@router.post("/webhooks/zabbix")
+def zabbix_problem_webhook(event: ZabbixProblemEvent, x_webhook_token: Optional[str] = Header(None)):
+    """Receive problem events pushed by a Zabbix webhook media type"""
+    # Pushed problems end up in the agent's prompt, so the endpoint is closed without a token
+    if not problem_service.webhook_token:
+        raise HTTPException(status_code=403, detail="Webhook disabled: PROBLEM_WEBHOOK_TOKEN is not configured")
+    if not x_webhook_token or not hmac.compare_digest(x_webhook_token.encode(), problem_service.webhook_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+    problem_service.apply_webhook(event.model_dump())
+    return {"status": "success", "active_problems": problem_service.count()}
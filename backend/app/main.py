@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -33,6 +35,32 @@ def read_root():
 def health_check():
     return {"status": "ok"}
 
+from .services.metrics_service import metrics_service
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus exposition of the request, Zabbix, LLM, tool and config timings"""
+    return PlainTextResponse(metrics_service.render(), media_type="text/plain; version=0.0.4")
+
+if metrics_service.active:
+    @app.middleware("http")
+    async def record_request_timing(request: Request, call_next):
+        spans, token = metrics_service.start_request()
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            metrics_service.end_request(token)
+        elapsed = time.perf_counter() - start
+        if metrics_service.enabled:
+            # No route takes path parameters, so the path of a matched route is a bounded label
+            route = request.url.path if request.scope.get("route") else "unmatched"
+            metrics_service.histograms["http"].observe(elapsed, (route, request.method, str(response.status_code)))
+        # A streamed body has not run yet; /api/chat/stream sends its breakdown in the done event
+        if spans is not None and not response.headers.get("content-type", "").startswith("text/event-stream"):
+            response.headers["Server-Timing"] = metrics_service.server_timing(spans, elapsed)
+        return response
+
 # Mount static files (Frontend build)
 # We will create this directory later
 if os.path.exists("static"):
@@ -41,10 +69,52 @@ if os.path.exists("static"):
 from .api.routes import router as api_router
 from .api.summary import router as summary_router
 from .api.settings import router as settings_router
+from .api.webhooks import router as webhooks_router
 app.include_router(api_router, prefix="/api")
 app.include_router(summary_router, prefix="/api")
 app.include_router(settings_router, prefix="/api")
+app.include_router(webhooks_router, prefix="/api")
+
+from .services.executor_service import executor_service
+from .services.timeseries_service import timeseries_service
+from .services.summary_service import summary_service
+from .services.problem_service import problem_service
+from .services.zabbix_service import zabbix_service
+from .services.host_index_service import host_index_service
+from .services.anomaly_service import anomaly_service
+from .services.shared_state_service import shared_state_service
+
+@app.on_event("startup")
+async def start_background_jobs():
+    # With several workers, each job runs in the worker holding its lease
+    if problem_service.enabled:
+        executor_service.start_periodic("problem_sync", problem_service.sync_interval, problem_service.sync,
+                                        leader_only=True, follower=problem_service.follow)
+    if host_index_service.enabled:
+        executor_service.start_periodic("host_index_refresh", host_index_service.refresh_interval, zabbix_service.refresh_host_index,
+                                        leader_only=True, follower=host_index_service.follow)
+    executor_service.start_periodic("summary_refresh", summary_service.check_interval, summary_service.refresh,
+                                    timeout=executor_service.llm_timeout, leader_only=True)
+    if timeseries_service.enabled:
+        executor_service.start_periodic("timeseries_refresh", timeseries_service.refresh_interval, timeseries_service.refresh_tracked,
+                                        leader_only=True)
+    if anomaly_service.enabled:
+        executor_service.start_periodic("anomaly_detection", anomaly_service.interval, anomaly_service.detect,
+                                        leader_only=True)
+    if metrics_service.enabled and shared_state_service.shared:
+        # Every worker publishes its series so /metrics on any of them covers all workers
+        executor_service.start_periodic("metrics_publish", metrics_service.publish_interval, metrics_service.publish)
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executor_service.shutdown()
+    metrics_service.release_slot()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Workers are separate processes; they share state through SHARED_STATE_BACKEND
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,15 +1,108 @@
 import os
 import logging
-import json
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 from .zabbix_service import zabbix_service
 from .config_service import config_service
+from .response_cache_service import response_cache_service
+from .metrics_service import metrics_service
+from .session_service import session_service
+from .llm_gateway_service import llm_gateway_service
+from .llm_adapter_service import llm_adapter_service
 
 logger = logging.getLogger(__name__)
 
+# Tools that modify Zabbix, mapped to the argument naming their target.
+# Calls on the same target run one at a time; everything else runs in parallel.
+WRITE_TOOLS = {
+    "create_host": "host_name",
+    "acknowledge_problem": "event_id",
+    "schedule_maintenance": "host_id",
+    "update_host_status": "host_id",
+    # Bulk tools target a selection; they run one at a time
+    "acknowledge_problems": None,
+    "schedule_maintenance_bulk": None,
+    "update_hosts_status": None
+}
+
+# Model turns per chat before giving up (each tool round trip is one turn)
+MAX_TURNS = 5
+
+# Read-only tools whose results are reused within a chat session
+SESSION_CACHED_TOOLS = {"get_host_details", "get_templates", "get_host_groups"}
+
+# Chat session of the current request; copied into tool worker threads with the context
+_session = contextvars.ContextVar("chat_session", default=None)
+
+# Selector arguments shared by the bulk tools; all given selectors must match
+SELECTOR_PROPERTIES = {
+    "hosts": { "type": "array", "items": {"type": "string"}, "description": "Host IDs, names, hostnames or IPs." },
+    "host_group": { "type": "string", "description": "Host group name or ID." },
+    "tags": { "type": "array", "items": {"type": "string"}, "description": "Tags as 'tag' or 'tag:value': host tags for host actions, problem tags for problem actions." },
+    "severities": { "type": "array", "items": {"type": "integer"}, "description": "Problem severities 0-5 (5=Disaster)." }
+}
+
+BASE_SYSTEM_PROMPT = """You are a Senior Site Reliability Engineer (SRE) and Zabbix Expert AI Agent.
+Your goal is to Help the user manage their infrastructure proactively and intelligently.
+
+### PROTOCOLO DE ANÁLISIS DE HOST:
+Cuando el usuario te pida analizar un host o te proporcione datos de un servidor, SIEMPRE sigue este paso:
+
+1. **PROHIBIDO INVENTAR**: No asumas que el host está bien o mal basándote solo en el texto.
+2. **VERIFICAR ALERTAS REALES**: Usa la herramienta `get_host_details(name="Nombre_o_IP")` para consultar el estado real en Zabbix.
+   - Si la herramienta devuelve problemas (active_problems_count > 0), REPORTALOS con prioridad.
+   - Si no hay problemas, informalo explícitamente ("No detecto alertas activas en el sistema ahora mismo").
+
+### PROTOCOLO DE CREACIÓN DE HOST (Cuando el usuario pide crear un host):
+NO uses la herramienta `create_host` inmediatamente. Debes actuar como un ingeniero experto y entrevistar al usuario para configurar el host PERFECTAMENTE.
+Sigue estos pasos OBLIGATORIOS:
+
+1.  **Preguntar Sistema Operativo / Plataforma**: (Linux, Windows, Docker, Cisco...) para saber qué Templates son necesarios.
+2.  **Preguntar Método de Conexión**: Si no se especifica, preguntar si usar Agente Zabbix, SNMP, JMX o IPMI.
+3.  **Sugerir/Buscar Templates**: Usa la herramienta `get_templates` para buscar templates recomendados basados en su respuesta (ej. "Linux by Zabbix agent", "Windows by Zabbix agent").
+4.  **Confirmar Configuración**: Antes de ejecutar, resume: "Crearé host X con IP Y, usando template Z y conexión W. ¿Procedo?"
+
+SOLO cuando tengas toda esta info completa, ejecuta `create_host`.
+
+### RESPONSE STYLE:
+- Usa formato Markdown rico (headers, bold, lists).
+- Respuestas técnicas y precisas. 
+- Si faltan datos críticos, PREGUNTA.
+
+### TOOLS:
+- `get_templates`: Úsala proactivamente si el usuario menciona un SO pero no un template específico.
+- `create_host`: Úsala solo después de confirmar los detalles.
+- `get_host_details`: Úsala SIEMPRE que analices un host para ver si tiene alertas reales.
+- `acknowledge_problems`, `schedule_maintenance_bulk`, `update_hosts_status`: Úsalas cuando la acción afecte a VARIOS problemas o hosts (por grupo, tag, severidad o lista); una sola llamada en lugar de muchas.
+"""
+
+class ProviderSettings:
+    """Provider, credentials and models for one chat call, read from the config when the call starts"""
+    def __init__(self, config, prompt_caching):
+        self.provider = config.get("provider", "bedrock")
+        self.aws_region = config.get("aws_region", "us-east-1")
+        self.aws_access_key = config.get("aws_access_key")
+        self.aws_secret_key = config.get("aws_secret_key")
+        self.bedrock_model_id = config.get("bedrock_model_id", "us.anthropic.claude-3-5-sonnet-20241022-v2:0")
+        self.openai_api_key = config.get("openai_api_key")
+        self.openai_model = config.get("openai_model", "gpt-4o")
+        self.gemini_api_key = config.get("gemini_api_key")
+        self.gemini_model = config.get("gemini_model", "gemini-1.5-pro-latest")
+        self.prompt_caching = prompt_caching
+
 class AIService:
     def __init__(self):
-        self._load_config()
+        # Independent tool calls from one model turn are dispatched concurrently
+        self._tool_pool = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")), thread_name_prefix="tool")
+        # Striped locks: bounded memory, same target always maps to the same lock
+        self._target_locks = [threading.Lock() for _ in range(64)]
+        self._bulk_lock = threading.Lock()
+        # Per-request flag: did this chat run a write tool? (such replies are never cached)
+        self._turn = threading.local()
+        # Mark the static system prompt with cache_control (Anthropic models on Bedrock)
+        self.prompt_caching = os.getenv("PROMPT_CACHING_ENABLED", "True").lower() == "true"
         
         # Define available tools
         self.tools = [
@@ -87,6 +180,45 @@ class AIService:
                     "required": ["host_id", "status"]
                 }
             },
+            {
+                "name": "acknowledge_problems",
+                "description": "Acknowledge MANY problems in one call, selected by event IDs, hosts, host group, tags and/or severity. Prefer this over repeated acknowledge_problem calls.",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "event_ids": { "type": "array", "items": {"type": "string"}, "description": "Event IDs of the problems." },
+                        **SELECTOR_PROPERTIES,
+                        "message": { "type": "string", "description": "The comment or message to leave on the problems." },
+                        "include_acknowledged": { "type": "boolean", "description": "Also select problems already acknowledged. Default false." }
+                    },
+                    "required": ["message"]
+                }
+            },
+            {
+                "name": "schedule_maintenance_bulk",
+                "description": "Put MANY hosts into one maintenance window, selected by hosts, host group, tags and/or severity of their active problems.",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        **SELECTOR_PROPERTIES,
+                        "minutes": { "type": "integer", "description": "Duration of maintenance in minutes." },
+                        "description": { "type": "string", "description": "Reason for maintenance." }
+                    },
+                    "required": ["minutes"]
+                }
+            },
+            {
+                "name": "update_hosts_status",
+                "description": "Enable or disable monitoring for MANY hosts in one call, selected by hosts, host group, tags and/or severity of their active problems.",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        **SELECTOR_PROPERTIES,
+                        "status": { "type": "string", "enum": ["0", "1"], "description": "0 to Enable/Monitor, 1 to Disable/Stop Monitoring." }
+                    },
+                    "required": ["status"]
+                }
+            },
             {
                 "name": "get_host_details",
                 "description": "Get detailed status of a specific host, including its monitoring status and ACTIVE PROBLEMS.",
@@ -100,193 +232,209 @@ class AIService:
             }
         ]
 
-    def _load_config(self):
-        config = config_service.get_config()
-        self.provider = config.get("provider", "bedrock")
-        self.aws_region = config.get("aws_region", "us-east-1")
-        self.aws_access_key = config.get("aws_access_key")
-        self.aws_secret_key = config.get("aws_secret_key")
-        self.bedrock_model_id = config.get("bedrock_model_id", "us.anthropic.claude-3-5-sonnet-20241022-v2:0")
-        self.openai_api_key = config.get("openai_api_key")
-        self.openai_model = config.get("openai_model", "gpt-4o")
-        self.gemini_api_key = config.get("gemini_api_key")
-        self.gemini_model = config.get("gemini_model", "gemini-1.5-pro-latest")
+    def _settings(self):
+        """
+        Settings for one call. They are passed down the call instead of being stored
+        on this shared instance, so concurrent chats never see each other's config.
+        """
+        # In-memory copy; the file is only re-read when it changes
+        return ProviderSettings(config_service.get_config(), self.prompt_caching)
+
+    def chat(self, message: str, context: Dict[str, Any] = None, session: Dict[str, Any] = None) -> str:
+        settings = self._settings()
 
-    def chat(self, message: str, context: Dict[str, Any] = None) -> str:
-        self._load_config() # Reload config on every request to pick up changes
+        history = session_service.history(session) if session else []
+        context = self._with_session_summary(context, session)
+        # Replies that depend on earlier turns are not shared through the response cache
+        cache_scope = None if history else self._cache_scope(settings, context)
+        cached = response_cache_service.get(cache_scope, message) if cache_scope else None
+        if cached is not None:
+            if session:
+                session_service.record_turn(session, message, cached)
+            return cached
+        self._turn.wrote_zabbix = False
         
+        token = _session.set(session)
         try:
-            if self.provider == "bedrock":
-                return self._chat_bedrock(message, context)
-            elif self.provider == "openai":
-                return self._chat_openai(message, context)
-            elif self.provider == "gemini":
-                return self._chat_gemini(message, context)
-            else:
-                return f"Error: Unknown provider '{self.provider}'"
+            reply = ""
+            with llm_gateway_service.deadline():
+                for event in self._agent_loop(settings, message, context, history, stream=False):
+                    if event["type"] == "token":
+                        reply += event["text"]
+                    elif event["type"] == "error":
+                        return event["message"]
         except Exception as e:
-            logger.error(f"Chat Error ({self.provider}): {e}", exc_info=True)
-            return f"Error connecting to AI service ({self.provider}): {str(e)}"
+            logger.error(f"Chat Error ({settings.provider}): {e}", exc_info=True)
+            return f"Error connecting to AI service ({settings.provider}): {str(e)}"
+        finally:
+            _session.reset(token)
 
-    def _chat_bedrock(self, message: str, context: Dict[str, Any] = None) -> str:
-        if not os.getenv("BEDROCK_API_KEY") and not (self.aws_access_key and self.aws_secret_key):
-             return "AI Configuration Error: AWS credentials not configured."
+        if cache_scope and self._is_cacheable(reply):
+            response_cache_service.put(cache_scope, message, reply)
+        if session and not self._is_error(reply):
+            session_service.record_turn(session, message, reply)
+        return reply
 
-        import boto3
-        
-        # Configure Boto3 client
-        if self.aws_access_key and self.aws_secret_key:
-            bedrock_runtime = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=self.aws_region,
-                aws_access_key_id=self.aws_access_key,
-                aws_secret_access_key=self.aws_secret_key
-            )
-        elif os.getenv("BEDROCK_API_KEY"):
-             os.environ['AWS_BEARER_TOKEN_BEDROCK'] = os.getenv("BEDROCK_API_KEY")
-             bedrock_runtime = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=self.aws_region
-            )
-        else:
-             # Fallback to default credentials chain
-             bedrock_runtime = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=self.aws_region
-            )
-
-        system_prompt = self._build_system_prompt(context)
-        conversation = [{"role": "user", "content": message}]
-        
-        # Execution Loop
-        max_turns = 5
-        for _ in range(max_turns):
-            
-            response = bedrock_runtime.invoke_model(
-                modelId=self.bedrock_model_id,
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 2000,
-                    "temperature": 0.5,
-                    "system": system_prompt,
-                    "messages": conversation,
-                    "tools": self.tools
-                })
-            )
-            
-            response_body = json.loads(response['body'].read())
-            message_content = response_body['content']
-            
-            assistant_message = {"role": "assistant", "content": message_content}
-            conversation.append(assistant_message)
-            
-            stop_reason = response_body.get('stop_reason')
-            
-            if stop_reason == 'tool_use':
-                tool_results = []
-                
-                for block in message_content:
-                    if block['type'] == 'tool_use':
-                        tool_id = block['id']
-                        tool_name = block['name']
-                        tool_input = block['input']
-                        
-                        logger.info(f"Executing tool: {tool_name} with input: {tool_input}")
-                        result_content = self._execute_tool(tool_name, tool_input)
-                        
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": tool_id,
-                            "content": str(result_content)
-                        })
-                
-                conversation.append({
-                    "role": "user",
-                    "content": tool_results
-                })
-                continue
-            
-            else:
-                final_text = ""
-                for block in message_content:
-                    if block['type'] == 'text':
-                        final_text += block['text']
-                return final_text
-        
-        return "Error: Maximum conversation turns exceeded."
+    def _model_name(self, settings):
+        adapter = llm_adapter_service.get(settings.provider)
+        return adapter.model(settings) if adapter else ""
 
-    def _chat_openai(self, message: str, context: Dict[str, Any] = None) -> str:
-        if not self.openai_api_key:
-            return "AI Configuration Error: OpenAI API Key not configured."
+    def _cache_scope(self, settings, context):
+        return response_cache_service.scope(settings.provider, self._model_name(settings), self._build_system_prompt(context), context)
 
-        from openai import OpenAI
-        client = OpenAI(api_key=self.openai_api_key)
-        
-        system_prompt = self._build_system_prompt(context)
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message}
-        ]
-        
-        # Transform tools to OpenAI format
-        openai_tools = []
-        for tool in self.tools:
-            openai_tools.append({
-                "type": "function",
-                "function": {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "parameters": tool["input_schema"]
-                }
-            })
-
-        max_turns = 5
-        for _ in range(max_turns):
-            response = client.chat.completions.create(
-                model=self.openai_model,
-                messages=messages,
-                tools=openai_tools,
-                tool_choice="auto"
-            )
-            
-            response_message = response.choices[0].message
-            messages.append(response_message)
-            
-            if response_message.tool_calls:
-                for tool_call in response_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    logger.info(f"Executing tool: {function_name} with input: {function_args}")
-                    function_response = self._execute_tool(function_name, function_args)
-                    
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": str(function_response),
-                    })
+    def _is_error(self, reply):
+        return not reply or reply.startswith(("Error", "AI Configuration Error"))
+
+    def _is_cacheable(self, reply):
+        """Only cache real answers from turns that did not change anything in Zabbix"""
+        if getattr(self._turn, "wrote_zabbix", False):
+            return False
+        return not self._is_error(reply)
+
+    def _with_session_summary(self, context, session):
+        """Context with the digest of the session's older turns, for the system prompt"""
+        if not session or not session.get("summary"):
+            return context
+        return {**(context or {}), "conversation_summary": session["summary"]}
+
+    # === AGENT LOOP ===
+
+    def _agent_loop(self, settings, message, context, history, stream):
+        """
+        Provider-neutral agent loop: ask the model, run the tool calls it makes,
+        feed the results back, until it answers with text or MAX_TURNS is hit.
+        Provider formats are handled by the adapters in llm_adapter_service.
+        Yields the events documented on chat_stream(); when not streaming,
+        only the final answer is yielded as a single token event.
+        """
+        adapter = llm_adapter_service.get(settings.provider)
+        if adapter is None:
+            yield {"type": "error", "message": f"Error: Unknown provider '{settings.provider}'"}
+            return
+        error = adapter.check(settings)
+        if error:
+            yield {"type": "error", "message": error}
+            return
+
+        tools = llm_adapter_service.tools(settings.provider, self.tools)
+        state = adapter.start(settings, (BASE_SYSTEM_PROMPT, self._build_context_block(context)), history, message)
+        for _ in range(MAX_TURNS):
+            if stream:
+                turn = yield from adapter.stream(settings, state, tools)
             else:
-                return response_message.content
-
-        return "Error: Maximum conversation turns exceeded."
-
-    def _chat_gemini(self, message: str, context: Dict[str, Any] = None) -> str:
-         if not self.gemini_api_key:
-            return "AI Configuration Error: Gemini API Key not configured."
-         
-         # Note: Full tool use implementation for Gemini would go here. 
-         # For brevity, implementing basic chat for this iteration.
-         import google.generativeai as genai
-         
-         genai.configure(api_key=self.gemini_api_key)
-         model = genai.GenerativeModel(self.gemini_model)
-         
-         system_prompt = self._build_system_prompt(context)
-         full_prompt = f"System: {system_prompt}\nUser: {message}"
-         
-         response = model.generate_content(full_prompt)
-         return response.text
+                turn = adapter.complete(settings, state, tools)
+            if not turn["calls"]:
+                if not stream and turn["text"]:
+                    yield {"type": "token", "text": turn["text"]}
+                return
+            results = yield from self._run_tool_events([(call["name"], call["input"]) for call in turn["calls"]])
+            adapter.add_turn(state, turn, results)
+
+        yield {"type": "error", "message": "Error: Maximum conversation turns exceeded."}
+
+    # === STREAMING ===
+
+    def chat_stream(self, message: str, context: Dict[str, Any] = None, session: Dict[str, Any] = None):
+        """
+        Same agent loop as chat(), but yields events while it runs:
+        {"type": "token", "text"}, {"type": "tool_start", "name", "input"},
+        {"type": "tool_result", "name", "ok"}, {"type": "error", "message"} and
+        a final {"type": "done", "reply"} carrying the full answer.
+        """
+        settings = self._settings()
+
+        history = session_service.history(session) if session else []
+        context = self._with_session_summary(context, session)
+        cache_scope = None if history else self._cache_scope(settings, context)
+        cached = response_cache_service.get(cache_scope, message) if cache_scope else None
+        if cached is not None:
+            if session:
+                session_service.record_turn(session, message, cached)
+            yield {"type": "token", "text": cached}
+            yield {"type": "done", "reply": cached, "cached": True}
+            return
+        self._turn.wrote_zabbix = False
+
+        # Not reset with a token: the generator may be closed from another context
+        _session.set(session)
+        try:
+            reply = ""
+            failed = False
+            with llm_gateway_service.deadline():
+                for event in self._agent_loop(settings, message, context, history, stream=True):
+                    if event["type"] == "token":
+                        reply += event["text"]
+                    failed = failed or event["type"] == "error"
+                    yield event
+            if cache_scope and not failed and self._is_cacheable(reply):
+                response_cache_service.put(cache_scope, message, reply)
+            if session and not failed and reply:
+                session_service.record_turn(session, message, reply)
+            yield {"type": "done", "reply": reply}
+        except Exception as e:
+            logger.error(f"Chat Stream Error ({settings.provider}): {e}", exc_info=True)
+            yield {"type": "error", "message": f"Error connecting to AI service ({settings.provider}): {str(e)}"}
+        finally:
+            _session.set(None)
+
+    def _run_tool_events(self, calls):
+        """Execute one turn's tool calls, yielding progress events; the generator returns the results"""
+        for name, args in calls:
+            yield {"type": "tool_start", "name": name, "input": args}
+        results = self._execute_tools(calls)
+        for (name, args), result in zip(calls, results):
+            ok = not (isinstance(result, str) and result.startswith(("Tool Execution Error", "Unknown tool")))
+            yield {"type": "tool_result", "name": name, "ok": ok}
+        return results
+
+    def _execute_tools(self, calls):
+        """Run the (name, args) tool calls of one model turn concurrently; results keep the call order"""
+        if any(name in WRITE_TOOLS for name, _ in calls):
+            self._turn.wrote_zabbix = True
+        if len(calls) == 1:
+            return [self._execute_tool_serialized(*calls[0])]
+        # Copy the request context so tool spans are attributed to this request
+        futures = [self._tool_pool.submit(contextvars.copy_context().run, self._execute_tool_serialized, name, args)
+                   for name, args in calls]
+        return [future.result() for future in futures]
+
+    def _execute_tool_serialized(self, name, args):
+        session = _session.get()
+        if session is not None and name in SESSION_CACHED_TOOLS:
+            cached = session_service.cached_tool_result(session, name, args)
+            if cached is not None:
+                logger.info(f"Tool {name} answered from the session cache")
+                return cached
+
+        logger.info(f"Executing tool: {name} with input: {args}")
+        with metrics_service.span("tool", name):
+            result = self._execute_tool_locked(name, args)
+
+        if session is not None:
+            if name in WRITE_TOOLS:
+                session_service.clear_tool_cache(session)  # earlier lookups may be stale now
+            elif name in SESSION_CACHED_TOOLS and not (isinstance(result, str) and result.startswith("Tool Execution Error")):
+                session_service.cache_tool_result(session, name, args, result)
+        return result
+
+    def _execute_tool_locked(self, name, args):
+        if name not in WRITE_TOOLS:
+            return self._execute_tool(name, args)
+        target_arg = WRITE_TOOLS[name]
+        if target_arg is None:
+            with self._bulk_lock:
+                return self._execute_tool(name, args)
+
+        target = str(args.get(target_arg, "")).strip().lower()
+        if target_arg == "host_id" and target and not target.isdigit():
+            # Resolve names so "web01" and its host ID share a lock
+            try:
+                target = zabbix_service.get_host_id_by_name(args[target_arg]) or target
+            except Exception:
+                pass
+        lock = self._target_locks[hash((target_arg, target)) % len(self._target_locks)]
+        with lock:
+            return self._execute_tool(name, args)
 
     def _execute_tool(self, name, args):
         try:
@@ -318,49 +466,44 @@ class AIService:
                 return zabbix_service.update_host_status(
                     args['host_id'], args['status']
                 )
+            elif name == "acknowledge_problems":
+                return zabbix_service.acknowledge_problems(
+                    args['message'],
+                    event_ids=args.get('event_ids'),
+                    unacknowledged_only=not args.get('include_acknowledged', False),
+                    **self._selectors(args)
+                )
+            elif name == "schedule_maintenance_bulk":
+                return zabbix_service.schedule_maintenance_bulk(
+                    args['minutes'], args.get('description', 'AI Agent Maintenance'), **self._selectors(args)
+                )
+            elif name == "update_hosts_status":
+                return zabbix_service.update_hosts_status(args['status'], **self._selectors(args))
             else:
                 return f"Unknown tool: {name}"
         except Exception as e:
             return f"Tool Execution Error: {str(e)}"
 
-    def _build_system_prompt(self, context):
-        base_prompt = """You are a Senior Site Reliability Engineer (SRE) and Zabbix Expert AI Agent.
-Your goal is to Help the user manage their infrastructure proactively and intelligently.
-
-### PROTOCOLO DE ANÁLISIS DE HOST:
-Cuando el usuario te pida analizar un host o te proporcione datos de un servidor, SIEMPRE sigue este paso:
-
-1. **PROHIBIDO INVENTAR**: No asumas que el host está bien o mal basándote solo en el texto.
-2. **VERIFICAR ALERTAS REALES**: Usa la herramienta `get_host_details(name="Nombre_o_IP")` para consultar el estado real en Zabbix.
-   - Si la herramienta devuelve problemas (active_problems_count > 0), REPORTALOS con prioridad.
-   - Si no hay problemas, informalo explícitamente ("No detecto alertas activas en el sistema ahora mismo").
-
-### PROTOCOLO DE CREACIÓN DE HOST (Cuando el usuario pide crear un host):
-NO uses la herramienta `create_host` inmediatamente. Debes actuar como un ingeniero experto y entrevistar al usuario para configurar el host PERFECTAMENTE.
-Sigue estos pasos OBLIGATORIOS:
-
-1.  **Preguntar Sistema Operativo / Plataforma**: (Linux, Windows, Docker, Cisco...) para saber qué Templates son necesarios.
-2.  **Preguntar Método de Conexión**: Si no se especifica, preguntar si usar Agente Zabbix, SNMP, JMX o IPMI.
-3.  **Sugerir/Buscar Templates**: Usa la herramienta `get_templates` para buscar templates recomendados basados en su respuesta (ej. "Linux by Zabbix agent", "Windows by Zabbix agent").
-4.  **Confirmar Configuración**: Antes de ejecutar, resume: "Crearé host X con IP Y, usando template Z y conexión W. ¿Procedo?"
+    def _selectors(self, args):
+        return {key: args.get(key) for key in SELECTOR_PROPERTIES}
 
-SOLO cuando tengas toda esta info completa, ejecuta `create_host`.
-
-### RESPONSE STYLE:
-- Usa formato Markdown rico (headers, bold, lists).
-- Respuestas técnicas y precisas. 
-- Si faltan datos críticos, PREGUNTA.
+    def _build_context_block(self, context):
+        """Dynamic part of the system prompt; kept separate so the static part can be cached by the provider"""
+        if not context:
+            return ""
+        block = ""
+        if context.get('context_text'):
+            block = f"### CURRENT ZABBIX CONTEXT:\n{context['context_text']}"
+        elif context.get('active_problems_count'):
+            block = f"Context: {context.get('active_problems_count')} active problems."
+        if context.get('conversation_summary'):
+            block += f"\n\n### EARLIER IN THIS CONVERSATION:\n{context['conversation_summary']}"
+        return block.strip()
 
-### TOOLS:
-- `get_templates`: Úsala proactivamente si el usuario menciona un SO pero no un template específico.
-- `create_host`: Úsala solo después de confirmar los detalles.
-- `get_host_details`: Úsala SIEMPRE que analices un host para ver si tiene alertas reales.
-"""
-        
-        if context:
-            if context.get('active_problems_count'):
-                base_prompt += f"\n\nContext: {context.get('active_problems_count')} active problems."
-        
-        return base_prompt
+    def _build_system_prompt(self, context):
+        context_block = self._build_context_block(context)
+        if context_block:
+            return BASE_SYSTEM_PROMPT + "\n\n" + context_block
+        return BASE_SYSTEM_PROMPT
 
 ai_service = AIService()
@@ -1,59 +1,156 @@
+import os
+import re
+import time
 import logging
 import numpy as np
 from .zabbix_service import zabbix_service
+from .cache_service import cache_service
 
 logger = logging.getLogger(__name__)
 
+# Capacity metrics to forecast. direction=-1: the value falls towards the
+# threshold (free space), direction=1: it rises towards it (utilization).
+FORECAST_METRICS = [
+    {
+        "key": "vfs.fs.size[*,pfree]",
+        "threshold": 5.0,
+        "direction": -1,
+        "recommendation": "Expand the volume or clean up old files and logs."
+    },
+    {
+        "key": "vm.memory.size[pavailable]",
+        "threshold": 5.0,
+        "direction": -1,
+        "recommendation": "Check for memory leaks or restart the offending service."
+    },
+    {
+        "key": "vm.memory.utilization",
+        "threshold": 95.0,
+        "direction": 1,
+        "recommendation": "Check for memory leaks or restart the offending service."
+    },
+    {
+        "key": "system.cpu.util",
+        "threshold": 95.0,
+        "direction": 1,
+        "recommendation": "Review the workload on this host or add CPU capacity."
+    }
+]
+
+def _key_regex(pattern):
+    return re.compile(re.escape(pattern).replace(r"\*", ".*"))
+
+def fit_linear_trends(matrix, x):
+    """
+    Least-squares line for every row of `matrix` (items x buckets, NaN = no data)
+    against the shared bucket positions `x`, in one vectorized pass.
+    Returns (slope, intercept, points) arrays, one entry per row.
+    """
+    mask = ~np.isnan(matrix)
+    y = np.where(mask, matrix, 0.0)
+    xm = np.where(mask, x, 0.0)
+
+    n = mask.sum(axis=1)
+    sx = xm.sum(axis=1)
+    sy = y.sum(axis=1)
+    sxx = (xm * xm).sum(axis=1)
+    sxy = (xm * y).sum(axis=1)
+
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denominator != 0, (n * sxy - sx * sy) / denominator, 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, np.nan)
+    return slope, intercept, n
+
 class AnalyticsService:
     def __init__(self):
-        pass
+        self.window_days = int(os.getenv("FORECAST_WINDOW_DAYS", "7"))
+        self.horizon_days = int(os.getenv("FORECAST_HORIZON_DAYS", "14"))
+        self.min_points = int(os.getenv("FORECAST_MIN_POINTS", "24"))
+        self.max_results = int(os.getenv("FORECAST_MAX_RESULTS", "50"))
+        self.bucket_seconds = 3600  # trend.get resolution
+        self.prediction_cache = cache_service.create("analytics_predictions", int(os.getenv("FORECAST_CACHE_TTL", "300")))
 
     def predict_failures(self):
         """
         Analyze key metrics (CPU, Memory, Disk) for all hosts and predict potential failures.
         Returns a list of warnings.
         """
-        predictions = []
         try:
-            hosts = zabbix_service.get_hosts()
-            for host in hosts:
-                # Mock logic: fetch dummy history or specific key 
-                # In real scenario: iterate items with 'vfs.fs.size', 'system.cpu.load', etc.
-                
-                # For demonstration, we just return a sample prediction if host name contains certain string
-                # or random logic.
-                pass
-                
-                # Real logic example:
-                # items = zabbix_service.get_host_items(host['hostid'])
-                # disk_items = [i for i in items if 'vfs.fs.size' in i['key_'] and 'pfree' in i['key_']]
-                # for item in disk_items:
-                #     history = zabbix_service.get_history(item['itemid'])
-                #     if self._detect_trend_downwards(history):
-                #          predictions.append({...})
-            
-            # Returning mock data for UI visualization so the user sees something immediately
-            predictions.append({
-                "host": "Database Server Primary",
-                "service": "Disk Space /var/lib/mysql",
-                "severity": "High",
-                "prediction": "Will run out of space in 4 days based on current growth rate.",
-                "recommendation": "Expand volume or clean logs."
-            })
+            return self.prediction_cache.get_or_load("all", self._compute_predictions)
+        except Exception as e:
+            logger.error(f"Analytics error: {e}")
+            return []
+
+    def _compute_predictions(self):
+        now = int(time.time())
+        items = zabbix_service.get_items_by_keys([m["key"] for m in FORECAST_METRICS])
+
+        # Attach each item to the metric whose key pattern it matches
+        patterns = [(_key_regex(m["key"]), m) for m in FORECAST_METRICS]
+        tracked = []
+        for item in items:
+            for regex, metric in patterns:
+                if regex.fullmatch(item["key_"]):
+                    tracked.append((item, metric))
+                    break
+        if not tracked:
+            return []
 
+        series = zabbix_service.get_trends([item["itemid"] for item, _ in tracked], now - self.window_days * 86400, now)
+        forecast = self.forecast(series["item_index"], series["clock"], series["value"], len(tracked), now,
+                                 thresholds=np.array([m["threshold"] for _, m in tracked]),
+                                 directions=np.array([m["direction"] for _, m in tracked]))
+
+        predictions = []
+        for i in forecast["order"]:
+            item, metric = tracked[i]
+            hours = forecast["hours_to_threshold"][i]
             predictions.append({
-                "host": "Web Node 01",
-                "service": "Memory Usage",
-                "severity": "Medium",
-                "prediction": "Memory leaks detected. Trend shows 99% usage will be hit in 12 hours.",
-                "recommendation": "Restart service apache2."
+                "host": item["hosts"][0]["name"] if item.get("hosts") else item["hostid"],
+                "service": item["name"],
+                "severity": "High" if hours < 48 else "Medium" if hours < 7 * 24 else "Low",
+                "prediction": f"Will reach {metric['threshold']:g}{item.get('units') or ''} in {self._format_eta(hours)} "
+                              f"based on the {self.window_days}-day trend "
+                              f"(currently {forecast['current'][i]:.1f}{item.get('units') or ''}).",
+                "recommendation": metric["recommendation"]
             })
-            
-        except Exception as e:
-            logger.error(f"Analytics error: {e}")
-            
         return predictions
 
+    def forecast(self, item_index, clock, value, n_items, now, thresholds, directions):
+        """
+        Vectorized time-to-threshold for every item at once.
+        Series arrive as columns (item_index, clock, value) and are bucketed into
+        an items x hours matrix; one least-squares pass gives every slope.
+        Returns indices of items crossing their threshold within the horizon,
+        soonest first, with the hours left and the fitted current value.
+        """
+        n_buckets = self.window_days * 86400 // self.bucket_seconds
+        start = now - n_buckets * self.bucket_seconds
+
+        matrix = np.full((n_items, n_buckets), np.nan)
+        column = (clock - start) // self.bucket_seconds
+        valid = (column >= 0) & (column < n_buckets)
+        matrix[item_index[valid], column[valid]] = value[valid]
+
+        # Bucket positions in hours relative to now, so the intercept is the current value
+        x = (np.arange(n_buckets) * self.bucket_seconds + start - now) / 3600.0
+        slope, current, points = fit_linear_trends(matrix, x)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hours = (thresholds - current) / slope
+        approaching = (slope * directions > 0) & (directions * (thresholds - current) > 0)
+        candidates = approaching & (points >= self.min_points) & (hours <= self.horizon_days * 24)
+
+        order = np.flatnonzero(candidates)
+        order = order[np.argsort(hours[order])][:self.max_results]
+        return {"order": order, "hours_to_threshold": hours, "current": current, "slope": slope}
+
+    def _format_eta(self, hours):
+        if hours < 48:
+            return f"{max(1, int(round(hours)))} hours"
+        return f"{int(round(hours / 24))} days"
+
     def _detect_trend_downwards(self, history):
         # Linear regression logic
         if not history or len(history) < 10:
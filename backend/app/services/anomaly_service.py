@@ -0,0 +1,340 @@
+import os
+import time
+import logging
+import threading
+import warnings
+import numpy as np
+from .zabbix_service import zabbix_service
+from .timeseries_service import timeseries_service
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+# Robust z-scores: MAD * 1.4826 estimates the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+# CPU, memory, disk and network items of the stock Linux/Windows templates
+DEFAULT_KEYS = ("system.cpu.util*,system.cpu.load*,vm.memory.util*,vm.memory.size[pavailable],"
+                "vfs.fs.size[*,pused],vfs.fs.dependent.size[*,pused],net.if.in[*],net.if.out[*]")
+
+def _quiet_nanmedian(values, axis):
+    """nanmedian without the all-NaN slice warnings (items with no history)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmedian(values, axis=axis)
+
+def bucket_columns(item_index, clock, value, n_rows, n_buckets, start, bucket_seconds):
+    """
+    Average columnar series (item_index, clock, value) into an n_rows x n_buckets
+    matrix of bucket means starting at `start` (NaN = no data). Works for hourly
+    trends (one row per bucket) and raw history alike.
+    """
+    matrix = np.full((n_rows, n_buckets), np.nan)
+    column = (clock - start) // bucket_seconds
+    valid = (column >= 0) & (column < n_buckets)
+    flat = item_index[valid].astype(np.int64) * n_buckets + column[valid]
+    sums = np.bincount(flat, weights=value[valid], minlength=n_rows * n_buckets)
+    counts = np.bincount(flat, minlength=n_rows * n_buckets)
+    filled = counts > 0
+    matrix.reshape(-1)[filled] = sums[filled] / counts[filled]
+    return matrix
+
+def score_window(matrix, score_from, period, min_points):
+    """
+    Score columns score_from.. of `matrix` (items x buckets) against the
+    history before them, all items at once:
+      - rolling z-score (mean/std of the history),
+      - robust z-score (median/MAD of the history),
+      - seasonal z-score (median/MAD of the same bucket `period` columns back,
+        i.e. the same hour on previous days), when at least 3 days exist.
+    The anomaly score is the seasonal score where a season exists (so a value
+    normal overall but unusual for its time of day is flagged), else the
+    robust score. Returns a dict of items x scored-columns arrays.
+    """
+    history = matrix[:, :score_from]
+    current = matrix[:, score_from:]
+    points = np.count_nonzero(~np.isnan(history), axis=1)
+
+    median = _quiet_nanmedian(history, axis=1)
+    mad = _quiet_nanmedian(np.abs(history - median[:, None]), axis=1)
+    # Floor the spread so flat series (always 0, always 100) do not divide by zero
+    floor = np.maximum(np.abs(np.nan_to_num(median)) * 0.01, 1e-6)
+    robust_scale = np.maximum(mad * MAD_SCALE, floor)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(history, axis=1)
+        std = np.nanstd(history, axis=1)
+    zscore = (current - mean[:, None]) / np.maximum(std, floor)[:, None]
+    robust = (current - median[:, None]) / robust_scale[:, None]
+
+    # Same bucket on each previous day: items x scored columns x days
+    columns = np.arange(score_from, matrix.shape[1])
+    lags = columns[:, None] - period * np.arange(1, score_from // period + 1)[None, :]
+    if lags.shape[1]:
+        same_hour = matrix[:, np.clip(lags, 0, None)]
+        same_hour[:, (lags < 0) | (lags >= score_from)] = np.nan
+        seasonal_median = _quiet_nanmedian(same_hour, axis=2)
+        seasonal_mad = _quiet_nanmedian(np.abs(same_hour - seasonal_median[..., None]), axis=2)
+        seasonal_points = np.count_nonzero(~np.isnan(same_hour), axis=2)
+        # A handful of same-hour samples gives a noisy MAD; floor it with the item's spread of
+        # day-over-day differences (divided by sqrt(2): the difference of two noisy samples)
+        daily_diff = history[:, period:] - history[:, :-period] if history.shape[1] > period else np.full((len(history), 1), np.nan)
+        diff_median = _quiet_nanmedian(daily_diff, axis=1)
+        diff_scale = np.nan_to_num(_quiet_nanmedian(np.abs(daily_diff - diff_median[:, None]), axis=1)) * MAD_SCALE / np.sqrt(2)
+        seasonal_scale = np.maximum(seasonal_mad * MAD_SCALE, np.maximum(diff_scale, floor)[:, None])
+        seasonal = (current - seasonal_median) / seasonal_scale
+        has_season = seasonal_points >= 3
+    else:
+        seasonal_median = np.full(current.shape, np.nan)
+        seasonal = np.full(current.shape, np.nan)
+        has_season = np.zeros(current.shape, dtype=bool)
+
+    score = np.where(has_season, np.abs(np.nan_to_num(seasonal)), np.abs(robust))
+    score[np.isnan(current) | (points < min_points)[:, None]] = np.nan
+    return {
+        "score": score,
+        "zscore": zscore,
+        "robust": robust,
+        "seasonal": seasonal,
+        "median": np.broadcast_to(median[:, None], current.shape),
+        "seasonal_median": seasonal_median
+    }
+
+class AnomalyService:
+    """
+    Batch anomaly detector over numeric Zabbix items.
+    Keeps an items x hours matrix of the last ANOMALY_WINDOW_DAYS in memory.
+    Each run shifts the window, fetches only the hours completed since the
+    previous run (the full window only for newly seen items) and scores just
+    those hours against the history before them in vectorized passes (see
+    score_window). Zabbix writes an hour's trend row late, so the last
+    ANOMALY_REFETCH_HOURS already-fetched hours are fetched and scored again.
+    Anomalies older than the window expire. Data comes from the local timeseries store for the items
+    it tracks and from hourly trends for the rest.
+    Optionally an IsolationForest (scikit-learn) over per-host feature
+    vectors flags hosts whose overall behaviour is unusual.
+    Ranked results are published to the shared state backend so every
+    worker serves the leader's last run.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("ANOMALY_ENABLED", "False").lower() == "true"
+        self.interval = int(os.getenv("ANOMALY_INTERVAL", "600"))
+        self.window_days = int(os.getenv("ANOMALY_WINDOW_DAYS", "7"))
+        self.threshold = float(os.getenv("ANOMALY_THRESHOLD", "4.0"))
+        self.min_points = int(os.getenv("ANOMALY_MIN_POINTS", "24"))
+        self.max_items = int(os.getenv("ANOMALY_MAX_ITEMS", "50000"))
+        self.max_results = int(os.getenv("ANOMALY_MAX_RESULTS", "100"))
+        self.use_isolation_forest = os.getenv("ANOMALY_ISOLATION_FOREST", "False").lower() == "true"
+        self.contamination = float(os.getenv("ANOMALY_IF_CONTAMINATION", "0.02"))
+        # Item keys (wildcards allowed); "*" scores every numeric item
+        self.item_keys = [k.strip() for k in os.getenv("ANOMALY_KEYS", DEFAULT_KEYS).split(",") if k.strip()]
+        self.bucket_seconds = 3600  # trend.get resolution
+        # Hours re-fetched and re-scored on every run, for trend rows written after the hour closed
+        self.refetch_hours = max(1, int(os.getenv("ANOMALY_REFETCH_HOURS", "2")))
+        self.period = 86400 // self.bucket_seconds
+
+        self._itemids = []
+        self._items = {}  # itemid -> item dict
+        self._matrix = None
+        self._start = None  # clock of the first bucket
+        self._scored_until = None  # clock up to which buckets were scored
+        self._last_score = {}  # itemid -> last score
+        self._active = {}  # itemid -> anomaly record
+        self._lock = threading.Lock()
+        self.result = None
+
+    # --- detection ---
+
+    def detect(self):
+        """Score the hours completed since the last run and publish the ranked anomalies"""
+        # Overlapping runs (a slow run outliving the interval) are skipped, not queued
+        if not self._lock.acquire(blocking=False):
+            logger.info("Anomaly detection already running, skipping this run")
+            return self.current()
+        try:
+            started = time.perf_counter()
+            n_buckets = self.window_days * self.period
+            end = int(time.time()) // self.bucket_seconds * self.bucket_seconds
+            start = end - n_buckets * self.bucket_seconds
+
+            items = zabbix_service.get_items_by_keys(self.item_keys, limit=self.max_items)
+            itemids = [item["itemid"] for item in items]
+            matrix = self._carry_over(itemids, start, n_buckets)
+
+            known = set(self._itemids) if self._scored_until else set()
+            fresh = [i for i in itemids if i not in known]
+            stale = [i for i in itemids if i in known]
+            row = {itemid: r for r, itemid in enumerate(itemids)}
+            if fresh:
+                self._fill(matrix, row, fresh, start, end, start)
+            settle = self.refetch_hours * self.bucket_seconds
+            if stale:
+                self._fill(matrix, row, stale, max(self._scored_until - settle, start), end, start)
+
+            # First run: score the newest hours; afterwards every hour completed since the last run,
+            # plus the re-fetched ones
+            if self._scored_until is None or self._scored_until <= start:
+                score_from = n_buckets - self.refetch_hours
+            else:
+                score_from = min(n_buckets - self.refetch_hours, (self._scored_until - settle - start) // self.bucket_seconds)
+            score_from = max(1, score_from)
+
+            self._itemids, self._items, self._matrix, self._start = itemids, {i["itemid"]: i for i in items}, matrix, start
+            self._update_anomalies(score_window(matrix, score_from, self.period, self.min_points), score_from)
+            self._scored_until = end
+
+            result = {
+                "generated_at": int(time.time()),
+                "items": len(itemids),
+                "scored_hours": n_buckets - score_from,
+                "anomalies": sorted(self._active.values(), key=lambda a: -a["score"])[:self.max_results],
+                "host_outliers": self._host_outliers() if self.use_isolation_forest else []
+            }
+            self.result = result
+        finally:
+            self._lock.release()
+        if shared_state_service.shared:
+            shared_state_service.set("anomalies:latest", result)
+        logger.info(f"Anomaly detection: {len(itemids)} items, {result['scored_hours']} new hours, "
+                    f"{len(self._active)} anomalous ({time.perf_counter() - started:.2f}s)")
+        return result
+
+    def _carry_over(self, itemids, start, n_buckets):
+        """Window matrix for `itemids` starting at `start`, keeping the overlap with the previous window"""
+        matrix = np.full((len(itemids), n_buckets), np.nan)
+        if self._matrix is None:
+            return matrix
+        shift = (start - self._start) // self.bucket_seconds
+        if shift >= n_buckets:
+            return matrix
+        previous_row = {itemid: r for r, itemid in enumerate(self._itemids)}
+        pairs = [(r, previous_row[i]) for r, i in enumerate(itemids) if i in previous_row]
+        if pairs:
+            new_rows, old_rows = map(np.array, zip(*pairs))
+            matrix[new_rows, :n_buckets - shift] = self._matrix[old_rows, shift:]
+        return matrix
+
+    def _fill(self, matrix, row, itemids, time_from, time_till, start):
+        """Fetch [time_from, time_till) for `itemids` and write the bucket means into their rows"""
+        local = {i for i in itemids if timeseries_service.enabled and timeseries_service.last_clock(i)}
+        remote = [i for i in itemids if i not in local]
+        sources = []
+        if local:
+            sources.append(timeseries_service.read_columns(sorted(local), time_from, time_till - 1))
+        if remote:
+            sources.append(zabbix_service.get_trends(remote, time_from, time_till - 1))
+        for series in sources:
+            rows = np.array([row[i] for i in series["itemids"]], dtype=np.int64)
+            if not len(series["clock"]):
+                continue
+            block = bucket_columns(series["item_index"], series["clock"], series["value"],
+                                   len(rows), matrix.shape[1], start, self.bucket_seconds)
+            first = (time_from - start) // self.bucket_seconds
+            matrix[rows, first:] = block[:, first:]
+
+    def _update_anomalies(self, scores, score_from):
+        """Keep, per item, the state of its newest scored hour: anomalous (recorded) or normal (cleared)"""
+        score = scores["score"]
+        has_value = ~np.isnan(score)
+        # Newest scored column with a value, per item
+        latest = score.shape[1] - 1 - np.argmax(has_value[:, ::-1], axis=1)
+        rows = np.flatnonzero(has_value.any(axis=1))
+        columns = latest[rows]
+        values = score[rows, columns]
+
+        for r, c, s in zip(rows.tolist(), columns.tolist(), values.tolist()):
+            itemid = self._itemids[r]
+            self._last_score[itemid] = s
+            if s < self.threshold:
+                self._active.pop(itemid, None)
+                continue
+            item = self._items[itemid]
+            value = float(self._matrix[r, score_from + c])
+            baseline = scores["seasonal_median"][r, c]
+            if np.isnan(baseline):
+                baseline = scores["median"][r, c]
+            self._active[itemid] = {
+                "itemid": itemid,
+                "hostid": item.get("hostid"),
+                "host": item["hosts"][0]["name"] if item.get("hosts") else item.get("hostid"),
+                "item": item.get("name"),
+                "key": item.get("key_"),
+                "units": item.get("units") or "",
+                "clock": self._start + (score_from + c) * self.bucket_seconds,
+                "value": round(value, 4),
+                "baseline": round(float(baseline), 4),
+                "direction": "spike" if value > baseline else "drop",
+                "score": round(s, 2),
+                "zscore": round(float(scores["zscore"][r, c]), 2)
+            }
+
+        current = set(self._itemids)
+        # Items that stopped reporting are never re-scored; drop their anomalies once out of the window
+        for itemid in [i for i, a in self._active.items() if i not in current or a["clock"] < self._start]:
+            del self._active[itemid]
+        for itemid in [i for i in self._last_score if i not in current]:
+            del self._last_score[itemid]
+
+    def _host_outliers(self):
+        """Hosts an IsolationForest separates from the fleet, by per-host anomaly-score features"""
+        try:
+            from sklearn.ensemble import IsolationForest
+        except ImportError:
+            logger.warning("ANOMALY_ISOLATION_FOREST is on but scikit-learn is not installed")
+            return []
+
+        hostids = sorted({self._items[i].get("hostid") for i in self._last_score})
+        if len(hostids) < 20:
+            return []
+        host_row = {hostid: r for r, hostid in enumerate(hostids)}
+        index = np.array([host_row[self._items[i].get("hostid")] for i in self._last_score])
+        scores = np.array(list(self._last_score.values()))
+
+        count = np.bincount(index, minlength=len(hostids))
+        total = np.bincount(index, weights=scores, minlength=len(hostids))
+        peak = np.zeros(len(hostids))
+        np.maximum.at(peak, index, scores)
+        anomalous = np.bincount(index, weights=scores >= self.threshold, minlength=len(hostids))
+        features = np.column_stack([peak, total / count, anomalous, anomalous / count])
+
+        model = IsolationForest(contamination=self.contamination, random_state=0).fit(features)
+        outliers = np.flatnonzero(model.predict(features) == -1)
+        decision = model.decision_function(features)
+        names = {i.get("hostid"): i["hosts"][0]["name"] for i in self._items.values() if i.get("hosts")}
+        ranked = sorted(outliers.tolist(), key=lambda r: decision[r])
+        return [{
+            "hostid": hostids[r],
+            "host": names.get(hostids[r], hostids[r]),
+            "outlier_score": round(float(-decision[r]), 3),
+            "max_item_score": round(float(peak[r]), 2),
+            "anomalous_items": int(anomalous[r])
+        } for r in ranked]
+
+    # --- reads ---
+
+    def current(self):
+        """Last published result from any worker, or None"""
+        if shared_state_service.shared:
+            return shared_state_service.get("anomalies:latest") or self.result
+        return self.result
+
+    def get_anomalies(self, limit=None):
+        """
+        Ranked anomalies from the last published run. Detection only runs in the
+        leader's background job, never in the request path.
+        """
+        result = self.current()
+        if result is None:
+            return {
+                "status": "pending" if self.enabled else "disabled",
+                "generated_at": None,
+                "items": 0,
+                "anomalies": [],
+                "host_outliers": []
+            }
+        result = {**result, "status": "ok"}
+        if limit:
+            result["anomalies"] = result["anomalies"][:limit]
+        return result
+
+anomaly_service = AnomalyService()
@@ -0,0 +1,160 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+    Concurrent misses on the same key are coalesced: the first caller runs
+    the loader and every other caller waits for its result (single-flight).
+    Cached values are shared between callers and must not be mutated.
+    When the shared state backend spans several worker processes, loaded
+    values are also published there (JSON-serializable values only) and a
+    miss in one worker is served from another worker's load; a lease keeps
+    the loader running in one process at a time. Entries carry a shared
+    generation number, and invalidate() bumps it for every worker.
+    """
+    def __init__(self, name, ttl, max_entries=256):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value, generation)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self._shared = shared_state_service if shared_state_service.shared else None
+        self._generation_key = f"cachegen:{name}"
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    def _generation(self):
+        return (self._shared.get(self._generation_key) or 0) if self._shared else 0
+
+    def get_or_load(self, key, loader):
+        generation = self._generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic() and entry[2] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            if flight:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = Future()
+                self._inflight[key] = flight
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            return flight.result()
+
+        try:
+            if self._shared:
+                value, expires_in = self._load_shared(key, loader, generation)
+            else:
+                value, expires_in = loader(), self.ttl
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value, generation, expires_in)
+        flight.set_result(value)
+        return value
+
+    def _load_shared(self, key, loader, generation):
+        """Take the value another worker published, or load and publish it under a lease"""
+        shared_key = f"cache:{self.name}:{generation}:{key}"
+        lease = f"cache:{self.name}:{key}"
+        deadline = time.monotonic() + self.ttl
+        while True:
+            entry = self._shared.get(shared_key)
+            if entry is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                return entry["value"], entry["expires_at"] - time.time()
+            if self._shared.is_leader(lease, ttl=60) or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+
+        try:
+            value = loader()
+            try:
+                self._shared.set(shared_key, {"expires_at": time.time() + self.ttl, "value": value}, ttl=self.ttl)
+            except (TypeError, ValueError):
+                pass  # Not JSON-serializable; keep it process-local
+        finally:
+            self._shared.release(lease)
+        return value, self.ttl
+
+    def set(self, key, value):
+        generation = self._generation()
+        with self._lock:
+            self._store(key, value, generation, self.ttl)
+
+    def _store(self, key, value, generation, expires_in):
+        self._entries[key] = (time.monotonic() + expires_in, value, generation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one key, or the whole cache when key is None; across workers the whole cache is dropped"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        if self._shared:
+            self._shared.incr(self._generation_key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "shared_hits": self.shared_hits,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced + self.shared_hits) / lookups, 3) if lookups else 0.0
+            }
+
+class CacheService:
+    """Registry of named caches so their counters can be reported together"""
+    def __init__(self):
+        self.default_max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+        self._caches = {}
+
+    def create(self, name, ttl, max_entries=None):
+        cache = TTLCache(name, ttl, max_entries or self.default_max_entries)
+        self._caches[name] = cache
+        logger.info(f"Cache '{name}' created (ttl={ttl}s, max_entries={cache.max_entries})")
+        return cache
+
+    def get(self, name):
+        return self._caches.get(name)
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self._caches.items()}
+
+cache_service = CacheService()
@@ -1,12 +1,38 @@
 import json
 import os
-from typing import Dict, Any
+import time
+import tempfile
+import logging
+import threading
+from typing import Dict, Any, Callable
+from .shared_state_service import shared_state_service
+from .metrics_service import metrics_service
+
+logger = logging.getLogger(__name__)
 
 CONFIG_FILE = "ai_agent_config.json"
 
 class ConfigService:
+    """
+    Keeps the parsed config in memory with a version counter.
+    The file is re-read only after save_config() or when its mtime changes
+    (checked at most every CONFIG_CHECK_INTERVAL seconds), and writes go
+    through a temp file + atomic rename so readers never see a torn file.
+    Subscribers are called with (version, config) on every version bump.
+    With several worker processes, save_config() also bumps a counter in the
+    shared state backend, looked at on the same CONFIG_CHECK_INTERVAL check,
+    so the other workers reload even when the file's mtime did not move.
+    """
     def __init__(self):
         self.config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), CONFIG_FILE)
+        self.check_interval = float(os.getenv("CONFIG_CHECK_INTERVAL", "2"))
+        self.version = 0
+        self._config = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._shared_version = None
+        self._lock = threading.RLock()
+        self._subscribers = []
         self._ensure_config_exists()
 
     def _ensure_config_exists(self):
@@ -24,20 +50,78 @@ class ConfigService:
             }
             self.save_config(default_config)
 
-    def get_config(self) -> Dict[str, Any]:
+    def subscribe(self, callback: Callable[[int, Dict[str, Any]], None]):
+        """Register a callback invoked with (version, config) whenever the config changes"""
+        self._subscribers.append(callback)
+
+    def _publish(self, version, config):
+        for callback in list(self._subscribers):
+            try:
+                callback(version, dict(config))
+            except Exception as e:
+                logger.exception(f"Error in config subscriber: {e}")
+
+    def _reload_if_changed(self):
+        # Reads between checks cost nothing: no stat() and no shared state round trip
+        now = time.monotonic()
+        if self._mtime is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        shared_changed = False
+        if shared_state_service.shared:
+            shared_version = shared_state_service.get("config:version")
+            shared_changed = shared_version != self._shared_version
+            self._shared_version = shared_version
         try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading config: {e}")
-            return {}
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError as e:
+            logger.error(f"Error loading config: {e}")
+            return
+        if mtime == self._mtime and not shared_changed:
+            return
+
+        with self._lock, metrics_service.span("config", "load"):
+            try:
+                with open(self.config_path, 'r') as f:
+                    config = json.load(f)
+            except Exception as e:
+                logger.exception(f"Error loading config: {e}")
+                return
+            self._config = config
+            self._mtime = mtime
+            self.version += 1
+            version = self.version
+        self._publish(version, config)
+
+    def get_config(self) -> Dict[str, Any]:
+        self._reload_if_changed()
+        # Callers are free to modify the returned copy
+        return dict(self._config)
 
     def save_config(self, config: Dict[str, Any]):
-        try:
-            with open(self.config_path, 'w') as f:
-                json.dump(config, f, indent=4)
-        except Exception as e:
-            print(f"Error saving config: {e}")
-            raise e
+        with self._lock, metrics_service.span("config", "save"):
+            directory = os.path.dirname(self.config_path)
+            fd, tmp_path = tempfile.mkstemp(prefix=".ai_agent_config.", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(config, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.config_path)
+            except Exception as e:
+                logger.exception(f"Error saving config: {e}")
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise e
+
+            self._config = dict(config)
+            self._mtime = os.stat(self.config_path).st_mtime_ns
+            self._last_check = time.monotonic()
+            self.version += 1
+            version = self.version
+            if shared_state_service.shared:
+                self._shared_version = shared_state_service.incr("config:version")
+        self._publish(version, config)
 
 config_service = ConfigService()
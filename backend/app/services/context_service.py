@@ -0,0 +1,163 @@
+import os
+import re
+import time
+import logging
+from .correlation_service import correlation_service
+from .host_index_service import host_index_service
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_NAMES = {
+    "0": "Not classified", "1": "Information", "2": "Warning",
+    "3": "Average", "4": "High", "5": "Disaster"
+}
+
+def estimate_tokens(text):
+    """Cheap local token estimate (~3.5 characters per token for mixed Spanish/English text)"""
+    return max(1, int(len(text) / 3.5 + 0.5))
+
+def _words(text):
+    return set(re.findall(r"[\w.\-]{3,}", (text or "").lower()))
+
+class ContextService:
+    """
+    Builds the Zabbix context injected into chat prompts.
+    Problems are first grouped into root-cause clusters (CorrelationService),
+    so an alert storm costs one line. Clusters, metric anomalies and hosts are
+    ranked by relevance to the user's message (hosts named in the message
+    first, then severity, then recency) and rendered as compact lines until
+    CONTEXT_TOKEN_BUDGET estimated tokens are used.
+    """
+    def __init__(self):
+        self.token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    def candidate_hosts(self, message, limit=10):
+        """
+        Hosts the message names, from the host index: exact names, IPs and DNS
+        names of one to three words, then prefix/substring hits for tokens that
+        look like host identifiers (digits, dots, dashes). No typo matches.
+        """
+        if not host_index_service.ready:
+            return []
+        words = re.findall(r"[\w.\-]+", (message or "").lower())
+        found = {}
+        for size in (3, 2, 1):
+            for i in range(len(words) - size + 1):
+                hostid = host_index_service.resolve(" ".join(words[i:i + size]))
+                if hostid and hostid not in found:
+                    found[hostid] = host_index_service.get(hostid)
+        for word in words:
+            if len(found) >= limit:
+                break
+            if len(word) >= 3 and any(c.isdigit() or c in ".-_" for c in word) and not host_index_service.resolve(word):
+                for record in host_index_service.search(word, limit=3, fuzzy=False):
+                    found.setdefault(record["hostid"], record)
+        return list(found.values())[:limit]
+
+    def build(self, message, problems, hosts=None, total_hosts=None, anomalies=None):
+        now = time.time()
+        message_words = _words(message)
+        message_lower = (message or "").lower()
+
+        seen = {}
+
+        def mentioned(name):
+            name = (name or "").lower()
+            if not name:
+                return False
+            if name not in seen:
+                # Substring check first: the boundary regex is only compiled for likely matches
+                seen[name] = name in message_words or (name in message_lower and re.search(
+                    r"(?<![\w.\-])" + re.escape(name) + r"(?![\w.\-])", message_lower) is not None)
+            return seen[name]
+
+        def cluster_score(cluster):
+            score = int(cluster["severity"]) * 2
+            if any(mentioned(name) for name in cluster["hosts"]):
+                score += 20
+            score += max(len(message_words & _words(name)) for name in cluster["names"]) * 3
+            if cluster["unacknowledged"]:
+                score += 1
+            age_hours = max(0.0, (now - cluster["last_clock"]) / 3600)
+            return score + 2.0 / (1.0 + age_hours) + min(cluster["count"], 100) / 100
+
+        clusters = correlation_service.correlate(problems)
+        ranked_clusters = sorted(clusters, key=cluster_score, reverse=True)
+        ranked_hosts = sorted(hosts or [], key=lambda h: mentioned(h.get("name")) or mentioned(h.get("host")), reverse=True)
+
+        context = {
+            "active_problems_count": len(problems),
+            "total_hosts": total_hosts if total_hosts is not None else len(hosts or []),
+            "active_problems": [],
+            "anomalies": [],
+            "hosts_summary": []
+        }
+        lines = [f"Active problems: {len(problems)} in {len(clusters)} groups. Monitored hosts: {context['total_hosts']}."]
+        used = estimate_tokens(lines[0])
+
+        for cluster in ranked_clusters:
+            line = self._cluster_line(cluster)
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            lines.append(line)
+            root = cluster["root"]
+            context["active_problems"].append({
+                "eventid": root["eventid"],
+                "name": root["name"],
+                "severity": cluster["severity"],
+                "acknowledged": "0" if cluster["unacknowledged"] else "1",
+                "related": cluster["count"] - 1
+            })
+        omitted = len(clusters) - len(context["active_problems"])
+        if omitted:
+            lines.append(f"- ... {omitted} more problem groups not shown")
+
+        # Already ranked by score; anomalies on hosts named in the message go first
+        for anomaly in sorted(anomalies or [], key=lambda a: not mentioned(a.get("host")))[:20]:
+            line = (f"- anomaly: {anomaly.get('item')} on {anomaly.get('host')} = {anomaly.get('value'):g}{anomaly.get('units', '')}"
+                    f" ({anomaly.get('direction')}, usual {anomaly.get('baseline'):g}, score {anomaly.get('score')})"
+                    f" at {self._format_clock(anomaly.get('clock'))}")
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            lines.append(line)
+            context["anomalies"].append({"host": anomaly.get("host"), "item": anomaly.get("item"), "score": anomaly.get("score")})
+
+        for host in ranked_hosts:
+            status = "Enabled" if host.get("status") == "0" else "Disabled"
+            line = f"- host {host.get('name', 'Unknown')} ({status})"
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            lines.append(line)
+            context["hosts_summary"].append({"name": host.get("name", "Unknown"), "status": status})
+
+        context["context_text"] = "\n".join(lines)
+        context["context_tokens"] = used
+        return context
+
+    def _cluster_line(self, cluster):
+        root = cluster["root"]
+        severity = SEVERITY_NAMES.get(cluster["severity"], "Unknown")
+        if cluster["count"] == 1:
+            return (f"- [{severity}] {root['name']} | host: {', '.join(root['hosts']) or '?'}"
+                    f" | since: {self._format_clock(root['clock'])}"
+                    f" | ack: {'no' if cluster['unacknowledged'] else 'yes'} | eventid: {root['eventid']}")
+        hosts = ", ".join(cluster["hosts"][:5]) + (f" +{cluster['host_count'] - 5} more" if cluster["host_count"] > 5 else "")
+        related = "; ".join(name for name in cluster["names"][:3] if name != root["name"])
+        return (f"- [{severity}] group of {cluster['count']} problems on {cluster['host_count']} hosts"
+                f" | probable root: {root['name']} ({', '.join(root['hosts']) or '?'}, eventid: {root['eventid']})"
+                + (f" | related: {related}" if related else "")
+                + f" | hosts: {hosts} | since: {self._format_clock(cluster['first_clock'])}"
+                f" | unacknowledged: {cluster['unacknowledged']}")
+
+    def _format_clock(self, clock):
+        if not clock:
+            return "unknown"
+        return time.strftime('%Y-%m-%d %H:%M', time.localtime(int(clock)))
+
+context_service = ContextService()
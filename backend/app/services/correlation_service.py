@@ -0,0 +1,180 @@
+import os
+import re
+import time
+import logging
+import threading
+from functools import lru_cache
+from .host_index_service import host_index_service
+
+logger = logging.getLogger(__name__)
+
+_QUOTED = re.compile(r"\"[^\"]*\"|'[^']*'")
+_IP = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b")
+_HEX = re.compile(r"\b(?:0x)?[0-9a-f]{8,}\b")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_SPACES = re.compile(r"\s+")
+
+@lru_cache(maxsize=16384)
+def name_template(name, host_names=()):
+    """
+    Trigger name with its variable parts replaced, so the same trigger on
+    different hosts or with different values shares one template:
+    "Web-01: CPU at 97% for 5m" -> "{host}: cpu at {n}% for {n}m"
+    """
+    text = (name or "").lower()
+    for host in host_names:
+        if host:
+            text = text.replace(host.lower(), "{host}")
+    text = _QUOTED.sub("{s}", text)
+    text = _IP.sub("{ip}", text)
+    text = _HEX.sub("{hex}", text)
+    text = _NUMBER.sub("{n}", text)
+    return _SPACES.sub(" ", text).strip()
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]  # path halving
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+class CorrelationService:
+    """
+    Groups active problems into probable root-cause clusters so prompts and
+    the summary widget deal with a handful of groups instead of hundreds of
+    raw events during an outage.
+    Problems are linked (union-find) when they are close in time
+    (CORRELATION_WINDOW seconds between consecutive events) and share
+      - a host,
+      - a hashed trigger name template (see name_template), or
+      - a host group together with a tag (CORRELATION_TAGS).
+    Each rule buckets problems by key and only links neighbours in clock
+    order, so grouping is O(n log n) rather than pairwise.
+    The earliest, most severe problem of a cluster is reported as its root.
+    Host groups come from the host index.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("CORRELATION_ENABLED", "True").lower() == "true"
+        self.window = int(os.getenv("CORRELATION_WINDOW", "600"))
+        self.tags = {t.strip().lower() for t in os.getenv("CORRELATION_TAGS", "service,application,scope").split(",") if t.strip()}
+        self._lock = threading.Lock()
+        self._memo = (None, None)  # (fingerprint, clusters)
+
+    def correlate(self, problems):
+        """Clusters for `problems`, largest and most severe first (memoized on the problem set)"""
+        fingerprint = tuple((p.get("eventid"), str(p.get("severity", "0")), str(p.get("acknowledged", "0"))) for p in problems)
+        with self._lock:
+            if self._memo[0] == fingerprint:
+                return self._memo[1]
+        clusters = self._correlate(problems)
+        with self._lock:
+            self._memo = (fingerprint, clusters)
+        return clusters
+
+    def _correlate(self, problems):
+        if not self.enabled:
+            return [self._cluster(problems, [i], None, [int(p.get("clock") or 0) for p in problems], set())
+                    for i in range(len(problems))]
+
+        started = time.perf_counter()
+        n = len(problems)
+        clocks = [int(p.get("clock") or 0) for p in problems]
+        templates = []
+        buckets = {}  # rule key -> [problem index]
+        for i, problem in enumerate(problems):
+            hosts = problem.get("hosts", [])
+            template = name_template(problem.get("name"), tuple(sorted(h.get("name", "") for h in hosts)))
+            templates.append(template)
+            keys = [("template", hash(template))]
+            groups = set()
+            for host in hosts:
+                keys.append(("host", host.get("hostid")))
+                record = host_index_service.get(host.get("hostid"))
+                if record:
+                    groups.update(record.get("groups", []))
+            for tag in problem.get("tags", []):
+                if tag.get("tag", "").lower() in self.tags:
+                    keys.extend(("group_tag", group, tag["tag"].lower(), tag.get("value", "")) for group in groups)
+            for key in keys:
+                buckets.setdefault(key, []).append(i)
+
+        sets = _UnionFind(n)
+        reasons = {}  # linked index -> set of rules that linked it
+        for key, members in buckets.items():
+            if len(members) < 2:
+                continue
+            members.sort(key=clocks.__getitem__)
+            for a, b in zip(members, members[1:]):
+                if clocks[b] - clocks[a] <= self.window:
+                    sets.union(a, b)
+                    reasons.setdefault(a, set()).add(key[0])
+                    reasons.setdefault(b, set()).add(key[0])
+
+        members_of = {}
+        for i in range(n):
+            members_of.setdefault(sets.find(i), []).append(i)
+        clusters = []
+        for members in members_of.values():
+            rules = set().union(*(reasons[i] for i in members if i in reasons))
+            clusters.append(self._cluster(problems, members, templates, clocks, rules))
+        clusters.sort(key=lambda c: (-int(c["severity"]), -c["count"], -c["last_clock"]))
+
+        elapsed = time.perf_counter() - started
+        if n > 500:
+            logger.info(f"Correlated {n} problems into {len(clusters)} clusters ({elapsed * 1000:.0f} ms)")
+        return clusters
+
+    def _cluster(self, problems, members, templates, clocks, rules):
+        root_index = min(members, key=lambda i: (clocks[i], -int(problems[i].get("severity", 0))))
+        root = problems[root_index]
+        hosts = {}
+        names = {}  # template -> [first name seen, count]
+        severity = 0
+        unacknowledged = 0
+        for i in members:
+            problem = problems[i]
+            for host in problem.get("hosts", []):
+                hosts[host.get("hostid")] = host.get("name", "")
+            entry = names.setdefault(templates[i] if templates else i, [problem.get("name", "Unknown"), 0])
+            entry[1] += 1
+            severity = max(severity, int(problem.get("severity", 0)))
+            if str(problem.get("acknowledged", "0")) == "0":
+                unacknowledged += 1
+        return {
+            "id": str(root.get("eventid")),
+            "root": {
+                "eventid": root.get("eventid"),
+                "name": root.get("name", "Unknown"),
+                "severity": str(root.get("severity", "0")),
+                "hosts": [h.get("name", "") for h in root.get("hosts", [])],
+                "clock": root.get("clock")
+            },
+            "severity": str(severity),
+            "count": len(members),
+            "unacknowledged": unacknowledged,
+            "hosts": sorted(hosts.values())[:20],
+            "host_count": len(hosts),
+            # Distinct trigger name templates, most frequent first
+            "names": [name for name, _ in sorted(names.values(), key=lambda e: -e[1])[:5]],
+            "first_clock": min(clocks[i] for i in members),
+            "last_clock": max(clocks[i] for i in members),
+            "linked_by": sorted(rules),
+            "eventids": [problems[i].get("eventid") for i in members[:50]]
+        }
+
+correlation_service = CorrelationService()
@@ -0,0 +1,124 @@
+import os
+import asyncio
+import functools
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+class ExecutorService:
+    """
+    Bounded thread pools used by the async routes to run the blocking
+    Zabbix (pyzabbix/requests) and LLM (boto3/openai) clients off the event loop.
+    Zabbix and LLM calls get separate pools so slow model turns cannot starve
+    the short Zabbix lookups.
+    """
+    def __init__(self):
+        self.zabbix_workers = int(os.getenv("ZABBIX_MAX_WORKERS", "16"))
+        self.llm_workers = int(os.getenv("LLM_MAX_WORKERS", "32"))
+        self.zabbix_timeout = float(os.getenv("ZABBIX_CALL_TIMEOUT", "30"))
+        self.llm_timeout = float(os.getenv("LLM_CALL_TIMEOUT", "180"))
+
+        self._zabbix_pool = ThreadPoolExecutor(max_workers=self.zabbix_workers, thread_name_prefix="zabbix")
+        self._llm_pool = ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="llm")
+        self._tasks = []
+        self._leases = []
+        logger.info(f"ExecutorService initialized (zabbix_workers={self.zabbix_workers}, llm_workers={self.llm_workers})")
+
+    async def _run(self, pool, timeout, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the request context so spans are attributed to the request
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(pool, functools.partial(context.run, func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # The worker thread keeps running until the client returns,
+            # but the request is released and the pool stays bounded.
+            logger.warning(f"Call to {getattr(func, '__name__', func)} timed out after {timeout}s")
+            raise
+
+    async def run_zabbix(self, func, *args, timeout=None, **kwargs):
+        """Run a blocking Zabbix call in the Zabbix pool with a deadline"""
+        return await self._run(self._zabbix_pool, timeout or self.zabbix_timeout, func, *args, **kwargs)
+
+    async def run_llm(self, func, *args, timeout=None, **kwargs):
+        """Run a blocking LLM call in the LLM pool with a deadline"""
+        return await self._run(self._llm_pool, timeout or self.llm_timeout, func, *args, **kwargs)
+
+    async def stream_llm(self, func, *args, timeout=None, **kwargs):
+        """
+        Drive a blocking generator in the LLM pool and yield its items on the event loop.
+        The deadline covers the whole stream; if the consumer goes away the
+        producer thread stops at the next item.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        finished = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for item in func(*args, **kwargs):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        self._llm_pool.submit(contextvars.copy_context().run, produce)
+        deadline = loop.time() + (timeout or self.llm_timeout)
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def start_periodic(self, name, interval, func, timeout=None, leader_only=False, follower=None):
+        """
+        Run a blocking job in the Zabbix pool every `interval` seconds until shutdown.
+        With leader_only, one worker process runs `func` (it holds a renewable
+        lease in the shared state backend) and the others run `follower`, if given.
+        """
+        timeout = timeout or max(interval, self.zabbix_timeout)
+
+        def tick():
+            if not leader_only or shared_state_service.is_leader(name, ttl=timeout + 2 * interval):
+                func()
+            elif follower:
+                follower()
+
+        async def loop():
+            while True:
+                try:
+                    await self.run_zabbix(tick, timeout=timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Background job {name} failed: {e}")
+                await asyncio.sleep(interval)
+
+        self._tasks.append(asyncio.get_running_loop().create_task(loop(), name=name))
+        if leader_only:
+            self._leases.append(name)
+        logger.info(f"Background job {name} scheduled every {interval}s")
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        for name in self._leases:
+            shared_state_service.release(name)
+        self._zabbix_pool.shutdown(wait=False, cancel_futures=True)
+        self._llm_pool.shutdown(wait=False, cancel_futures=True)
+
+executor_service = ExecutorService()
@@ -0,0 +1,272 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import Counter
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+# host.get fields kept in the index
+HOST_INDEX_FIELDS = ["hostid", "host", "name", "status", "maintenance_status"]
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _record(host):
+    """Compact index record from a host.get row (with selectInterfaces ip/dns and the host group names)"""
+    interfaces = host.get("interfaces", [])
+    groups = host.get("hostgroups") or host.get("groups") or []
+    return {
+        "hostid": str(host["hostid"]),
+        "host": host.get("host", ""),
+        "name": host.get("name") or host.get("host", ""),
+        "status": str(host.get("status", "0")),
+        "maintenance_status": str(host.get("maintenance_status", "0")),
+        "ips": sorted({i["ip"] for i in interfaces if i.get("ip")}),
+        "dns": sorted({i["dns"].lower() for i in interfaces if i.get("dns")}),
+        "groups": sorted({g["name"] for g in groups if g.get("name")})
+    }
+
+class HostIndexService:
+    """
+    In-memory index of Zabbix hosts used to resolve names in agent tools
+    without a host.get round-trip.
+    Exact lookups (visible name, technical name, IP, DNS; case-insensitive)
+    are dict hits. Fuzzy lookups use a sorted key list for prefixes and a
+    trigram index over the names for substrings and typos.
+    ZabbixService.refresh_host_index() feeds it; replace() diffs the new host
+    list against the index and only re-indexes hosts that changed. Write
+    tools patch the index directly. With several worker processes, one
+    worker refreshes and publishes the host list, the others follow().
+    """
+    def __init__(self):
+        self.enabled = os.getenv("HOST_INDEX_ENABLED", "True").lower() == "true"
+        self.refresh_interval = int(os.getenv("HOST_INDEX_REFRESH_INTERVAL", "300"))
+        self.use_trigrams = os.getenv("HOST_INDEX_TRIGRAMS", "True").lower() == "true"
+
+        self._hosts = {}  # hostid -> record
+        self._exact = {}  # lowercased name/host/ip/dns -> [hostid]
+        self._keys = []  # sorted exact keys, for prefix search
+        self._trigrams = {}  # trigram -> set(hostid)
+        self._trigram_counts = {}  # hostid -> number of distinct trigrams in its names
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.shared_version = 0
+
+    # --- index maintenance (callers hold the lock) ---
+
+    def _keys_of(self, record):
+        keys = {record["name"].lower(), record["host"].lower()}
+        keys.update(record["ips"])
+        keys.update(record["dns"])
+        keys.discard("")
+        return keys
+
+    def _add(self, record, sort_keys=True):
+        hostid = record["hostid"]
+        self._hosts[hostid] = record
+        for key in self._keys_of(record):
+            ids = self._exact.get(key)
+            if ids is None:
+                self._exact[key] = [hostid]
+                if sort_keys:
+                    bisect.insort(self._keys, key)
+                else:
+                    self._keys.append(key)
+            elif hostid not in ids:
+                ids.append(hostid)
+        if self.use_trigrams:
+            trigrams = _trigrams(record["name"].lower()) | _trigrams(record["host"].lower())
+            self._trigram_counts[hostid] = len(trigrams)
+            for trigram in trigrams:
+                self._trigrams.setdefault(trigram, set()).add(hostid)
+
+    def _remove(self, hostid):
+        record = self._hosts.pop(hostid, None)
+        if not record:
+            return
+        for key in self._keys_of(record):
+            ids = self._exact.get(key)
+            if ids and hostid in ids:
+                ids.remove(hostid)
+                if not ids:
+                    del self._exact[key]
+                    position = bisect.bisect_left(self._keys, key)
+                    if position < len(self._keys) and self._keys[position] == key:
+                        del self._keys[position]
+        if self.use_trigrams:
+            self._trigram_counts.pop(hostid, None)
+            for trigram in _trigrams(record["name"].lower()) | _trigrams(record["host"].lower()):
+                ids = self._trigrams.get(trigram)
+                if ids is not None:
+                    ids.discard(hostid)
+                    if not ids:
+                        del self._trigrams[trigram]
+
+    def _rebuild(self, records):
+        self._hosts, self._exact, self._trigrams, self._trigram_counts = {}, {}, {}, {}
+        self._keys = []
+        for record in records:
+            self._add(record, sort_keys=False)
+        self._keys.sort()
+
+    # --- updates ---
+
+    def replace(self, hosts):
+        """Apply a full host.get result, re-indexing only added, changed and removed hosts"""
+        records = {r["hostid"]: r for r in map(_record, hosts)}
+        with self._lock:
+            first_load = self.loaded_at is None
+            if first_load:
+                self._rebuild(records.values())
+                added, changed, removed = len(records), 0, 0
+            else:
+                removed_ids = [hostid for hostid in self._hosts if hostid not in records]
+                changed_ids = [hostid for hostid, r in records.items() if self._hosts.get(hostid) != r]
+                added = sum(1 for hostid in changed_ids if hostid not in self._hosts)
+                changed, removed = len(changed_ids) - added, len(removed_ids)
+                for hostid in removed_ids + changed_ids:
+                    self._remove(hostid)
+                for hostid in changed_ids:
+                    self._add(records[hostid])
+            self.loaded_at = time.time()
+        # An unchanged refresh is not republished, so followers skip reloading the same index
+        if first_load or added or changed or removed:
+            self._publish()
+        if added or changed or removed:
+            logger.info(f"Host index: {added} added, {changed} changed, {removed} removed, {len(self._hosts)} hosts")
+
+    def upsert(self, host):
+        """Index one host.get row (e.g. after a lookup that missed the index)"""
+        record = _record(host)
+        self.follow()  # Publish on top of the latest index, not a stale copy
+        with self._lock:
+            if self._hosts.get(record["hostid"]) == record:
+                return
+            self._remove(record["hostid"])
+            self._add(record)
+        self._publish()
+
+    def patch(self, hostid, **fields):
+        """Update indexed fields of a host after a write tool changed it in Zabbix"""
+        self.follow()
+        with self._lock:
+            record = self._hosts.get(str(hostid))
+            updated = {**record, **{k: str(v) for k, v in fields.items()}} if record else None
+            if not record or updated == record:
+                return
+            self._remove(record["hostid"])
+            self._add(updated)
+        self._publish()
+
+    # --- sharing between worker processes ---
+
+    def _publish(self):
+        if not shared_state_service.shared:
+            return
+        with self._lock:
+            records = list(self._hosts.values())
+        shared_state_service.set("hosts:index", records)
+        self.shared_version = shared_state_service.incr("hosts:version")
+
+    def follow(self):
+        """Replace the local index with the published one if another worker refreshed it"""
+        if not shared_state_service.shared:
+            return
+        version = shared_state_service.get("hosts:version") or 0
+        if version == self.shared_version:
+            return
+        records = shared_state_service.get("hosts:index")
+        if records is None:
+            return
+        with self._lock:
+            self._rebuild(records)
+            self.loaded_at = time.time()
+            self.shared_version = version
+
+    # --- reads ---
+
+    @property
+    def ready(self):
+        return self.enabled and self.loaded_at is not None
+
+    def get(self, hostid):
+        return self._hosts.get(str(hostid))
+
+    def resolve(self, name_or_ip):
+        """Host ID for an exact visible name, technical name, IP or DNS name; names win over addresses"""
+        key = str(name_or_ip).strip().lower()
+        with self._lock:
+            ids = self._exact.get(key)
+            if not ids:
+                return None
+            for hostid in ids:
+                record = self._hosts[hostid]
+                if key in (record["name"].lower(), record["host"].lower()):
+                    return hostid
+            return ids[0]
+
+    def search(self, query, limit=5, fuzzy=True):
+        """
+        Hosts matching `query`, best first: exact matches, then key prefixes,
+        then names containing it, then (if `fuzzy`) names within trigram
+        similarity (typos).
+        """
+        key = str(query).strip().lower()
+        if not key:
+            return []
+        found = []
+
+        def take(hostids):
+            for hostid in hostids:
+                if hostid not in found:
+                    found.append(hostid)
+            return len(found) >= limit
+
+        with self._lock:
+            if take(self._exact.get(key, [])):
+                return [self._hosts[h] for h in found[:limit]]
+
+            position = bisect.bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position].startswith(key):
+                if take(self._exact[self._keys[position]]):
+                    return [self._hosts[h] for h in found[:limit]]
+                position += 1
+
+            if self.use_trigrams:
+                query_trigrams = _trigrams(key)
+                inner = {t for t in query_trigrams if " " not in t}
+                if inner:
+                    candidates = set.intersection(*(self._trigrams.get(t, set()) for t in inner))
+                    contains = sorted(h for h in candidates
+                                      if key in self._hosts[h]["name"].lower() or key in self._hosts[h]["host"].lower())
+                    if take(contains):
+                        return [self._hosts[h] for h in found[:limit]]
+                if not fuzzy:
+                    return [self._hosts[h] for h in found[:limit]]
+
+                votes = Counter()
+                for trigram in query_trigrams:
+                    votes.update(self._trigrams.get(trigram, ()))
+                scored = []
+                for hostid, shared in votes.items():
+                    # Jaccard similarity of the trigram sets
+                    similarity = shared / (len(query_trigrams) + self._trigram_counts[hostid] - shared)
+                    if similarity >= 0.3:
+                        scored.append((-similarity, hostid))
+                take(hostid for _, hostid in sorted(scored))
+
+            return [self._hosts[h] for h in found[:limit]]
+
+    def stats(self):
+        return {
+            "hosts": len(self._hosts),
+            "keys": len(self._keys),
+            "trigrams": len(self._trigrams),
+            "loaded_at": self.loaded_at
+        }
+
+host_index_service = HostIndexService()
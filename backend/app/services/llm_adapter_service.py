@@ -0,0 +1,431 @@
+import os
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from .llm_client_service import llm_client_service
+from .llm_gateway_service import llm_gateway_service
+from .metrics_service import metrics_service
+
+logger = logging.getLogger(__name__)
+
+# An adapter speaks one provider's wire format to the provider-neutral agent
+# loop in AIService. Per conversation it keeps a provider-native `state`
+# (system prompt, messages so far) and reports every model turn as
+#   {"text": str, "calls": [{"id", "name", "input"}], "message": native assistant message}
+# where `calls` is empty on the final turn. `settings` is the ProviderSettings
+# (provider, credentials, models) read from the config for the current chat.
+
+def _plain(value):
+    """Protobuf Struct values to plain Python (whole floats back to ints)"""
+    if hasattr(value, "items"):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) or type(value).__name__ == "RepeatedComposite":
+        return [_plain(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class ProviderAdapter(ABC):
+    """Base class for provider adapters; instantiating one with a missing method fails at registration"""
+    name = None
+
+    @abstractmethod
+    def model(self, settings):
+        """Configured model ID"""
+
+    def check(self, settings):
+        """Error message if the provider is not configured, else None"""
+        return None
+
+    @abstractmethod
+    def convert_tools(self, tools):
+        """Provider tool definitions from the Anthropic-style schemas in AIService.tools"""
+
+    @abstractmethod
+    def start(self, settings, prompt, history, message):
+        """
+        Native conversation state; `prompt` is (static system prompt, dynamic
+        context block) and `history` alternating user/assistant text turns.
+        """
+
+    @abstractmethod
+    def complete(self, settings, state, tools):
+        """One model turn through the gateway (retried, hedged)"""
+
+    @abstractmethod
+    def stream(self, settings, state, tools):
+        """One streamed model turn: yields token events, returns the turn"""
+
+    @abstractmethod
+    def add_turn(self, state, turn, results):
+        """Append the assistant turn and the results of its tool calls"""
+
+class BedrockAdapter(ProviderAdapter):
+    """Anthropic messages API on Bedrock; tools are already in its format"""
+    name = "bedrock"
+
+    def model(self, settings):
+        return settings.bedrock_model_id
+
+    def check(self, settings):
+        if not os.getenv("BEDROCK_API_KEY") and not (settings.aws_access_key and settings.aws_secret_key):
+            return "AI Configuration Error: AWS credentials not configured."
+        return None
+
+    def convert_tools(self, tools):
+        return list(tools)
+
+    def start(self, settings, prompt, history, message):
+        static, context_block = prompt
+        if settings.prompt_caching:
+            # The static prompt is marked for prompt caching
+            system = [{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}]
+            if context_block:
+                system.append({"type": "text", "text": context_block})
+        else:
+            system = static + "\n\n" + context_block if context_block else static
+        return {"system": system, "messages": list(history) + [{"role": "user", "content": message}]}
+
+    def _client(self, settings):
+        return llm_client_service.get_bedrock(settings.aws_region, settings.aws_access_key, settings.aws_secret_key)
+
+    def _body(self, state, tools):
+        return json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "temperature": 0.5,
+            "system": state["system"],
+            "messages": state["messages"],
+            "tools": tools
+        })
+
+    def _turn(self, content, stop_reason):
+        return {
+            "text": "".join(block["text"] for block in content if block["type"] == "text"),
+            "calls": [{"id": block["id"], "name": block["name"], "input": block["input"]}
+                      for block in content if block["type"] == "tool_use"] if stop_reason == "tool_use" else [],
+            "message": {"role": "assistant", "content": content}
+        }
+
+    def complete(self, settings, state, tools):
+        client = self._client(settings)
+        body = self._body(state, tools)
+
+        def send(model_id):
+            with metrics_service.span("llm", "bedrock", model_id):
+                response = client.invoke_model(modelId=model_id, body=body)
+                response_body = json.loads(response["body"].read())
+            usage = response_body.get("usage", {})
+            metrics_service.record_tokens("bedrock", model_id, usage.get("input_tokens"), usage.get("output_tokens"))
+            return response_body
+
+        response_body = llm_gateway_service.call("bedrock", settings.bedrock_model_id, send)
+        return self._turn(response_body["content"], response_body.get("stop_reason"))
+
+    def stream(self, settings, state, tools):
+        client = self._client(settings)
+        body = self._body(state, tools)
+        usage = {}
+        with metrics_service.span("llm", "bedrock", settings.bedrock_model_id), llm_gateway_service.stream(
+            "bedrock", lambda: client.invoke_model_with_response_stream(modelId=settings.bedrock_model_id, body=body)
+        ) as response:
+
+            # Rebuild the content blocks from the stream so the turn can be replayed
+            content = []
+            partial_json = {}
+            stop_reason = None
+            for stream_event in response["body"]:
+                chunk = json.loads(stream_event["chunk"]["bytes"])
+                chunk_type = chunk.get("type")
+
+                if chunk_type == "content_block_start":
+                    block = dict(chunk["content_block"])
+                    if block["type"] == "tool_use":
+                        block["input"] = {}
+                        partial_json[chunk["index"]] = ""
+                    content.append(block)
+                elif chunk_type == "content_block_delta":
+                    delta = chunk["delta"]
+                    if delta["type"] == "text_delta":
+                        content[chunk["index"]]["text"] += delta["text"]
+                        yield {"type": "token", "text": delta["text"]}
+                    elif delta["type"] == "input_json_delta":
+                        partial_json[chunk["index"]] += delta["partial_json"]
+                elif chunk_type == "content_block_stop":
+                    if chunk["index"] in partial_json:
+                        raw = partial_json.pop(chunk["index"])
+                        content[chunk["index"]]["input"] = json.loads(raw) if raw else {}
+                elif chunk_type == "message_start":
+                    usage.update(chunk["message"].get("usage", {}))
+                elif chunk_type == "message_delta":
+                    stop_reason = chunk["delta"].get("stop_reason", stop_reason)
+                    usage.update(chunk.get("usage", {}))
+        metrics_service.record_tokens("bedrock", settings.bedrock_model_id, usage.get("input_tokens"), usage.get("output_tokens"))
+        return self._turn(content, stop_reason)
+
+    def add_turn(self, state, turn, results):
+        state["messages"].append(turn["message"])
+        state["messages"].append({"role": "user", "content": [{
+            "type": "tool_result",
+            "tool_use_id": call["id"],
+            "content": str(result)
+        } for call, result in zip(turn["calls"], results)]})
+
+class OpenAIAdapter(ProviderAdapter):
+    """OpenAI chat completions with function tools"""
+    name = "openai"
+
+    def model(self, settings):
+        return settings.openai_model
+
+    def check(self, settings):
+        return None if settings.openai_api_key else "AI Configuration Error: OpenAI API Key not configured."
+
+    def convert_tools(self, tools):
+        return [{
+            "type": "function",
+            "function": {"name": tool["name"], "description": tool["description"], "parameters": tool["input_schema"]}
+        } for tool in tools]
+
+    def start(self, settings, prompt, history, message):
+        static, context_block = prompt
+        # Static prompt first so OpenAI's automatic prefix caching can reuse it across requests
+        messages = [{"role": "system", "content": static}]
+        if context_block:
+            messages.append({"role": "system", "content": context_block})
+        return {"messages": messages + list(history) + [{"role": "user", "content": message}]}
+
+    def _turn(self, content, calls):
+        return {
+            "text": content or "",
+            "calls": [{"id": call["id"], "name": call["name"],
+                       "input": json.loads(call["arguments"]) if call["arguments"] else {}} for call in calls],
+            "message": {
+                "role": "assistant",
+                "content": content or None,
+                **({"tool_calls": [{
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": call["arguments"]}
+                } for call in calls]} if calls else {})
+            }
+        }
+
+    def complete(self, settings, state, tools):
+        client = llm_client_service.get_openai(settings.openai_api_key)
+
+        def send(model):
+            with metrics_service.span("llm", "openai", model):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=state["messages"],
+                    tools=tools,
+                    tool_choice="auto"
+                )
+            if response.usage:
+                metrics_service.record_tokens("openai", model, response.usage.prompt_tokens, response.usage.completion_tokens)
+            return response
+
+        response = llm_gateway_service.call("openai", settings.openai_model, send)
+        message = response.choices[0].message
+        calls = [{"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                 for call in message.tool_calls or []]
+        return self._turn(message.content, calls)
+
+    def stream(self, settings, state, tools):
+        client = llm_client_service.get_openai(settings.openai_api_key)
+        with metrics_service.span("llm", "openai", settings.openai_model), llm_gateway_service.stream(
+            "openai", lambda: client.chat.completions.create(
+                model=settings.openai_model,
+                messages=state["messages"],
+                tools=tools,
+                tool_choice="auto",
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        ) as stream:
+
+            content = ""
+            tool_calls = {}  # index -> {"id", "name", "arguments"}
+            for chunk in stream:
+                if chunk.usage:
+                    metrics_service.record_tokens("openai", settings.openai_model,
+                                                  chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content += delta.content
+                    yield {"type": "token", "text": delta.content}
+                for call in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+                    if call.id:
+                        entry["id"] = call.id
+                    if call.function and call.function.name:
+                        entry["name"] += call.function.name
+                    if call.function and call.function.arguments:
+                        entry["arguments"] += call.function.arguments
+        return self._turn(content, [tool_calls[i] for i in sorted(tool_calls)])
+
+    def add_turn(self, state, turn, results):
+        state["messages"].append(turn["message"])
+        for call, result in zip(turn["calls"], results):
+            state["messages"].append({
+                "tool_call_id": call["id"],
+                "role": "tool",
+                "name": call["name"],
+                "content": str(result),
+            })
+
+class GeminiAdapter(ProviderAdapter):
+    """Gemini generateContent with function declarations"""
+    name = "gemini"
+
+    def model(self, settings):
+        return settings.gemini_model
+
+    def check(self, settings):
+        return None if settings.gemini_api_key else "AI Configuration Error: Gemini API Key not configured."
+
+    def _schema(self, schema):
+        """JSON schema to Gemini's OpenAPI subset: upper-case types, no empty properties/required"""
+        converted = {}
+        for key, value in schema.items():
+            if key == "type":
+                converted["type"] = value.upper()
+            elif key == "properties":
+                if value:
+                    converted["properties"] = {name: self._schema(prop) for name, prop in value.items()}
+            elif key == "items":
+                converted["items"] = self._schema(value)
+            elif key == "required":
+                if value:
+                    converted["required"] = list(value)
+            else:
+                converted[key] = value
+        return converted
+
+    def convert_tools(self, tools):
+        declarations = []
+        for tool in tools:
+            declaration = {"name": tool["name"], "description": tool["description"]}
+            parameters = self._schema(tool["input_schema"])
+            # Gemini rejects OBJECT parameters without properties
+            if parameters.get("properties"):
+                declaration["parameters"] = parameters
+            declarations.append(declaration)
+        return [{"function_declarations": declarations}]
+
+    def start(self, settings, prompt, history, message):
+        static, context_block = prompt
+        contents = [{"role": "user" if turn["role"] == "user" else "model", "parts": [{"text": turn["content"]}]}
+                    for turn in history]
+        contents.append({"role": "user", "parts": [{"text": message}]})
+        return {"system": static + "\n\n" + context_block if context_block else static, "contents": contents}
+
+    def _model(self, settings, model_name, state):
+        return llm_client_service.get_gemini(settings.gemini_api_key, model_name, system_instruction=state["system"])
+
+    def _parts(self, response, texts, calls):
+        """Collect text and function calls from a response or stream chunk (response.text fails on function calls)"""
+        for candidate in response.candidates[:1]:
+            for part in candidate.content.parts:
+                if part.text:
+                    texts.append(part.text)
+                if "function_call" in part:
+                    calls.append({"id": f"call_{len(calls)}", "name": part.function_call.name,
+                                  "input": _plain(part.function_call.args)})
+
+    def _turn(self, texts, calls):
+        parts = [{"text": "".join(texts)}] if texts else []
+        parts += [{"function_call": {"name": call["name"], "args": call["input"]}} for call in calls]
+        return {"text": "".join(texts), "calls": calls, "message": {"role": "model", "parts": parts}}
+
+    def _record_usage(self, model_name, usage):
+        if usage:
+            metrics_service.record_tokens("gemini", model_name, usage.prompt_token_count, usage.candidates_token_count)
+
+    def complete(self, settings, state, tools):
+        def send(model_name):
+            with metrics_service.span("llm", "gemini", model_name):
+                response = self._model(settings, model_name, state).generate_content(state["contents"], tools=tools)
+            self._record_usage(model_name, getattr(response, "usage_metadata", None))
+            return response
+
+        response = llm_gateway_service.call("gemini", settings.gemini_model, send)
+        texts, calls = [], []
+        self._parts(response, texts, calls)
+        return self._turn(texts, calls)
+
+    def stream(self, settings, state, tools):
+        model = self._model(settings, settings.gemini_model, state)
+        texts, calls = [], []
+        usage = None
+        with metrics_service.span("llm", "gemini", settings.gemini_model), llm_gateway_service.stream(
+            "gemini", lambda: model.generate_content(state["contents"], tools=tools, stream=True)
+        ) as chunks:
+            for chunk in chunks:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                seen = len(texts)
+                self._parts(chunk, texts, calls)
+                for text in texts[seen:]:
+                    yield {"type": "token", "text": text}
+        self._record_usage(settings.gemini_model, usage)
+        return self._turn(texts, calls)
+
+    def add_turn(self, state, turn, results):
+        state["contents"].append(turn["message"])
+        # Gemini pairs responses with calls by name and order
+        state["contents"].append({"role": "user", "parts": [
+            {"function_response": {"name": call["name"], "response": {"result": str(result)}}}
+            for call, result in zip(turn["calls"], results)
+        ]})
+
+class LLMAdapterService:
+    """
+    Registry of provider adapters for the agent loop in AIService. Tool
+    schemas are converted to each provider's format once and cached, so a
+    request only pays for the conversion the first time a provider is used.
+    Adding a provider means registering another ProviderAdapter.
+    """
+    def __init__(self):
+        self._adapters = {}
+        self._tools = {}  # provider -> converted tools
+        self._lock = threading.Lock()
+        for adapter in (BedrockAdapter, OpenAIAdapter, GeminiAdapter):
+            self.register(adapter)
+
+    def register(self, adapter):
+        """Register a ProviderAdapter class or instance; abstract methods left unimplemented fail here"""
+        if isinstance(adapter, type):
+            adapter = adapter()  # TypeError for an incomplete adapter
+        if not isinstance(adapter, ProviderAdapter) or not adapter.name:
+            raise TypeError(f"{adapter!r} is not a named ProviderAdapter")
+        with self._lock:
+            self._adapters[adapter.name] = adapter
+            self._tools.pop(adapter.name, None)
+
+    def get(self, provider):
+        return self._adapters.get(provider)
+
+    def tools(self, provider, tools):
+        """`tools` converted for `provider`, built on first use and kept until invalidate_tools()"""
+        converted = self._tools.get(provider)
+        if converted is not None:
+            return converted
+        with self._lock:
+            if provider not in self._tools:
+                self._tools[provider] = self._adapters[provider].convert_tools(tools)
+                logger.info(f"Converted {len(tools)} tool schemas for {provider}")
+            return self._tools[provider]
+
+    def invalidate_tools(self, provider=None):
+        """Drop converted tool schemas (all providers by default) after the tool list changes"""
+        with self._lock:
+            if provider is None:
+                self._tools.clear()
+            else:
+                self._tools.pop(provider, None)
+
+llm_adapter_service = LLMAdapterService()
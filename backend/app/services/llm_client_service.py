@@ -0,0 +1,103 @@
+import os
+import hashlib
+import logging
+import threading
+from .config_service import config_service
+
+logger = logging.getLogger(__name__)
+
+class LLMClientService:
+    """
+    Registry of provider SDK clients. Each client is built once for a given
+    set of credentials/settings and reused across requests, so TLS sessions,
+    HTTP connection pools, credential resolution and botocore service models
+    are paid for once instead of on every chat. A client is rebuilt only when
+    its settings change.
+    """
+    def __init__(self):
+        self.max_pool_connections = int(os.getenv("LLM_MAX_POOL_CONNECTIONS", "50"))
+        # Per-attempt timeout; retries and backoff are left to LLMGatewayService
+        self.request_timeout = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+        self._clients = {}  # provider -> (fingerprint, client)
+        self._lock = threading.Lock()
+        self.builds = 0
+        # Drop clients built from an older config version
+        config_service.subscribe(lambda version, config: self.clear())
+
+    def _fingerprint(self, *settings):
+        return hashlib.sha256(repr(settings).encode()).hexdigest()
+
+    def _get(self, provider, fingerprint, build):
+        entry = self._clients.get(provider)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+
+        # Client construction (boto3 sessions in particular) is not thread-safe
+        with self._lock:
+            entry = self._clients.get(provider)
+            if entry and entry[0] == fingerprint:
+                return entry[1]
+            client = build()
+            self._clients[provider] = (fingerprint, client)
+            self.builds += 1
+            logger.info(f"Built {provider} client")
+            return client
+
+    def get_bedrock(self, region, access_key=None, secret_key=None):
+        bearer_token = os.getenv("BEDROCK_API_KEY")
+        # Optional endpoint overrides (VPC endpoints, proxies, local stubs)
+        endpoint_url = os.getenv("BEDROCK_ENDPOINT_URL") or None
+
+        def build():
+            import boto3
+            from botocore.config import Config
+
+            client_config = Config(max_pool_connections=self.max_pool_connections, tcp_keepalive=True,
+                                   connect_timeout=10, read_timeout=self.request_timeout,
+                                   retries={"max_attempts": 1, "mode": "standard"})
+            if access_key and secret_key:
+                return boto3.client(
+                    service_name='bedrock-runtime',
+                    region_name=region,
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    endpoint_url=endpoint_url,
+                    config=client_config
+                )
+            if bearer_token:
+                os.environ['AWS_BEARER_TOKEN_BEDROCK'] = bearer_token
+            # Bearer token or default credentials chain
+            return boto3.client(service_name='bedrock-runtime', region_name=region, endpoint_url=endpoint_url,
+                                config=client_config)
+
+        return self._get("bedrock", self._fingerprint(region, access_key, secret_key, bearer_token, endpoint_url), build)
+
+    def get_openai(self, api_key):
+        base_url = os.getenv("OPENAI_BASE_URL") or None
+
+        def build():
+            from openai import OpenAI
+            return OpenAI(api_key=api_key, base_url=base_url, timeout=self.request_timeout, max_retries=0)
+
+        return self._get("openai", self._fingerprint(api_key, base_url), build)
+
+    def get_gemini(self, api_key, model_name, system_instruction=None):
+        api_endpoint = os.getenv("GEMINI_API_ENDPOINT") or None
+
+        def build():
+            import google.generativeai as genai
+            if api_endpoint:
+                genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": api_endpoint})
+            else:
+                genai.configure(api_key=api_key)
+            return genai
+
+        genai = self._get("gemini", self._fingerprint(api_key, api_endpoint), build)
+        # Models are cheap views over the configured client: one per model and system prompt
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+llm_client_service = LLMClientService()
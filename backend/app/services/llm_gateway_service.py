@@ -0,0 +1,272 @@
+import os
+import time
+import random
+import logging
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .metrics_service import metrics_service
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("bedrock", "openai", "gemini")
+
+# Provider error codes / exception class names worth retrying (throttling and transient 5xx)
+RETRYABLE_CODES = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+    "ModelNotReadyException", "InternalServerException", "ModelTimeoutException"
+}
+RETRYABLE_CLASSES = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests",
+    "ReadTimeoutError", "ConnectTimeoutError", "EndpointConnectionError"
+}
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+# Deadline (time.monotonic()) of the chat request being served
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+def retry_reason(error):
+    """Short reason if `error` is a throttling/transient provider error, else None"""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):  # botocore ClientError
+        code = response.get("Error", {}).get("Code")
+        if code in RETRYABLE_CODES:
+            return code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return str(status)
+    name = type(error).__name__
+    return name if name in RETRYABLE_CLASSES else None
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's HTTP response, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Requests-per-second limiter; take() waits for a token until the deadline"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, deadline):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait_for > deadline:
+                raise LLMDeadlineExceeded("Deadline reached while waiting for the LLM rate limit")
+            time.sleep(wait_for)
+
+class LLMGatewayService:
+    """
+    Admission control for LLM provider calls, per provider:
+    - token-bucket rate limit (LLM_RATE_LIMIT_<PROVIDER> requests/second,
+      split between worker processes when state is shared),
+    - at most LLM_MAX_CONCURRENCY_<PROVIDER> calls in flight; callers queue
+      on a semaphore (queue depth and in-flight calls are exported as gauges),
+    - retries of throttling and transient errors with exponential backoff and
+      full jitter (honouring Retry-After), within LLM_MAX_RETRIES,
+    - a deadline per chat request (LLM_CALL_TIMEOUT) that bounds queueing,
+      backoff and retries,
+    - optional hedging: if a call is still running after LLM_HEDGE_AFTER
+      seconds, the same request is sent to LLM_HEDGE_MODEL_<PROVIDER> and
+      the first successful answer wins.
+    The SDK clients are built with their own retries disabled (see
+    LLMClientService) so backoff is decided here.
+    """
+    def __init__(self):
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.backoff_base = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+        # Shared with ExecutorService.llm_timeout: the whole chat, not one HTTP request
+        self.deadline_seconds = float(os.getenv("LLM_CALL_TIMEOUT", "180"))
+        self.hedge_after = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # 0 disables hedging
+
+        workers = max(1, shared_state_service.workers) if shared_state_service.shared else 1
+        self._buckets = {}
+        self._slots = {}
+        self.hedge_models = {}
+        self.limits = {}
+        for provider in PROVIDERS:
+            prefix = provider.upper()
+            rate = float(os.getenv(f"LLM_RATE_LIMIT_{prefix}", os.getenv("LLM_RATE_LIMIT", "0")))
+            concurrency = int(os.getenv(f"LLM_MAX_CONCURRENCY_{prefix}", os.getenv("LLM_MAX_CONCURRENCY", "16")))
+            if rate > 0:
+                self._buckets[provider] = TokenBucket(rate / workers, float(os.getenv("LLM_RATE_BURST", "0")) or rate / workers)
+            self._slots[provider] = threading.BoundedSemaphore(concurrency)
+            self.hedge_models[provider] = os.getenv(f"LLM_HEDGE_MODEL_{prefix}") or None
+            self.limits[provider] = {"rate_per_second": rate / workers if rate > 0 else None, "max_concurrency": concurrency}
+
+        self._queued = {p: 0 for p in PROVIDERS}
+        self._in_flight = {p: 0 for p in PROVIDERS}
+        self._counts_lock = threading.Lock()
+        # Every LLM pool thread can have a primary and a backup in flight, plus losing calls that are
+        # still holding a provider slot; a smaller pool would queue primaries behind each other
+        default_hedge_workers = 2 * int(os.getenv("LLM_MAX_WORKERS", "32")) + max(l["max_concurrency"] for l in self.limits.values())
+        self.hedge_workers = int(os.getenv("LLM_HEDGE_WORKERS", "0")) or default_hedge_workers
+        self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix="llm-hedge")
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # --- deadlines ---
+
+    @contextlib.contextmanager
+    def deadline(self, seconds=None):
+        """Bound every LLM call made inside the block (a no-op if an outer block already set one)"""
+        if _deadline.get() is not None:
+            yield
+            return
+        token = _deadline.set(time.monotonic() + (seconds or self.deadline_seconds))
+        try:
+            yield
+        finally:
+            try:
+                _deadline.reset(token)
+            except ValueError:
+                # Streaming generators can be closed from another context
+                _deadline.set(None)
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM request deadline exceeded")
+        return remaining
+
+    # --- admission ---
+
+    def _count(self, counts, provider, delta):
+        with self._counts_lock:
+            counts[provider] += delta
+        if counts is self._queued:
+            metrics_service.track_llm_queue(provider, delta)
+        else:
+            metrics_service.track_llm_in_flight(provider, delta)
+
+    @contextlib.contextmanager
+    def _slot(self, provider, deadline):
+        """Rate-limit token plus a concurrency slot, waited for no longer than the deadline"""
+        self._count(self._queued, provider, 1)
+        try:
+            bucket = self._buckets.get(provider)
+            if bucket:
+                bucket.take(deadline)
+            if not self._slots[provider].acquire(timeout=self._remaining(deadline)):
+                raise LLMDeadlineExceeded(f"Deadline reached while queued for a {provider} slot")
+        finally:
+            self._count(self._queued, provider, -1)
+        self._count(self._in_flight, provider, 1)
+        try:
+            yield
+        finally:
+            self._count(self._in_flight, provider, -1)
+            self._slots[provider].release()
+
+    def _with_retries(self, provider, attempt, deadline):
+        """Run attempt() until it succeeds, fails for good, runs out of retries or hits the deadline"""
+        for number in range(self.max_retries + 1):
+            try:
+                return attempt()
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or number == self.max_retries:
+                    raise
+                delay = retry_after(e) or random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** number))
+                remaining = self._remaining(deadline)
+                if remaining is not None and delay >= remaining:
+                    raise
+                with self._counts_lock:
+                    self.retries += 1
+                metrics_service.record_llm_retry(provider, reason)
+                logger.warning(f"{provider} call failed ({reason}), retry {number + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    # --- calls ---
+
+    def call(self, provider, model, send):
+        """
+        Run send(model), which makes one provider request and returns its parsed
+        response, under the rate limit, concurrency cap, retries and deadline;
+        hedged to the provider's hedge model when configured. send() should
+        record token usage itself, under the model it was given, since a
+        hedged request may be answered by the fallback model.
+        """
+        deadline = _deadline.get()
+
+        def run(model_id):
+            def attempt():
+                with self._slot(provider, deadline):
+                    return send(model_id)
+            return self._with_retries(provider, attempt, deadline)
+
+        hedge_model = self.hedge_models.get(provider)
+        if not (self.hedge_after > 0 and hedge_model and hedge_model != model):
+            return run(model)
+        return self._hedged(provider, model, hedge_model, run, deadline)
+
+    def _hedged(self, provider, model, hedge_model, run, deadline):
+        primary = self._hedge_pool.submit(contextvars.copy_context().run, run, model)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        with self._counts_lock:
+            self.hedges += 1
+        logger.info(f"{provider} {model} still running after {self.hedge_after}s, hedging to {hedge_model}")
+        backup = self._hedge_pool.submit(contextvars.copy_context().run, run, hedge_model)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=self._remaining(deadline), return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMDeadlineExceeded("LLM request deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    # The slower call keeps running in the background; its answer is dropped
+                    won = future is backup
+                    with self._counts_lock:
+                        self.hedge_wins += int(won)
+                    metrics_service.record_llm_hedge(provider, "hedge" if won else "primary")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @contextlib.contextmanager
+    def stream(self, provider, open_stream):
+        """
+        Open a streaming response (open_stream() starts it) with retries; the
+        concurrency slot is held until the block has consumed the stream.
+        Streams are not hedged.
+        """
+        deadline = _deadline.get()
+        with self._slot(provider, deadline):
+            yield self._with_retries(provider, open_stream, deadline)
+
+    def stats(self):
+        with self._counts_lock:
+            return {
+                provider: {"queued": self._queued[provider], "in_flight": self._in_flight[provider], **self.limits[provider]}
+                for provider in PROVIDERS
+            } | {"retries": self.retries, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+llm_gateway_service = LLMGatewayService()
@@ -0,0 +1,306 @@
+import os
+import time
+import copy
+import bisect
+import logging
+import threading
+import contextlib
+import contextvars
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the upper buckets cover multi-turn LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Spans recorded while serving the current HTTP request: [(kind, detail, seconds)]
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+_NOOP_SPAN = contextlib.nullcontext()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    """Series keyed by label values; snapshots of other workers can be merged in for rendering"""
+    kind = None
+
+    def __init__(self, name, description, labelnames):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """JSON-friendly copy of the series: [[labelvalues, value], ...]"""
+        with self._lock:
+            return [[list(k), list(v) if isinstance(v, list) else v] for k, v in self._series.items()]
+
+    def merged(self, snapshots):
+        """A copy of this metric with the series of `snapshots` added to its own"""
+        merged = copy.copy(self)
+        merged._lock = threading.Lock()
+        with self._lock:
+            merged._series = {k: list(v) if isinstance(v, list) else v for k, v in self._series.items()}
+        for snapshot in snapshots:
+            for labelvalues, value in snapshot:
+                key = tuple(labelvalues)
+                current = merged._series.get(key)
+                merged._series[key] = value if current is None else self._combine(current, value)
+        return merged
+
+    def _combine(self, a, b):
+        return a + b
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = dict(self._series)
+        for labelvalues, value in sorted(series.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    """Prometheus histogram with a fixed label set"""
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = buckets  # series: label values -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, value, labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def _combine(self, a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labelvalues, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+class Counter(_Metric):
+    """Prometheus counter with a fixed label set"""
+    kind = "counter"
+
+    def inc(self, amount, labelvalues):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+class Gauge(_Metric):
+    """Prometheus gauge with a fixed label set"""
+    kind = "gauge"
+
+    def add(self, amount, labelvalues):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+class MetricsService:
+    """
+    Timing instrumentation for the hot paths: Zabbix RPCs, LLM provider
+    calls (with token usage), tool executions, config loads and HTTP requests.
+    span() observes a Prometheus histogram (served on /metrics), records the
+    span for the current request's Server-Timing header when
+    METRICS_DEBUG_HEADER is on, and exports an OpenTelemetry span when
+    OTLP_ENDPOINT is set (requires opentelemetry-sdk and the OTLP exporter).
+    With all three off, span() returns a shared no-op context manager.
+    Series are kept per process. With several workers each one claims a
+    slot, publishes its snapshot to the shared state backend every
+    METRICS_PUBLISH_INTERVAL seconds, and /metrics sums the live snapshots
+    of all slots, so any worker serves deployment-wide totals.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+        self.debug_header = os.getenv("METRICS_DEBUG_HEADER", "False").lower() == "true"
+        self.otlp_endpoint = os.getenv("OTLP_ENDPOINT") or None
+        self.publish_interval = float(os.getenv("METRICS_PUBLISH_INTERVAL", "15"))
+        self._slot = None  # this worker's index among the published snapshots
+
+        # span kind -> histogram; the first label is also the Server-Timing description
+        self.histograms = {
+            "http": Histogram("http_request_duration_seconds", "HTTP request duration", ("route", "method", "status")),
+            "zabbix": Histogram("zabbix_rpc_duration_seconds", "Zabbix JSON-RPC call duration", ("method",)),
+            "llm": Histogram("llm_request_duration_seconds", "LLM provider call duration", ("provider", "model")),
+            "tool": Histogram("tool_duration_seconds", "Agent tool execution duration", ("tool",)),
+            "config": Histogram("config_load_duration_seconds", "Config file load/save duration", ("operation",))
+        }
+        self.llm_tokens = Counter("llm_tokens_total", "LLM tokens reported by the provider", ("provider", "model", "direction"))
+        self.llm_queue_depth = Gauge("llm_queue_depth", "LLM calls waiting for a rate-limit token or concurrency slot", ("provider",))
+        self.llm_in_flight = Gauge("llm_in_flight", "LLM calls in progress", ("provider",))
+        self.llm_retries = Counter("llm_retries_total", "LLM calls retried after throttling or transient errors", ("provider", "reason"))
+        self.llm_hedges = Counter("llm_hedged_requests_total", "Hedged LLM calls by the request that answered first", ("provider", "winner"))
+
+        self._tracer = self._setup_tracing() if self.otlp_endpoint else None
+        self.active = self.enabled or self.debug_header or self._tracer is not None
+
+    def _setup_tracing(self):
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("OTLP_ENDPOINT is set but opentelemetry-sdk / opentelemetry-exporter-otlp are not installed")
+            return None
+
+        provider = TracerProvider(resource=Resource.create({"service.name": "zabbix-ai-agent"}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=self.otlp_endpoint)))
+        trace.set_tracer_provider(provider)
+        logger.info(f"Exporting traces to {self.otlp_endpoint}")
+        return trace.get_tracer(__name__)
+
+    def span(self, kind, *labelvalues):
+        """Time a block; labelvalues follow the label names of the `kind` histogram"""
+        if not self.active:
+            return _NOOP_SPAN
+        return self._span(kind, labelvalues)
+
+    @contextlib.contextmanager
+    def _span(self, kind, labelvalues):
+        histogram = self.histograms[kind]
+        otel_span = None
+        if self._tracer is not None:
+            otel_span = self._tracer.start_as_current_span(
+                f"{kind} {labelvalues[0]}" if labelvalues else kind,
+                attributes=dict(zip(histogram.labelnames, map(str, labelvalues)))
+            )
+            otel_span.__enter__()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.enabled:
+                histogram.observe(elapsed, tuple(str(v) for v in labelvalues))
+            spans = _request_spans.get()
+            if spans is not None:
+                spans.append((kind, labelvalues[0] if labelvalues else "", elapsed))
+            if otel_span is not None:
+                otel_span.__exit__(None, None, None)
+
+    def record_tokens(self, provider, model, input_tokens, output_tokens):
+        if not self.enabled:
+            return
+        if input_tokens:
+            self.llm_tokens.inc(int(input_tokens), (provider, model, "input"))
+        if output_tokens:
+            self.llm_tokens.inc(int(output_tokens), (provider, model, "output"))
+
+    # --- LLM gateway ---
+
+    def track_llm_queue(self, provider, delta):
+        if self.enabled:
+            self.llm_queue_depth.add(delta, (provider,))
+
+    def track_llm_in_flight(self, provider, delta):
+        if self.enabled:
+            self.llm_in_flight.add(delta, (provider,))
+
+    def record_llm_retry(self, provider, reason):
+        if self.enabled:
+            self.llm_retries.inc(1, (provider, reason))
+
+    def record_llm_hedge(self, provider, winner):
+        if self.enabled:
+            self.llm_hedges.inc(1, (provider, winner))
+
+    # --- per-request breakdown ---
+
+    def start_request(self):
+        """Collect spans for the current request (contexts copied to worker threads share the list)"""
+        spans = [] if self.debug_header else None
+        return spans, _request_spans.set(spans)
+
+    def end_request(self, token):
+        _request_spans.reset(token)
+
+    def request_timing(self, total):
+        """Server-Timing value for the spans of the current request so far, or None when not collected"""
+        spans = _request_spans.get()
+        return self.server_timing(spans, total) if spans is not None else None
+
+    def server_timing(self, spans, total):
+        """Server-Timing header value: time per span kind and detail, plus the total"""
+        totals = {}
+        for kind, detail, elapsed in spans:
+            entry = totals.setdefault((kind, detail), [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+        parts = [f'{kind};desc="{_escape(detail)} x{count}";dur={elapsed * 1000:.1f}'
+                 for (kind, detail), (elapsed, count) in sorted(totals.items(), key=lambda i: -i[1][0])]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    # --- aggregation across worker processes ---
+
+    def _metrics(self):
+        return list(self.histograms.values()) + [
+            self.llm_tokens, self.llm_queue_depth, self.llm_in_flight, self.llm_retries, self.llm_hedges
+        ]
+
+    def _claim_slot(self, ttl):
+        """Renew this worker's slot lease, or take the first free one"""
+        candidates = [self._slot] if self._slot is not None else []
+        candidates += [i for i in range(shared_state_service.workers) if i != self._slot]
+        for slot in candidates:
+            if shared_state_service.is_leader(f"metrics_slot_{slot}", ttl=ttl):
+                self._slot = slot
+                return slot
+        self._slot = None
+        return None
+
+    def publish(self):
+        """Publish this worker's series for the other workers' /metrics"""
+        if not self.enabled or not shared_state_service.shared:
+            return
+        ttl = 3 * self.publish_interval
+        slot = self._claim_slot(ttl)
+        if slot is None:
+            logger.warning("No free metrics slot; this worker's series are only served by its own /metrics")
+            return
+        snapshot = {metric.name: metric.snapshot() for metric in self._metrics()}
+        shared_state_service.set(f"metrics:worker:{slot}", snapshot, ttl=ttl)
+
+    def release_slot(self):
+        if self._slot is not None:
+            shared_state_service.delete(f"metrics:worker:{self._slot}")
+            shared_state_service.release(f"metrics_slot_{self._slot}")
+            self._slot = None
+
+    def render(self):
+        metrics = self._metrics()
+        if self.enabled and shared_state_service.shared:
+            self.publish()
+            # Expired snapshots (workers that stopped) drop out; a restart shows as a counter reset
+            others = [shared_state_service.get(f"metrics:worker:{slot}")
+                      for slot in range(shared_state_service.workers) if slot != self._slot]
+            others = [snapshot for snapshot in others if snapshot]
+            metrics = [metric.merged([snapshot.get(metric.name, []) for snapshot in others]) for metric in metrics]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics_service = MetricsService()
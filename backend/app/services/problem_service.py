@@ -0,0 +1,212 @@
+import os
+import time
+import logging
+import threading
+from .zabbix_service import zabbix_service
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+class ProblemService:
+    """
+    In-memory table of active Zabbix problems, kept current by a background
+    sync instead of running problem.get on every request.
+    Each sync fetches only events newer than the last seen eventid, plus a
+    narrow re-check (severity / acknowledged / suppressed) of the problems
+    already in the table; problems no longer returned were resolved.
+    Zabbix can also push changes to POST /api/webhooks/zabbix, which are
+    applied immediately and reconciled by the next sync.
+    The table is indexed by host, severity and acknowledged state.
+    With several worker processes, one worker runs the sync and publishes
+    the table to the shared state backend; the others load it when its
+    version changes (follow()).
+    """
+    def __init__(self):
+        self.enabled = os.getenv("PROBLEM_INGESTION_ENABLED", "True").lower() == "true"
+        self.sync_interval = int(os.getenv("PROBLEM_SYNC_INTERVAL", "10"))
+        self.webhook_token = os.getenv("PROBLEM_WEBHOOK_TOKEN") or None
+        self.chunk_size = int(os.getenv("ZABBIX_BULK_CHUNK_SIZE", "500"))
+
+        self._problems = {}  # eventid -> problem dict
+        self._by_host = {}  # hostid -> set(eventid)
+        self._by_severity = {}  # severity -> set(eventid)
+        self._by_ack = {}  # "0"/"1" -> set(eventid)
+        self._lock = threading.Lock()
+        self.last_eventid = 0
+        self.last_sync = None
+        self.shared_version = 0
+
+    # --- index maintenance (callers hold the lock) ---
+
+    def _index(self, problem):
+        eventid = problem["eventid"]
+        self._problems[eventid] = problem
+        for host in problem.get("hosts", []):
+            self._by_host.setdefault(host["hostid"], set()).add(eventid)
+        self._by_severity.setdefault(str(problem.get("severity", "0")), set()).add(eventid)
+        self._by_ack.setdefault(str(problem.get("acknowledged", "0")), set()).add(eventid)
+
+    def _unindex(self, eventid):
+        problem = self._problems.pop(eventid, None)
+        if not problem:
+            return
+        for host in problem.get("hosts", []):
+            self._by_host.get(host["hostid"], set()).discard(eventid)
+        self._by_severity.get(str(problem.get("severity", "0")), set()).discard(eventid)
+        self._by_ack.get(str(problem.get("acknowledged", "0")), set()).discard(eventid)
+
+    def _upsert(self, problem):
+        """Insert or merge a problem; returns False when nothing changed"""
+        previous = self._problems.get(problem["eventid"])
+        if previous:
+            merged = {**previous, **problem}
+            if merged == previous:
+                return False
+            self._unindex(problem["eventid"])
+            problem = merged
+        self._index(problem)
+        return True
+
+    # --- ingestion ---
+
+    def sync(self):
+        """Fetch new problems and refresh the state of known ones"""
+        self.follow()  # Adopt webhook updates other workers published
+        zabbix_service.connect()
+        api = zabbix_service.api
+
+        new_problems = api.problem.get(
+            output="extend",
+            eventid_from=str(self.last_eventid + 1),
+            selectTags="extend",
+            sortfield=["eventid"],
+            sortorder="ASC"
+        )
+
+        # problem.get cannot return hosts; resolve them for the new events in one event.get
+        hosts_by_event = {}
+        new_ids = [p["eventid"] for p in new_problems]
+        for start in range(0, len(new_ids), self.chunk_size):
+            for event in api.event.get(eventids=new_ids[start:start + self.chunk_size], output=["eventid"],
+                                       selectHosts=["hostid", "name"]):
+                hosts_by_event[event["eventid"]] = event.get("hosts", [])
+
+        with self._lock:
+            known_ids = [eventid for eventid in self._problems if eventid not in hosts_by_event]
+
+        # Narrow re-check of known problems: anything not returned has been resolved
+        still_active = {}
+        for start in range(0, len(known_ids), self.chunk_size):
+            for p in api.problem.get(eventids=known_ids[start:start + self.chunk_size],
+                                     output=["eventid", "severity", "acknowledged", "suppressed"]):
+                still_active[p["eventid"]] = p
+
+        updated = 0
+        with self._lock:
+            first_sync = self.last_sync is None
+            for eventid in known_ids:
+                if eventid in still_active:
+                    updated += self._upsert(still_active[eventid])
+                else:
+                    self._unindex(eventid)
+            for problem in new_problems:
+                problem["hosts"] = hosts_by_event.get(problem["eventid"], [])
+                self._upsert(problem)
+                self.last_eventid = max(self.last_eventid, int(problem["eventid"]))
+            self.last_sync = time.time()
+        # Republish only on a change, so followers do not reload an identical table every interval
+        if first_sync or new_problems or updated or len(still_active) != len(known_ids):
+            self._publish()
+
+        if new_problems or len(still_active) != len(known_ids):
+            logger.info(f"Problem sync: {len(new_problems)} new, {len(known_ids) - len(still_active)} resolved, "
+                        f"{len(self._problems)} active")
+
+    def apply_webhook(self, event):
+        """
+        Apply a Zabbix webhook push. Expected fields: eventid, value (1=problem,
+        0=resolved), and optionally name, severity, acknowledged, clock, hostid, host.
+        """
+        eventid = str(event["eventid"])
+        self.follow()
+        with self._lock:
+            if str(event.get("value", "1")) == "0":
+                if eventid not in self._problems:
+                    return
+                self._unindex(eventid)
+            else:
+                problem = {"eventid": eventid}
+                for field in ("name", "severity", "acknowledged", "clock", "suppressed"):
+                    if event.get(field) is not None:
+                        problem[field] = str(event[field])
+                if event.get("hostid"):
+                    problem["hosts"] = [{"hostid": str(event["hostid"]), "name": event.get("host", "")}]
+                if not self._upsert(problem):
+                    return
+        self._publish()
+
+    # --- sharing between worker processes ---
+
+    def _publish(self):
+        if not shared_state_service.shared:
+            return
+        with self._lock:
+            table = {
+                "problems": list(self._problems.values()),
+                "last_eventid": self.last_eventid,
+                "last_sync": self.last_sync
+            }
+        shared_state_service.set("problems:table", table)
+        self.shared_version = shared_state_service.incr("problems:version")
+
+    def follow(self):
+        """Replace the local table with the published one if another worker changed it"""
+        if not shared_state_service.shared:
+            return
+        version = shared_state_service.get("problems:version") or 0
+        if version == self.shared_version:
+            return
+        table = shared_state_service.get("problems:table")
+        if table is None:
+            return
+        with self._lock:
+            self._problems, self._by_host, self._by_severity, self._by_ack = {}, {}, {}, {}
+            for problem in table["problems"]:
+                self._index(problem)
+            self.last_eventid = table["last_eventid"]
+            self.last_sync = table["last_sync"]
+            self.shared_version = version
+
+    # --- reads ---
+
+    @property
+    def ready(self):
+        return self.enabled and self.last_sync is not None
+
+    def get_problems(self, hostid=None, severities=None, acknowledged=None, limit=None):
+        """
+        Active problems, newest first, filtered through the indexes.
+        Falls back to a direct problem.get until the first sync completed.
+        """
+        if not self.ready:
+            return zabbix_service.get_problems()
+
+        with self._lock:
+            ids = None
+            if hostid is not None:
+                ids = set(self._by_host.get(str(hostid), set()))
+            if severities is not None:
+                matching = set().union(*(self._by_severity.get(str(s), set()) for s in severities))
+                ids = matching if ids is None else ids & matching
+            if acknowledged is not None:
+                matching = self._by_ack.get("1" if acknowledged else "0", set())
+                ids = set(matching) if ids is None else ids & matching
+            problems = list(self._problems.values()) if ids is None else [self._problems[i] for i in ids]
+
+        problems.sort(key=lambda p: int(p["eventid"]), reverse=True)
+        return problems[:limit] if limit else problems
+
+    def count(self):
+        return len(self._problems)
+
+problem_service = ProblemService()
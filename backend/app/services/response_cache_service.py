@@ -0,0 +1,125 @@
+import os
+import re
+import time
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from .host_index_service import host_index_service
+
+logger = logging.getLogger(__name__)
+
+def normalize_message(message):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+_TOKEN = re.compile(r"[\w][\w.:\-/]*[\w]|\w")
+
+def identifiers(message):
+    """
+    Tokens that name a specific thing: anything with a digit (IPs, event IDs,
+    numbered hosts), dotted/dashed names, and words that are known host names.
+    Two questions only count as near-duplicates if these match exactly.
+    """
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    found = set()
+    for token in _TOKEN.findall(text):
+        if any(c.isdigit() for c in token) or any(c in token for c in ".-_:/") or host_index_service.resolve(token):
+            found.add(token)
+    return frozenset(found)
+
+def shingles(normalized):
+    """Word unigrams and bigrams of a normalized message"""
+    words = normalized.split()
+    return frozenset(words) | frozenset(zip(words, words[1:]))
+
+def context_fingerprint(context):
+    """Fingerprint of the Zabbix state a reply was based on: problem event IDs and host count"""
+    context = context or {}
+    problems = sorted(str(p.get("eventid") or p.get("name")) for p in context.get("active_problems", []))
+    state = [context.get("active_problems_count", 0), context.get("total_hosts", 0), problems]
+    return hashlib.sha1(json.dumps(state).encode()).hexdigest()
+
+class ResponseCacheService:
+    """
+    Caches final LLM replies for repeated questions.
+    Entries are scoped by provider, model, system prompt hash and Zabbix
+    context fingerprint, and keyed by the normalized message. Within a scope,
+    a near-duplicate question (Jaccard similarity of word shingles above
+    RESPONSE_CACHE_SIMILARITY) reuses the stored reply, but only if it names
+    exactly the same identifiers (hosts, IPs, numbers, event IDs), so a
+    question about another host never gets this host's answer. Entries expire after
+    RESPONSE_CACHE_TTL seconds and the least recently used are evicted first.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+        self.ttl = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        self.max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+        self.similarity = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.85"))  # 1.0 disables fuzzy matching
+        self._entries = OrderedDict()  # (scope, normalized) -> (expires_at, shingles, identifiers, reply)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def scope(self, provider, model, system_prompt, context):
+        prompt_hash = hashlib.sha1(system_prompt.encode()).hexdigest()
+        return f"{provider}:{model}:{prompt_hash}:{context_fingerprint(context)}"
+
+    def get(self, scope, message):
+        if not self.enabled:
+            return None
+        normalized = normalize_message(message)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((scope, normalized))
+            if entry and entry[0] > now:
+                self._entries.move_to_end((scope, normalized))
+                self.hits += 1
+                return entry[3]
+
+            if self.similarity < 1.0:
+                wanted = shingles(normalized)
+                names = identifiers(message)
+                for (entry_scope, _), (expires_at, entry_shingles, entry_names, reply) in reversed(self._entries.items()):
+                    if entry_scope != scope or expires_at <= now or not wanted or entry_names != names:
+                        continue
+                    if len(wanted & entry_shingles) / len(wanted | entry_shingles) >= self.similarity:
+                        self.near_hits += 1
+                        return reply
+
+            self.misses += 1
+            return None
+
+    def put(self, scope, message, reply):
+        if not self.enabled:
+            return
+        normalized = normalize_message(message)
+        with self._lock:
+            self._entries[(scope, normalized)] = (time.monotonic() + self.ttl, shingles(normalized), identifiers(message), reply)
+            self._entries.move_to_end((scope, normalized))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses
+            }
+
+response_cache_service = ResponseCacheService()
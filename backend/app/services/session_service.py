@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from .context_service import estimate_tokens
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+def _tool_key(name, args):
+    return name + ":" + json.dumps(args, sort_keys=True, default=str)
+
+class SessionService:
+    """
+    Server-side chat sessions, so follow-up questions keep their history.
+    A session holds the recent turns (user message and final reply text; tool
+    calls are not replayed), a digest of older turns, and a cache of
+    read-only tool results.
+    When the turns exceed SESSION_HISTORY_TOKENS, the oldest pairs are folded
+    into the digest (truncated to one line per turn, oldest lines dropped past
+    SESSION_SUMMARY_TOKENS), so every request carries bounded history.
+    Tool results are reused within SESSION_TOOL_CACHE_TTL seconds. A write
+    tool clears the session's cache.
+    Active sessions live in an LRU of SESSION_MAX_ACTIVE entries. Every turn
+    is written through to SQLite, and evicted sessions are reloaded from
+    there. With several worker processes the SQLite copy is authoritative.
+    Sessions idle for SESSION_TTL seconds are purged.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("SESSIONS_ENABLED", "True").lower() == "true"
+        self.max_active = int(os.getenv("SESSION_MAX_ACTIVE", "200"))
+        self.ttl = int(os.getenv("SESSION_TTL", "86400"))
+        self.history_tokens = int(os.getenv("SESSION_HISTORY_TOKENS", "2000"))
+        self.summary_tokens = int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))
+        self.tool_cache_ttl = int(os.getenv("SESSION_TOOL_CACHE_TTL", "120"))
+        self.tool_cache_max = int(os.getenv("SESSION_TOOL_CACHE_MAX", "32"))
+        default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "sessions.db")
+        self.db_path = os.getenv("SESSION_DB_PATH", default_path)
+
+        self._active = OrderedDict()  # session id -> session dict
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.spilled_loads = 0
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- storage ---
+
+    def _remember(self, session):
+        """Put a session at the head of the LRU (callers hold the lock)"""
+        self._active[session["id"]] = session
+        self._active.move_to_end(session["id"])
+        while len(self._active) > self.max_active:
+            self._active.popitem(last=False)  # already persisted on its last turn
+
+    def _load(self, session_id):
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE id = ? AND updated_at > ?", (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session):
+        """Write a session through to SQLite after a turn"""
+        with self._lock:
+            session["version"] = session.get("version", 0) + 1
+            session["updated_at"] = time.time()
+            data = json.dumps(session, default=str)
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO sessions (id, data, version, updated_at) VALUES (?, ?, ?, ?)",
+                     (session["id"], data, session["version"], session["updated_at"]))
+        self._writes += 1
+        if self._writes % 200 == 0:
+            conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (time.time() - self.ttl,))
+
+    def get_or_create(self, session_id=None):
+        """
+        The session for `session_id`, or a new one if it is missing, expired or not given.
+        New sessions always get a server-generated ID; an unknown client-supplied ID is never adopted.
+        """
+        if session_id:
+            with self._lock:
+                session = self._active.get(session_id)
+            if session is not None and shared_state_service.shared:
+                # Another worker may have served a later turn
+                row = self._conn().execute("SELECT version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                if row and row[0] != session.get("version"):
+                    session = None
+            if session is None:
+                session = self._load(session_id)
+                if session is not None:
+                    self.spilled_loads += 1
+            if session is not None and time.time() - session["updated_at"] <= self.ttl:
+                with self._lock:
+                    self._remember(session)
+                return session
+
+        now = time.time()
+        session = {"id": uuid.uuid4().hex, "created_at": now, "updated_at": now, "version": 0,
+                   "summary": "", "turns": [], "tool_cache": {}}
+        with self._lock:
+            self._remember(session)
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._active.get(session_id)
+        return session or self._load(session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._active.pop(session_id, None)
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    # --- history ---
+
+    def history(self, session):
+        """Recent turns as alternating user/assistant messages"""
+        with self._lock:
+            return [{"role": turn["role"], "content": turn["content"]} for turn in session["turns"]]
+
+    def record_turn(self, session, message, reply):
+        """Append a question/answer pair and fold the oldest pairs into the digest while over budget"""
+        with self._lock:
+            session["turns"].extend([{"role": "user", "content": message}, {"role": "assistant", "content": reply}])
+            used = sum(estimate_tokens(t["content"]) for t in session["turns"])
+            folded = []
+            while used > self.history_tokens and len(session["turns"]) > 2:
+                for turn in session["turns"][:2]:
+                    used -= estimate_tokens(turn["content"])
+                    text = " ".join(turn["content"].split())
+                    folded.append(f"- {'User' if turn['role'] == 'user' else 'Assistant'}: "
+                                  f"{text[:160] + '...' if len(text) > 160 else text}")
+                del session["turns"][:2]
+            if folded:
+                lines = [line for line in session["summary"].split("\n") if line] + folded
+                while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+                    lines.pop(0)
+                session["summary"] = "\n".join(lines)
+        self.save(session)
+
+    # --- per-session tool results ---
+
+    def cached_tool_result(self, session, name, args):
+        with self._lock:
+            entry = session["tool_cache"].get(_tool_key(name, args))
+        if entry and time.time() - entry["at"] <= self.tool_cache_ttl:
+            return entry["result"]
+        return None
+
+    def cache_tool_result(self, session, name, args, result):
+        with self._lock:
+            cache = session["tool_cache"]
+            cache[_tool_key(name, args)] = {"at": time.time(), "result": result}
+            while len(cache) > self.tool_cache_max:
+                cache.pop(next(iter(cache)))
+
+    def clear_tool_cache(self, session):
+        with self._lock:
+            session["tool_cache"].clear()
+
+    def stats(self):
+        return {"active": len(self._active), "loaded_from_disk": self.spilled_loads}
+
+session_service = SessionService()
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """
+    Process-local backend used when the API runs as a single worker.
+    Values are stored as-is; every operation is atomic under one lock.
+    """
+    shared = False
+
+    def __init__(self):
+        self._data = {}  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return entry[1] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else None, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            now = time.time()
+            entry = self._live(key, now)
+            if entry:
+                value, expires_at = entry[1] + amount, entry[0]
+            else:
+                value, expires_at = amount, (now + ttl if ttl else None)
+            self._data[key] = (expires_at, value)
+            return value
+
+    def acquire_lease(self, name, owner, ttl):
+        with self._lock:
+            now = time.time()
+            entry = self._live("lease:" + name, now)
+            if entry and entry[1] != owner:
+                return False
+            self._data["lease:" + name] = (now + ttl, owner)
+            return True
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            entry = self._data.get("lease:" + name)
+            if entry and entry[1] == owner:
+                del self._data["lease:" + name]
+
+class SQLiteBackend:
+    """
+    Shared backend for several worker processes on one machine.
+    A single WAL-mode SQLite file holds a key/value table with optional
+    expiry; values are stored as JSON. Each thread keeps its own connection,
+    and every operation is one statement or one short transaction, so
+    readers never block on writers.
+    """
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge_sometimes(self, conn):
+        # Expired rows are ignored on read; delete them in bulk every few hundred writes
+        self._writes += 1
+        if self._writes % 500 == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None)
+        )
+        self._purge_sometimes(conn)
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        self._conn().execute("DELETE FROM kv WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",))
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            if row:
+                value, expires_at = json.loads(row[0]) + amount, row[1]
+            else:
+                value, expires_at = amount, (now + ttl if ttl else None)
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), expires_at))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._purge_sometimes(conn)
+        return value
+
+    def acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE kv.expires_at <= ? OR kv.value = excluded.value",
+            ("lease:" + name, json.dumps(owner), now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, name, owner):
+        self._conn().execute("DELETE FROM kv WHERE key = ? AND value = ?", ("lease:" + name, json.dumps(owner)))
+
+class SharedStateService:
+    """
+    State that must be consistent across API worker processes: cached Zabbix
+    reads, the Zabbix session, the problem table and summary snapshots,
+    config versions and rate-limit counters.
+    SHARED_STATE_BACKEND selects the backend: "memory" (single process),
+    "sqlite" (several workers on one host, the default when WEB_CONCURRENCY
+    is above 1) or "package.module:ClassName" for a custom implementation
+    exposing the same methods (e.g. one backed by Redis).
+    Background jobs that must run once per deployment are guarded by leases.
+    """
+    def __init__(self):
+        self.workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+        default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "shared_state.db")
+        self.path = os.getenv("SHARED_STATE_PATH", default_path)
+        self.kind = os.getenv("SHARED_STATE_BACKEND", "sqlite" if self.workers > 1 else "memory")
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.backend = self._create_backend(self.kind)
+        logger.info(f"Shared state backend: {self.kind} (owner {self.owner})")
+
+    def _create_backend(self, kind):
+        if kind == "memory":
+            return MemoryBackend()
+        if kind == "sqlite":
+            return SQLiteBackend(self.path)
+        module_name, _, class_name = kind.partition(":")
+        backend_class = getattr(importlib.import_module(module_name), class_name)
+        return backend_class()
+
+    @property
+    def shared(self):
+        """True when state is visible to other worker processes"""
+        return self.backend.shared
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def delete_prefix(self, prefix):
+        self.backend.delete_prefix(prefix)
+
+    def incr(self, key, amount=1, ttl=None):
+        return self.backend.incr(key, amount, ttl)
+
+    def is_leader(self, job, ttl):
+        """Acquire or renew the lease for `job`; only the holder should run it"""
+        return self.backend.acquire_lease(job, self.owner, ttl)
+
+    def release(self, job):
+        self.backend.release_lease(job, self.owner)
+
+    def allow(self, key, limit, window):
+        """Fixed-window rate limit shared by all workers: True while under `limit` hits per `window` seconds"""
+        bucket = int(time.time() // window)
+        return self.incr(f"rate:{key}:{bucket}", 1, ttl=window * 2) <= limit
+
+shared_state_service = SharedStateService()
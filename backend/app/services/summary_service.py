@@ -0,0 +1,154 @@
+import os
+import time
+import json
+import hashlib
+import logging
+import threading
+from .ai_service import ai_service
+from .zabbix_service import zabbix_service
+from .problem_service import problem_service
+from .correlation_service import correlation_service
+from .shared_state_service import shared_state_service
+
+logger = logging.getLogger(__name__)
+
+class SummaryService:
+    """
+    Precomputes the daily summary widget payload in the background.
+    refresh() runs periodically; it rebuilds the summary (including the LLM
+    call) only when the set of active problems changed or the snapshot is
+    older than SUMMARY_MAX_AGE. Requests are served from the last snapshot.
+    If the LLM call fails, the snapshot keeps the previous insights and is
+    rebuilt on the next check.
+    With several worker processes, one worker refreshes and the snapshot is
+    read from the shared state backend by all of them.
+    """
+    def __init__(self):
+        self.check_interval = int(os.getenv("SUMMARY_CHECK_INTERVAL", "60"))
+        self.max_age = int(os.getenv("SUMMARY_MAX_AGE", "900"))
+        self.snapshot = None  # {"payload", "etag", "generated_at", "fingerprint"}
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Last snapshot built by any worker, or None"""
+        if shared_state_service.shared:
+            return shared_state_service.get("summary:snapshot") or self.snapshot
+        return self.snapshot
+
+    def get_snapshot(self):
+        """Last snapshot, building the first one inline if the scheduler has not run yet"""
+        return self.current() or self.refresh()
+
+    def refresh(self, force=False):
+        with self._lock:
+            problems = problem_service.get_problems()
+            fingerprint = hashlib.sha1(
+                json.dumps(sorted((p.get("eventid"), str(p.get("severity")), str(p.get("acknowledged"))) for p in problems)).encode()
+            ).hexdigest()
+
+            current = self.current()
+            if (not force and current and current["fingerprint"] == fingerprint
+                    and time.time() - current["generated_at"] < self.max_age):
+                return current
+
+            host_count = zabbix_service.count_hosts()
+            payload = self._build_summary(problems, host_count)
+            if ai_service._is_error(payload["insights"]):
+                # chat() reports failures as text: keep the last good insights and leave the
+                # fingerprint unset so the next check retries instead of caching the error
+                logger.warning(f"Daily summary insights failed: {payload['insights'][:200]}")
+                payload["insights"] = current["payload"].get("insights") if current else "Análisis de IA no disponible temporalmente."
+                fingerprint = None
+            generated_at = int(time.time())
+            payload["generated_at"] = generated_at
+            body = json.dumps(payload, sort_keys=True)
+            self.snapshot = {
+                "payload": payload,
+                "etag": '"' + hashlib.sha1(body.encode()).hexdigest() + '"',
+                "generated_at": generated_at,
+                "fingerprint": fingerprint
+            }
+            if shared_state_service.shared:
+                shared_state_service.set("summary:snapshot", self.snapshot)
+            logger.info(f"Daily summary regenerated ({len(problems)} problems)")
+            return self.snapshot
+
+    def _build_summary(self, problems, host_count):
+        # Count severities
+        critical_count = sum(1 for p in problems if str(p.get('severity', '0')) in ['4', '5'])
+        high_count = sum(1 for p in problems if str(p.get('severity', '0')) == '3')
+
+        # Identify critical issues: one entry per root-cause group, most severe and largest first
+        clusters = correlation_service.correlate(problems)
+        critical_issues = []
+        for cluster in clusters[:5]:
+            if cluster['severity'] in ['3', '4', '5']:
+                root = cluster['root']
+                since = time.strftime('%d/%m %H:%M', time.localtime(cluster['first_clock']))
+                if cluster['count'] > 1:
+                    description = f"{cluster['count']} eventos relacionados en {cluster['host_count']} host(s) · desde {since}"
+                    if cluster['names'][0] != root['name']:
+                        description += f" · mayormente: {cluster['names'][0]}"
+                else:
+                    description = f"Host: {', '.join(root['hosts']) or '?'} · desde {since}"
+                critical_issues.append({
+                    'name': root['name'],
+                    'severity': cluster['severity'],
+                    'description': description
+                })
+        main_groups = [c['root']['name'] + (f" ({c['count']} eventos, {c['host_count']} hosts)" if c['count'] > 1 else "")
+                       for c in clusters[:5]]
+
+        # Ask AI for insights
+        context_message = f"""Genera un breve análisis (2-3 oraciones) del estado actual de la infraestructura.
+
+Datos actuales:
+- Total hosts: {host_count}
+- Problemas activos: {len(problems)}
+- Problemas críticos: {critical_count}
+- Problemas importantes: {high_count}
+- Grupos de problemas correlacionados: {len(clusters)}
+
+Grupos principales: {'; '.join(main_groups)}
+
+Proporciona solo el análisis, sin encabezados ni formato."""
+
+        ai_insights = ai_service.chat(context_message, {})
+
+        # Build summary response
+        status_label = "🟢 SALUDABLE"
+        status_color = "#dcfce7"
+        status_border = "#10b981"
+
+        if critical_count > 0:
+            status_label = "🔴 CRÍTICO"
+            status_color = "#fee2e2"
+            status_border = "#ef4444"
+        elif high_count > 0 or len(problems) > 3:
+            status_label = "🟡 PRECAUCIÓN"
+            status_color = "#fef3c7"
+            status_border = "#f59e0b"
+
+        return {
+            "title": "Resumen Diario de IA",
+            "overall_status": {
+                "label": status_label,
+                "description": f"{len(problems)} problema(s) activo(s) en {len(clusters)} grupo(s)",
+                "color": status_color,
+                "border_color": status_border
+            },
+            "stats": [
+                {"label": "Hosts Monitoreados", "value": str(host_count), "color": "#3b82f6"},
+                {"label": "Problemas Activos", "value": str(len(problems)), "color": "#f59e0b"},
+                {"label": "Críticos", "value": str(critical_count), "color": "#ef4444"}
+            ],
+            "critical_issues": critical_issues[:3],
+            "recommendations": [
+                "Revisar problemas críticos de inmediato" if critical_count > 0 else "Mantener monitoreo preventivo",
+                "Actualizar Zabbix server si está desactualizado",
+                "Revisar espacio en disco de servidores principales"
+            ],
+            "insights": ai_insights
+        }
+
+summary_service = SummaryService()
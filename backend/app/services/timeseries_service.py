@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+from .zabbix_service import zabbix_service
+
+logger = logging.getLogger(__name__)
+
+CLOCK_DTYPE = np.int64
+VALUE_DTYPE = np.float64
+
+class TimeseriesService:
+    """
+    Local, incremental cache of Zabbix item history.
+    Each item owns two append-only segment files (<itemid>.clock, int64 and
+    <itemid>.value, float64) and index.json records how many rows are
+    committed and the last clock seen. A refresh only asks Zabbix for data
+    newer than that clock. Reads return read-only np.memmap views, so weeks
+    of data can be scanned without copying or re-querying the Zabbix DB.
+    The index is written after the data and reads stop at the committed
+    count; each append first truncates the segments back to that count, so
+    bytes left by a failed append are never read or paired with later rows.
+    Rows that reach Zabbix later than TIMESERIES_LATE_SECONDS, or older than
+    an item's last stored clock, are missed by the incremental refresh; every
+    TIMESERIES_RECONCILE_INTERVAL seconds reconcile() re-reads each item from
+    its high-water mark (or the last TIMESERIES_RECONCILE_WINDOW seconds) and
+    rewrites the segment tail where Zabbix has rows the store does not.
+    """
+    def __init__(self):
+        default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "timeseries")
+        self.data_dir = os.getenv("TIMESERIES_DIR", default_dir)
+        self.enabled = os.getenv("TIMESERIES_ENABLED", "False").lower() == "true"
+        self.lookback = int(os.getenv("TIMESERIES_LOOKBACK_DAYS", "7")) * 86400
+        self.refresh_interval = int(os.getenv("TIMESERIES_REFRESH_INTERVAL", "300"))
+        # History written this late (proxies, queues) is still picked up by the next refresh
+        self.late_seconds = int(os.getenv("TIMESERIES_LATE_SECONDS", "600"))
+        self.reconcile_interval = int(os.getenv("TIMESERIES_RECONCILE_INTERVAL", "3600"))
+        self.reconcile_window = int(os.getenv("TIMESERIES_RECONCILE_WINDOW", "21600"))
+        self._reconciled_at = time.time()
+        # Item keys (wildcards allowed) synced by the background refresh
+        self.tracked_keys = [k.strip() for k in os.getenv(
+            "TIMESERIES_KEYS", "vfs.fs.size[*,pfree],vm.memory.utilization,system.cpu.util"
+        ).split(",") if k.strip()]
+
+        # itemid -> {"count", "last_clock", "last_values" (values stored at last_clock), "checked" (last refresh)}
+        self._index = {}
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.data_dir, "index.json")
+        if self.enabled:
+            self._load_index()
+
+    def _load_index(self):
+        os.makedirs(self.data_dir, exist_ok=True)
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r') as f:
+                self._index = json.load(f)
+            logger.info(f"Timeseries store loaded {len(self._index)} items from {self.data_dir}")
+
+    def _save_index(self):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._index_path)
+
+    def _segment_path(self, item_id, column):
+        return os.path.join(self.data_dir, f"{item_id}.{column}")
+
+    def last_clock(self, item_id):
+        entry = self._index.get(str(item_id))
+        return entry["last_clock"] if entry else None
+
+    def _fetch_from(self, item_id, now):
+        """
+        Where the next fetch for an item starts: its last stored clock (same-second
+        rows are deduplicated on value), but no earlier than the last refresh that
+        covered it minus TIMESERIES_LATE_SECONDS, so items that stopped reporting
+        are not re-scanned back to their last row. New items backfill the lookback.
+        """
+        entry = self._index.get(item_id)
+        if not entry:
+            return now - self.lookback
+        start = max(entry["last_clock"], entry.get("checked", 0) - self.late_seconds)
+        return max(start, now - self.lookback)
+
+    def refresh(self, items):
+        """
+        Pull only new history for `items` (IDs or item dicts) and append it.
+        Items are fetched in two bulk calls: those refreshed recently, from the
+        oldest of their start points, and new or long-unrefreshed items, which
+        backfill separately so they never widen the incremental window.
+        Rows already stored are dropped in a vectorized filter.
+        Returns the number of rows appended.
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        now = int(time.time())
+        starts = {}
+        for item in items:
+            item_id = str(item["itemid"]) if isinstance(item, dict) else str(item)
+            starts[item_id] = (item, self._fetch_from(item_id, now))
+        if not starts:
+            return 0
+
+        recent = now - 2 * (self.refresh_interval + self.late_seconds)
+        groups = [
+            [(item_id, item, start) for item_id, (item, start) in starts.items() if start >= recent],
+            [(item_id, item, start) for item_id, (item, start) in starts.items() if start < recent]
+        ]
+        appended = 0
+        for group in groups:
+            if group:
+                series = zabbix_service.get_history_bulk([item for _, item, _ in group], min(s for _, _, s in group), now)
+                appended += self._append(group, series, now)
+
+        logger.info(f"Timeseries refresh appended {appended} rows for {len(starts)} items")
+        return appended
+
+    def _append(self, group, series, now):
+        item_ids = [item_id for item_id, _, _ in group]
+        position = {item_id: i for i, item_id in enumerate(item_ids)}
+        watermarks = np.array([self.last_clock(i) or 0 for i in item_ids], dtype=CLOCK_DTYPE)
+        item_pos = np.array([position[i] for i in series["itemids"]], dtype=np.int64)[series["item_index"]]
+        keep = series["clock"] > watermarks[item_pos]
+        # Rows in the same second as the last stored row are new unless that value is already stored
+        for row in np.flatnonzero(series["clock"] == watermarks[item_pos]):
+            keep[row] = series["value"][row] not in self._index[item_ids[item_pos[row]]].get("last_values", ())
+        item_pos, clock, value = item_pos[keep], series["clock"][keep], series["value"][keep]
+
+        # Group rows per item in clock order, then append each group
+        order = np.lexsort((clock, item_pos))
+        item_pos, clock, value = item_pos[order], clock[order], value[order]
+        boundaries = np.flatnonzero(np.diff(item_pos)) + 1
+        starts = np.concatenate(([0], boundaries)) if len(item_pos) else []
+
+        with self._lock:
+            try:
+                for start, end in zip(starts, list(boundaries) + [len(item_pos)]):
+                    item_id = item_ids[item_pos[start]]
+                    entry = self._index.get(item_id, {"count": 0, "last_clock": 0})
+                    self._append_segment(item_id, "clock", clock[start:end].astype(CLOCK_DTYPE), entry["count"])
+                    self._append_segment(item_id, "value", value[start:end].astype(VALUE_DTYPE), entry["count"])
+                    last_clock = int(clock[end - 1])
+                    same_second = value[start:end][clock[start:end] == last_clock]
+                    if last_clock == entry["last_clock"]:
+                        same_second = np.concatenate((entry.get("last_values", []), same_second))
+                    self._index[item_id] = {**entry, "count": entry["count"] + int(end - start), "last_clock": last_clock,
+                                            "last_values": [float(v) for v in same_second]}
+                for item_id in item_ids:
+                    self._index.setdefault(item_id, {"count": 0, "last_clock": 0})["checked"] = now
+            finally:
+                # Commit whatever was fully appended; the rest is truncated by the next append
+                self._save_index()
+        return int(len(item_pos))
+
+    def _append_segment(self, item_id, column, array, committed):
+        with open(self._segment_path(item_id, column), 'ab') as f:
+            # Drop bytes a failed append left after the committed rows
+            f.truncate(committed * array.itemsize)
+            f.write(array.tobytes())
+
+    def read(self, item_id, time_from=None, time_till=None):
+        """Zero-copy (clock, value) views of one item's committed history"""
+        entry = self._index.get(str(item_id))
+        if not entry or not entry["count"]:
+            return np.empty(0, CLOCK_DTYPE), np.empty(0, VALUE_DTYPE)
+
+        count = entry["count"]
+        clock = np.memmap(self._segment_path(item_id, "clock"), dtype=CLOCK_DTYPE, mode='r', shape=(count,))
+        value = np.memmap(self._segment_path(item_id, "value"), dtype=VALUE_DTYPE, mode='r', shape=(count,))
+        start = np.searchsorted(clock, time_from, side='left') if time_from else 0
+        end = np.searchsorted(clock, time_till, side='right') if time_till else count
+        return clock[start:end], value[start:end]
+
+    def read_columns(self, item_ids, time_from=None, time_till=None):
+        """Several items in the columnar layout returned by ZabbixService.get_history_bulk()"""
+        item_ids = [str(i) for i in item_ids]
+        parts = [self.read(item_id, time_from, time_till) for item_id in item_ids]
+        return {
+            "itemids": item_ids,
+            "item_index": np.repeat(np.arange(len(item_ids), dtype=np.int32), [len(c) for c, _ in parts]),
+            "clock": np.concatenate([c for c, _ in parts]) if parts else np.empty(0, CLOCK_DTYPE),
+            "value": np.concatenate([v for _, v in parts]) if parts else np.empty(0, VALUE_DTYPE)
+        }
+
+    def reconcile(self, items):
+        """
+        Re-read `items` from their high-water mark (last stored clock), or from
+        TIMESERIES_RECONCILE_WINDOW ago if later, and rewrite the stored tail of
+        those whose rows differ from Zabbix. Returns the number of rows recovered.
+        """
+        now = int(time.time())
+        froms = {}
+        for item in items:
+            item_id = str(item["itemid"]) if isinstance(item, dict) else str(item)
+            if self._index.get(item_id, {}).get("count"):
+                froms[item_id] = (item, max(min(self._index[item_id]["last_clock"], now - self.reconcile_window),
+                                            now - self.lookback))
+        # Silent items reach back to their last row; fetch them apart so they do not widen the common window
+        groups = [
+            [(item_id, item, start) for item_id, (item, start) in froms.items() if start >= now - self.reconcile_window],
+            [(item_id, item, start) for item_id, (item, start) in froms.items() if start < now - self.reconcile_window]
+        ]
+        recovered = 0
+        for group in groups:
+            if group:
+                series = zabbix_service.get_history_bulk([item for _, item, _ in group], min(s for _, _, s in group), now)
+                recovered += self._rewrite_tails(group, series)
+        self._reconciled_at = time.time()
+        if recovered:
+            logger.warning(f"Timeseries reconcile recovered {recovered} rows the incremental refresh missed; "
+                           f"consider raising TIMESERIES_LATE_SECONDS (now {self.late_seconds}s)")
+        return recovered
+
+    def _rewrite_tails(self, group, series):
+        position_of = {item_id: i for i, item_id in enumerate(series["itemids"])}
+        order = np.lexsort((series["clock"], series["item_index"]))
+        item_index, clock, value = series["item_index"][order], series["clock"][order], series["value"][order]
+        recovered = 0
+        with self._lock:
+            try:
+                for item_id, _, start in group:
+                    rows = (item_index == position_of.get(item_id, -1)) & (clock >= start)
+                    stored = len(self.read(item_id, time_from=start)[0])
+                    if np.count_nonzero(rows) <= stored:
+                        continue
+                    # Keep the rows before `start`, replace the rest with what Zabbix has now
+                    entry = self._index[item_id]
+                    position = entry["count"] - stored
+                    self._rewrite_segment(item_id, "clock", clock[rows].astype(CLOCK_DTYPE), position)
+                    self._rewrite_segment(item_id, "value", value[rows].astype(VALUE_DTYPE), position)
+                    last_clock = int(clock[rows][-1])
+                    self._index[item_id] = {**entry, "count": position + int(np.count_nonzero(rows)), "last_clock": last_clock,
+                                            "last_values": [float(v) for v in value[rows][clock[rows] == last_clock]]}
+                    recovered += int(np.count_nonzero(rows)) - stored
+            finally:
+                self._save_index()
+        return recovered
+
+    def _rewrite_segment(self, item_id, column, array, position):
+        # Overwrite in place and only ever grow the file: concurrent readers' memmaps stay valid
+        with open(self._segment_path(item_id, column), 'r+b') as f:
+            f.seek(position * array.itemsize)
+            f.write(array.tobytes())
+            f.truncate()
+
+    def refresh_tracked(self):
+        """Refresh every item matching TIMESERIES_KEYS, reconciling late history when due"""
+        items = zabbix_service.get_items_by_keys(self.tracked_keys)
+        appended = self.refresh(items)
+        if time.time() - self._reconciled_at >= self.reconcile_interval:
+            self.reconcile(items)
+        return appended
+
+timeseries_service = TimeseriesService()
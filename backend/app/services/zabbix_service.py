@@ -1,62 +1,228 @@
 import os
+import re
 import logging
-from pyzabbix import ZabbixAPI
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from packaging.version import Version
+from pyzabbix import ZabbixAPI, ZabbixAPIException
+import numpy as np
 import time
+from .cache_service import cache_service
+from .shared_state_service import shared_state_service
+from .metrics_service import metrics_service
+from .host_index_service import host_index_service, HOST_INDEX_FIELDS
 
 logger = logging.getLogger(__name__)
 
+# Methods pyzabbix sends without the auth token
+ANONYMOUS_METHODS = {"apiinfo.version", "user.checkAuthentication", "user.login"}
+
+# Error fragments Zabbix returns when the session token expired or was revoked
+SESSION_ERRORS = ("session terminated", "re-login", "not authorised", "not authorized")
+
+class PooledZabbixAPI(ZabbixAPI):
+    """
+    ZabbixAPI that is safe to share between worker threads.
+    Requests go through one keep-alive HTTP connection pool with at most
+    pool_size calls in flight. An expired session is detected from the error
+    text and refreshed once by the first caller that sees it. With a shared
+    state backend, all worker processes reuse one session token.
+    """
+    def __init__(self, url, user, password, api_token=None, pool_size=16, verify_ssl=False, timeout=None):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.verify = verify_ssl
+        session.headers.update({"Connection": "keep-alive"})
+        super().__init__(url, session=session, timeout=timeout)
+
+        self._user = user
+        self._password = password
+        self._api_token = api_token
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._login_lock = threading.Lock()
+
+    def authenticate(self, stale_auth=None):
+        """Log in, or refresh the session token if it is still stale_auth"""
+        with self._login_lock:
+            if stale_auth is not None and self.auth != stale_auth:
+                return  # Another thread already refreshed the session
+
+            if self._api_token:
+                # API tokens skip the user.login round-trip entirely
+                self.login(api_token=self._api_token)
+            elif shared_state_service.shared:
+                self._authenticate_shared(stale_auth)
+            else:
+                self._login()
+            logger.info("Authenticated against Zabbix API")
+
+    def _login(self):
+        if self.version is None:
+            self.login(self._user, self._password)
+        else:
+            # Swap the token in a single assignment so concurrent callers
+            # never send a request with an empty auth
+            if self.version >= Version("5.4.0"):
+                self.auth = self.user.login(username=self._user, password=self._password)
+            else:
+                self.auth = self.user.login(user=self._user, password=self._password)
+
+    def _authenticate_shared(self, stale_auth):
+        """
+        Reuse the session another worker process opened; only the worker
+        holding the login lease calls user.login, the rest wait for its token.
+        """
+        key = f"zabbix:session:{self.url}:{self._user}"
+        deadline = time.monotonic() + (self.timeout or 30)
+        while True:
+            session = shared_state_service.get(key)
+            if session and session["auth"] != stale_auth:
+                self.version = Version(session["version"])
+                self.auth = session["auth"]
+                return
+            if shared_state_service.is_leader("zabbix_login", ttl=self.timeout or 30):
+                try:
+                    self._login()
+                    shared_state_service.set(key, {"auth": self.auth, "version": str(self.version)})
+                finally:
+                    shared_state_service.release("zabbix_login")
+                return
+            if time.monotonic() > deadline:
+                self._login()
+                return
+            time.sleep(0.1)
+
+    def do_request(self, method, params=None):
+        with metrics_service.span("zabbix", method):
+            return self._do_request(method, params)
+
+    def _do_request(self, method, params):
+        stale_auth = self.auth
+        try:
+            with self._slots:
+                return super().do_request(method, params)
+        except ZabbixAPIException as e:
+            if self.use_api_token or method in ANONYMOUS_METHODS:
+                raise
+            if not any(fragment in str(e).lower() for fragment in SESSION_ERRORS):
+                raise
+            logger.warning(f"Zabbix session expired during {method}, re-authenticating")
+
+        self.authenticate(stale_auth)
+        with self._slots:
+            return super().do_request(method, params)
+
 class ZabbixService:
     def __init__(self):
         # Zabbix API URL
         self.url = os.getenv("ZABBIX_URL", "http://127.0.0.1/zabbix")
         self.user = os.getenv("ZABBIX_USER", "Admin")
         self.password = os.getenv("ZABBIX_PASSWORD", "zabbix")
+        self.api_token = os.getenv("ZABBIX_API_TOKEN") or None
         self.verify_ssl = os.getenv("ZABBIX_VERIFY_SSL", "False").lower() == "true"
+        self.pool_size = int(os.getenv("ZABBIX_POOL_SIZE", "16"))
+        self.timeout = float(os.getenv("ZABBIX_CALL_TIMEOUT", "30"))
         self.api = None
+        self._connect_lock = threading.Lock()
+        self.bulk_chunk_size = int(os.getenv("ZABBIX_BULK_CHUNK_SIZE", "500"))
+        # Upper bound on targets of one bulk tool call, so a loose selector cannot touch the whole fleet
+        self.bulk_max_targets = int(os.getenv("ZABBIX_BULK_MAX_TARGETS", "500"))
+
+        # Per-object-type TTLs: problems change fast, templates almost never
+        self.host_cache = cache_service.create("zabbix_hosts", int(os.getenv("ZABBIX_CACHE_TTL_HOSTS", "60")))
+        self.group_cache = cache_service.create("zabbix_groups", int(os.getenv("ZABBIX_CACHE_TTL_GROUPS", "300")))
+        self.template_cache = cache_service.create("zabbix_templates", int(os.getenv("ZABBIX_CACHE_TTL_TEMPLATES", "600")))
+        self.problem_cache = cache_service.create("zabbix_problems", int(os.getenv("ZABBIX_CACHE_TTL_PROBLEMS", "15")))
         logger.info(f"ZabbixService initialized with URL: {self.url}")
 
     def connect(self):
-        if self.api and self.api.auth:
+        if self.api:
             return
-        
-        try:
-            logger.info(f"Attempting to connect to Zabbix at {self.url}")
-            self.api = ZabbixAPI(self.url)
-            self.api.session.verify = self.verify_ssl
-            self.api.login(self.user, self.password)
-            logger.info(f"Successfully connected to Zabbix API")
-        except Exception as e:
-            logger.error(f"Failed to connect to Zabbix API: {e}")
-            raise
+
+        with self._connect_lock:
+            if self.api:
+                return
+            try:
+                logger.info(f"Attempting to connect to Zabbix at {self.url}")
+                api = PooledZabbixAPI(
+                    self.url, self.user, self.password,
+                    api_token=self.api_token,
+                    pool_size=self.pool_size,
+                    verify_ssl=self.verify_ssl,
+                    timeout=self.timeout
+                )
+                api.authenticate()
+                self.api = api
+                logger.info(f"Successfully connected to Zabbix API")
+            except Exception as e:
+                logger.error(f"Failed to connect to Zabbix API: {e}")
+                raise
 
     def get_hosts(self):
-        self.connect()
-        return self.api.host.get(output=["hostid", "host", "name", "status"], selectInterfaces=["ip", "dns"])
+        def load():
+            self.connect()
+            return self.api.host.get(output=["hostid", "host", "name", "status"], selectInterfaces=["ip", "dns"])
+        return self.host_cache.get_or_load("all", load)
+
+    def count_hosts(self, status=None):
+        """Count hosts server-side (countOutput), optionally only status 0=enabled / 1=disabled"""
+        def load():
+            self.connect()
+            params = {"countOutput": True}
+            if status is not None:
+                params["filter"] = {"status": str(status)}
+            return int(self.api.host.get(**params))
+        return self.host_cache.get_or_load(f"count:{status}", load)
+
+    def get_hosts_page(self, limit=5, status=None, with_interfaces=False):
+        """Fetch only the first `limit` hosts sorted by name, without the full inventory"""
+        def load():
+            self.connect()
+            params = {
+                "output": ["hostid", "host", "name", "status"],
+                "sortfield": "name",
+                "limit": int(limit)
+            }
+            if status is not None:
+                params["filter"] = {"status": str(status)}
+            if with_interfaces:
+                params["selectInterfaces"] = ["ip", "dns"]
+            return self.api.host.get(**params)
+        return self.host_cache.get_or_load(f"page:{limit}:{status}:{with_interfaces}", load)
 
     def get_host_items(self, host_id):
         self.connect()
         return self.api.item.get(hostids=host_id, output=["itemid", "name", "key_", "lastvalue", "units"])
 
     def get_problems(self):
-        self.connect()
-        return self.api.problem.get(
-            output="extend",
-            recent=True,
-            sortfield=["eventid"],
-            sortorder="DESC",
-            limit=20
-        )
+        def load():
+            self.connect()
+            return self.api.problem.get(
+                output="extend",
+                recent=True,
+                sortfield=["eventid"],
+                sortorder="DESC",
+                limit=20
+            )
+        return self.problem_cache.get_or_load("recent", load)
 
     def get_groups(self):
-        self.connect()
-        return self.api.hostgroup.get(output=["groupid", "name"])
+        def load():
+            self.connect()
+            return self.api.hostgroup.get(output=["groupid", "name"])
+        return self.group_cache.get_or_load("all", load)
 
     def get_templates(self, search=None):
-        self.connect()
-        params = {"output": ["templateid", "name"]}
-        if search:
-            params["search"] = {"name": search}
-        return self.api.template.get(**params)
+        def load():
+            self.connect()
+            params = {"output": ["templateid", "name"]}
+            if search:
+                params["search"] = {"name": search}
+            return self.api.template.get(**params)
+        return self.template_cache.get_or_load(search or "", load)
 
     def create_host(self, host_name, ip_address, group_id, template_ids=None, description="", interface_type=1, port="10050", dns=""):
         """
@@ -90,6 +256,13 @@ class ZabbixService:
                 params["templates"] = [{"templateid": tid} for tid in template_ids]
             
             result = self.api.host.create(params)
+            self.host_cache.invalidate()
+            if host_index_service.ready:
+                host_index_service.upsert({
+                    "hostid": result["hostids"][0],
+                    "host": host_name,
+                    "interfaces": interfaces
+                })
             logger.info(f"Host created successfully: {result}")
             return result
         except Exception as e:
@@ -99,35 +272,171 @@ class ZabbixService:
     def get_history(self, item_id, limit=100):
         self.connect()
         return self.api.history.get(itemids=item_id, sortfield="clock", sortorder="DESC", limit=limit, history=0)
-    
+
+    def get_items_by_keys(self, key_patterns, limit=None):
+        """
+        Fetch monitored numeric items whose key matches any of the wildcard patterns in one item.get.
+        `limit` caps the rows Zabbix returns (lowest itemids first).
+        """
+        self.connect()
+        params = {}
+        if limit:
+            params = {"limit": int(limit), "sortfield": "itemid"}
+        items = self.api.item.get(
+            output=["itemid", "hostid", "name", "key_", "units", "value_type"],
+            selectHosts=["name"],
+            search={"key_": list(key_patterns)},
+            searchByAny=True,
+            searchWildcardsEnabled=True,
+            monitored=True,
+            filter={"value_type": [0, 3]},  # numeric float / unsigned
+            **params
+        )
+        # Zabbix search is a substring match; keep only exact pattern matches
+        patterns = [re.compile(re.escape(pattern).replace(r"\*", ".*")) for pattern in key_patterns]
+        return [item for item in items if any(p.fullmatch(item["key_"]) for p in patterns)]
+
+    def get_trends(self, item_ids, time_from, time_till=None, chunk_size=None):
+        """
+        Fetch hourly trend averages for many items in chunked trend.get calls.
+        Returns columnar arrays instead of string dicts:
+        {"itemids": [...], "item_index": int32[], "clock": int64[], "value": float64[]}
+        where item_index points into itemids.
+        """
+        self.connect()
+        item_ids = [str(i) for i in item_ids]
+        chunk_size = chunk_size or self.bulk_chunk_size
+        params = {"output": ["itemid", "clock", "value_avg"], "time_from": int(time_from)}
+        if time_till:
+            params["time_till"] = int(time_till)
+
+        index_of = {item_id: i for i, item_id in enumerate(item_ids)}
+        columns = []
+        for start in range(0, len(item_ids), chunk_size):
+            rows = self.api.trend.get(itemids=item_ids[start:start + chunk_size], **params)
+            columns.append(_rows_to_columns(rows, index_of, "value_avg"))
+        return _concat_columns(item_ids, columns)
+
+    def get_history_bulk(self, items, time_from, time_till=None, chunk_size=None, time_chunk=None):
+        """
+        Fetch raw history for many items in as few history.get calls as possible.
+        `items` are item IDs or item dicts carrying "itemid" and "value_type"; IDs
+        without a known value type are resolved with a single item.get. Items are
+        grouped by value type (history.get takes one type per call), split into
+        chunks of item IDs and optionally of `time_chunk` seconds, and each chunk
+        is converted straight into columnar arrays.
+        Only numeric types (0=float, 3=unsigned) are supported; others are skipped.
+        Returns the same layout as get_trends().
+        """
+        self.connect()
+        chunk_size = chunk_size or self.bulk_chunk_size
+        time_till = int(time_till or time.time())
+        time_from = int(time_from)
+
+        value_types = {}
+        for item in items:
+            if isinstance(item, dict):
+                value_types[str(item["itemid"])] = item.get("value_type")
+            else:
+                value_types[str(item)] = None
+        unresolved = [item_id for item_id, value_type in value_types.items() if value_type is None]
+        if unresolved:
+            for row in self.api.item.get(itemids=unresolved, output=["itemid", "value_type"]):
+                value_types[row["itemid"]] = row["value_type"]
+
+        item_ids = list(value_types)
+        index_of = {item_id: i for i, item_id in enumerate(item_ids)}
+        by_type = {}
+        for item_id, value_type in value_types.items():
+            by_type.setdefault(str(value_type), []).append(item_id)
+
+        skipped = [i for t, ids in by_type.items() if t not in ("0", "3") for i in ids]
+        if skipped:
+            logger.warning(f"Skipping {len(skipped)} non-numeric items in bulk history fetch")
+
+        windows = [(time_from, time_till)]
+        if time_chunk:
+            windows = [(start, min(start + time_chunk - 1, time_till)) for start in range(time_from, time_till + 1, int(time_chunk))]
+
+        columns = []
+        for value_type in ("0", "3"):
+            type_ids = by_type.get(value_type, [])
+            for start in range(0, len(type_ids), chunk_size):
+                for window_from, window_till in windows:
+                    rows = self.api.history.get(
+                        itemids=type_ids[start:start + chunk_size],
+                        history=int(value_type),
+                        time_from=window_from,
+                        time_till=window_till,
+                        output=["itemid", "clock", "value"],
+                        sortfield="clock",
+                        sortorder="ASC"
+                    )
+                    columns.append(_rows_to_columns(rows, index_of))
+        return _concat_columns(item_ids, columns)
+
     # === NEW AGENTIC METHODS ===
 
+    def refresh_host_index(self):
+        """Reload the host list into the in-memory host index (only changed hosts are re-indexed)"""
+        self.connect()
+        hosts = self.api.host.get(output=HOST_INDEX_FIELDS, selectInterfaces=["ip", "dns"], **self._select_host_groups())
+        host_index_service.replace(hosts)
+
+    def _select_host_groups(self):
+        # Zabbix 6.2 renamed selectGroups (returning "groups") to selectHostGroups ("hostgroups")
+        if self.api.version and self.api.version >= Version("6.2.0"):
+            return {"selectHostGroups": ["name"]}
+        return {"selectGroups": ["name"]}
+
     def get_host_id_by_name(self, name):
-        """Helper to find host ID by visible name or hostname"""
+        """Helper to find host ID by visible name, hostname, IP or DNS name"""
+        host_id = host_index_service.resolve(name)
+        if host_id:
+            return host_id
+
+        # Not indexed yet (index disabled, or the host is newer than the last refresh)
         self.connect()
-        hosts = self.api.host.get(filter={"name": name}, output=["hostid"])
+        hosts = self.api.host.get(filter={"name": name}, output=HOST_INDEX_FIELDS, selectInterfaces=["ip", "dns"],
+                                  **self._select_host_groups())
         if not hosts:
-            hosts = self.api.host.get(filter={"host": name}, output=["hostid"])
-        
+            hosts = self.api.host.get(filter={"host": name}, output=HOST_INDEX_FIELDS, selectInterfaces=["ip", "dns"],
+                                      **self._select_host_groups())
+        if hosts and host_index_service.ready:
+            host_index_service.upsert(hosts[0])
+
         return hosts[0]['hostid'] if hosts else None
 
     def get_host_details(self, name_or_ip):
         """Get host details including active problems"""
         self.connect()
         try:
-            # Try to find host by name, visible name or interface IP
-            hosts = self.api.host.get(
-                search={"name": name_or_ip, "host": name_or_ip, "ip": name_or_ip},
-                searchByAny=True,
-                output=["hostid", "name", "status", "maintenance_status"],
-                selectInterfaces=["ip"],
-                selectTags="extend"
-            )
+            # Resolve through the host index: exact, prefix or substring hits only; a typo
+            # match would report another host's problems as this one's
+            hosts = []
+            if host_index_service.ready:
+                matches = host_index_service.search(name_or_ip, limit=1, fuzzy=False)
+                if matches:
+                    hosts = self.api.host.get(hostids=matches[0]["hostid"],
+                                              output=["hostid", "name", "status", "maintenance_status"])
+
+            if not hosts:
+                # Try to find host by name, visible name or interface IP
+                hosts = self.api.host.get(
+                    search={"name": name_or_ip, "host": name_or_ip, "ip": name_or_ip},
+                    searchByAny=True,
+                    output=["hostid", "name", "status", "maintenance_status"],
+                    selectInterfaces=["ip"],
+                    selectTags="extend"
+                )
             
             if not hosts:
-                # Fallback: strict filter tag matching often fails fuzzy search, try just list matching
-                # But for now, if not found, return message
-                return {"found": False, "message": f"Host '{name_or_ip}' not found in Zabbix."}
+                # Typo-tolerant matches are offered as suggestions, never as the host itself
+                suggestions = [h["name"] for h in host_index_service.search(name_or_ip, limit=5)] if host_index_service.ready else []
+                result = {"found": False, "message": f"Host '{name_or_ip}' not found in Zabbix."}
+                if suggestions:
+                    result["suggestions"] = suggestions
+                return result
             
             host = hosts[0]
             host_id = host['hostid']
@@ -194,6 +503,7 @@ class ZabbixService:
                 action=action_val,
                 message=message
             )
+            self.problem_cache.invalidate()
             logger.info(f"Problem acknowledged successfully: {result}")
             return result
         except Exception as e:
@@ -210,22 +520,7 @@ class ZabbixService:
                     raise Exception(f"Could not find host with name: {host_id}")
                 host_id = resolved_id
 
-            now = int(time.time())
-            end = now + (minutes * 60)
-            
-            params = {
-                "name": f"AI Maintenance: {description}",
-                "active_since": now,
-                "active_till": end,
-                "hostids": [host_id],
-                "timeperiods": [{
-                    "timeperiod_type": 0, # One time only
-                    "start_date": now,
-                    "period": minutes * 60 # Duration in seconds
-                }]
-            }
-            
-            result = self.api.maintenance.create(params)
+            result = self.api.maintenance.create(self._maintenance_params([host_id], minutes, description))
             logger.info(f"Maintenance scheduled successfully: {result}")
             return result
         except Exception as e:
@@ -249,10 +544,199 @@ class ZabbixService:
                 "hostid": host_id,
                 "status": int(status_code)
             })
+            self.host_cache.invalidate()
+            host_index_service.patch(host_id, status=int(status_code))
             logger.info(f"Host status updated successfully to {status_code}: {result}")
             return result
         except Exception as e:
             logger.error(f"Failed to update host status: {e}")
             raise Exception(f"Zabbix API Error: {str(e)}")
 
+    # --- bulk operations ---
+
+    def _maintenance_params(self, host_ids, minutes, description):
+        now = int(time.time())
+        end = now + (minutes * 60)
+
+        params = {
+            "name": f"AI Maintenance: {description}",
+            "active_since": now,
+            "active_till": end,
+            "timeperiods": [{
+                "timeperiod_type": 0, # One time only
+                "start_date": now,
+                "period": minutes * 60 # Duration in seconds
+            }]
+        }
+        # Zabbix 6.0 replaced hostids with host objects
+        if self.api.version and self.api.version >= Version("6.0.0"):
+            params["hosts"] = [{"hostid": host_id} for host_id in host_ids]
+        else:
+            params["hostids"] = list(host_ids)
+        return params
+
+    def _selector_filters(self, host_group=None, tags=None):
+        """host.get/problem.get filters for a host group (name or ID) and tags ("tag" or "tag:value")"""
+        params = {}
+        if host_group:
+            groups = host_group if isinstance(host_group, list) else [host_group]
+            known = {g["name"].lower(): g["groupid"] for g in self.get_groups()}
+            group_ids = []
+            for group in groups:
+                group = str(group)
+                group_id = group if group.isdigit() else known.get(group.lower())
+                if not group_id:
+                    raise Exception(f"Could not find host group: {group}")
+                group_ids.append(group_id)
+            params["groupids"] = group_ids
+        if tags:
+            params["tags"] = []
+            for tag in (tags if isinstance(tags, list) else [tags]):
+                name, _, value = str(tag).partition(":")
+                params["tags"].append({"tag": name.strip(), "value": value.strip(), "operator": 1 if value else 4})
+        return params
+
+    def _resolve_host_ids(self, hosts):
+        """Host IDs for a list of IDs, names, hostnames or IPs; names missing from the index cost one host.get"""
+        host_ids, missing = [], []
+        for host in hosts:
+            host = str(host).strip()
+            host_id = host if host.isdigit() else host_index_service.resolve(host)
+            if host_id:
+                host_ids.append(host_id)
+            else:
+                missing.append(host)
+        if missing:
+            found = {}
+            for field in ("name", "host"):
+                for h in self.api.host.get(filter={field: missing}, output=["hostid", "host", "name"]):
+                    found[h[field].lower()] = h["hostid"]
+            unresolved = [h for h in missing if h.lower() not in found]
+            if unresolved:
+                raise Exception(f"Could not find hosts: {', '.join(unresolved)}")
+            host_ids.extend(found[h.lower()] for h in missing)
+        return list(dict.fromkeys(host_ids))
+
+    def select_hosts(self, hosts=None, host_group=None, tags=None, severities=None):
+        """
+        Host IDs matching all given selectors: one host.get for the group and host
+        tags, then one problem.get + event.get when filtering by problem severity.
+        """
+        if not (hosts or host_group or tags or severities):
+            raise Exception("At least one selector (hosts, host_group, tags, severities) is required")
+        self.connect()
+        params = self._selector_filters(host_group, tags)
+        if hosts:
+            params["hostids"] = self._resolve_host_ids(hosts)
+
+        # Tags select on host tags here; problem.get would match them against problem tags
+        if host_group or tags:
+            host_ids = [h["hostid"] for h in self.api.host.get(output=["hostid"], **params)]
+        else:
+            host_ids = params.get("hostids")
+
+        if severities and (host_ids is None or host_ids):
+            scope = {"hostids": host_ids} if host_ids is not None else {}
+            problems = self.api.problem.get(output=["eventid"], severities=[int(s) for s in severities], **scope)
+            event_ids = [p["eventid"] for p in problems]
+            with_problems = set()
+            for start in range(0, len(event_ids), self.bulk_chunk_size):
+                for event in self.api.event.get(eventids=event_ids[start:start + self.bulk_chunk_size],
+                                                output=["eventid"], selectHosts=["hostid"]):
+                    with_problems.update(h["hostid"] for h in event.get("hosts", []))
+            if host_ids is not None:
+                with_problems &= set(host_ids)
+            host_ids = sorted(with_problems)
+
+        self._check_bulk_size(host_ids, "hosts")
+        return host_ids
+
+    def select_problems(self, event_ids=None, hosts=None, host_group=None, tags=None, severities=None,
+                        unacknowledged_only=True):
+        """Event IDs of active problems matching all given selectors, in one problem.get"""
+        if not (event_ids or hosts or host_group or tags or severities):
+            raise Exception("At least one selector (event_ids, hosts, host_group, tags, severities) is required")
+        self.connect()
+        params = self._selector_filters(host_group, tags)
+        if hosts:
+            params["hostids"] = self._resolve_host_ids(hosts)
+        if event_ids:
+            params["eventids"] = [str(e) for e in event_ids]
+        if severities:
+            params["severities"] = [int(s) for s in severities]
+        if unacknowledged_only:
+            params["acknowledged"] = False
+
+        problem_ids = [p["eventid"] for p in self.api.problem.get(output=["eventid"], **params)]
+        self._check_bulk_size(problem_ids, "problems")
+        return problem_ids
+
+    def _check_bulk_size(self, ids, kind):
+        if not ids:
+            raise Exception(f"No {kind} match the given selectors")
+        if len(ids) > self.bulk_max_targets:
+            raise Exception(f"{len(ids)} {kind} match the given selectors, more than the limit of "
+                            f"{self.bulk_max_targets} (ZABBIX_BULK_MAX_TARGETS); narrow the selection")
+
+    def acknowledge_problems(self, message, action_close=False, **selectors):
+        """Acknowledge every matching problem with a single event.acknowledge call"""
+        try:
+            event_ids = self.select_problems(**selectors)
+            action_val = 6 # Acknowledge + Comment
+            if action_close:
+                action_val |= 1 # Close problem bit
+
+            result = self.api.event.acknowledge(eventids=event_ids, action=action_val, message=message)
+            self.problem_cache.invalidate()
+            logger.info(f"{len(event_ids)} problems acknowledged in bulk")
+            return {"acknowledged": len(event_ids), "eventids": event_ids, "result": result}
+        except Exception as e:
+            logger.error(f"Failed to acknowledge problems: {e}")
+            raise Exception(f"Zabbix API Error: {str(e)}")
+
+    def schedule_maintenance_bulk(self, minutes, description="AI Maintenance", **selectors):
+        """Put every matching host in one maintenance window with a single maintenance.create call"""
+        try:
+            host_ids = self.select_hosts(**selectors)
+            result = self.api.maintenance.create(self._maintenance_params(host_ids, minutes, description))
+            logger.info(f"Maintenance scheduled for {len(host_ids)} hosts: {result}")
+            return {"hosts": len(host_ids), "hostids": host_ids, "result": result}
+        except Exception as e:
+            logger.error(f"Failed to schedule maintenance: {e}")
+            raise Exception(f"Zabbix API Error: {str(e)}")
+
+    def update_hosts_status(self, status_code, **selectors):
+        """Enable (0) or disable (1) every matching host with a single host.massupdate call"""
+        try:
+            host_ids = self.select_hosts(**selectors)
+            result = self.api.host.massupdate(hosts=[{"hostid": host_id} for host_id in host_ids],
+                                              status=int(status_code))
+            self.host_cache.invalidate()
+            for host_id in host_ids:
+                host_index_service.patch(host_id, status=int(status_code))
+            logger.info(f"Status of {len(host_ids)} hosts updated to {status_code}")
+            return {"updated": len(host_ids), "hostids": host_ids, "result": result}
+        except Exception as e:
+            logger.error(f"Failed to update host status: {e}")
+            raise Exception(f"Zabbix API Error: {str(e)}")
+
+def _rows_to_columns(rows, index_of, value_field="value"):
+    """Convert one chunk of API rows into (item_index, clock, value) arrays so the dicts can be freed"""
+    count = len(rows)
+    return (
+        np.fromiter((index_of[row["itemid"]] for row in rows), dtype=np.int32, count=count),
+        np.fromiter((int(row["clock"]) for row in rows), dtype=np.int64, count=count),
+        np.fromiter((float(row[value_field]) for row in rows), dtype=np.float64, count=count)
+    )
+
+def _concat_columns(item_ids, columns):
+    if not columns:
+        columns = [(np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.float64))]
+    return {
+        "itemids": item_ids,
+        "item_index": np.concatenate([c[0] for c in columns]),
+        "clock": np.concatenate([c[1] for c in columns]),
+        "value": np.concatenate([c[2] for c in columns])
+    }
+
 zabbix_service = ZabbixService()
@@ -0,0 +1,218 @@
+"""
+End-to-end API benchmark with no live Zabbix server or provider keys.
+
+Starts the fake Zabbix JSON-RPC server (synthetic fleet) and the stub LLM
+endpoints in-process, runs the real app under uvicorn against them, and
+drives /api/chat, /api/summary/daily, /api/status and
+/api/analytics/predictions at the given concurrency. Reports p50/p99
+latency, throughput and process RSS (app, fakes and load generator share
+the process), and writes them as JSON so runs can be compared.
+Run from the backend directory:
+
+    python -m benchmarks.api_suite --hosts 10000 --concurrency 20 --requests 200 --output run.json
+    python -m benchmarks.api_suite --hosts 10000 --baseline run.json   # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.fake_zabbix import Fleet, FakeZabbixServer
+
+ENDPOINTS = {
+    "chat": ("POST", "/api/chat"),
+    "summary": ("GET", "/api/summary/daily"),
+    "status": ("GET", "/api/status"),
+    "predictions": ("GET", "/api/analytics/predictions"),
+}
+
+PROVIDER_CONFIG = {
+    "bedrock": {"provider": "bedrock", "aws_region": "us-east-1", "aws_access_key": "AKIABENCHMARK",
+                "aws_secret_key": "benchmark", "bedrock_model_id": "anthropic.claude-stub"},
+    "openai": {"provider": "openai", "openai_api_key": "sk-benchmark", "openai_model": "gpt-stub"},
+    "gemini": {"provider": "gemini", "gemini_api_key": "benchmark", "gemini_model": "gemini-stub"},
+}
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args, zabbix, llm):
+    """Point the app at the fakes; must run before the app modules are imported"""
+    os.environ.update({
+        "ZABBIX_URL": zabbix.url,
+        "ZABBIX_USER": "Admin",
+        "ZABBIX_PASSWORD": "zabbix",
+        "BEDROCK_ENDPOINT_URL": llm.url,
+        "OPENAI_BASE_URL": llm.url + "/v1",
+        "GEMINI_API_ENDPOINT": llm.url,
+        "SHARED_STATE_BACKEND": "memory",
+        "RESPONSE_CACHE_ENABLED": str(args.response_cache),
+    })
+
+
+def start_app(port, provider):
+    import uvicorn
+    from app.main import app
+    from app.services.config_service import config_service
+
+    # Keep the benchmark provider settings out of the real config file
+    config_service.config_path = os.path.join(tempfile.mkdtemp(prefix="zabbix-ai-bench-"), "ai_agent_config.json")
+    config_service.save_config(PROVIDER_CONFIG[provider])
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def drive(base_url, name, total, concurrency, hosts):
+    method, path = ENDPOINTS[name]
+    local = threading.local()
+    rng = random.Random(42)
+    host_names = [f"Server {i:06d}" for i in range(max(1, hosts))]
+    messages = [f"¿Cómo está {rng.choice(host_names)}? ¿Tiene alertas activas?" for _ in range(total)]
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            if method == "POST":
+                response = session.post(base_url + path, json={"message": messages[i]}, timeout=600)
+            else:
+                response = session.get(base_url + path, timeout=600)
+            ok = response.status_code == 200 and not (isinstance(response.json(), dict) and "error" in response.json())
+        except (requests.RequestException, ValueError):
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(ms for ms, _ in samples)
+    return {
+        "requests": total,
+        "errors": sum(1 for _, ok in samples if not ok),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "throughput_rps": round(total / wall, 2),
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline run; True if any endpoint regressed beyond tolerance"""
+    regressed = False
+    print(f"\n{'endpoint':<28}{'p50 ms':>18}{'p99 ms':>18}{'req/s':>18}")
+    for path, current in results["results"].items():
+        before = baseline.get("results", {}).get(path)
+        if not before:
+            continue
+        worse = (current["p99_ms"] > before["p99_ms"] * (1 + tolerance)
+                 or current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance))
+        regressed = regressed or worse
+        cells = [f"{before[k]:>8}->{current[k]:<8}" for k in ("p50_ms", "p99_ms", "throughput_rps")]
+        print(f"{path:<28}{''.join(f'{c:>18}' for c in cells)}{'  REGRESSION' if worse else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=1000, help="synthetic fleet size (10 to 100000)")
+    parser.add_argument("--problems", type=int, default=None, help="active problems (default hosts/5)")
+    parser.add_argument("--item-hosts", type=int, default=500, help="hosts with forecastable items and trends")
+    parser.add_argument("--zabbix-latency", type=float, default=0.01, help="seconds added to every Zabbix call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds added to every LLM call")
+    parser.add_argument("--tool-turns", type=int, default=1, help="LLM turns answered with a tool call per chat")
+    parser.add_argument("--provider", choices=sorted(PROVIDER_CONFIG), default="bedrock")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset of " + ",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds for background sync jobs before measuring")
+    parser.add_argument("--response-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p99/throughput regression (fraction)")
+    args = parser.parse_args()
+
+    built = time.perf_counter()
+    fleet = Fleet(hosts=args.hosts, problems=args.problems, item_hosts=min(args.item_hosts, args.hosts))
+    print(f"Fleet: {len(fleet.hosts)} hosts, {len(fleet.problems)} problems, {len(fleet.items)} items "
+          f"({time.perf_counter() - built:.1f}s)")
+    zabbix = FakeZabbixServer(fleet, latency=args.zabbix_latency).start()
+    llm = FakeLLMServer(latency=args.llm_latency, tool_turns=args.tool_turns, tool_host=fleet.hosts[0]["name"]).start()
+    configure_environment(args, zabbix, llm)
+
+    server = start_app(args.port, args.provider)
+    base_url = f"http://127.0.0.1:{args.port}"
+    time.sleep(args.warmup)
+
+    results = {
+        "benchmark": "api_suite",
+        "format": 1,
+        "timestamp": int(time.time()),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "port")},
+        "results": {},
+    }
+    for name in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+        result = drive(base_url, name, args.requests, args.concurrency, args.hosts)
+        path = ENDPOINTS[name][1]
+        results["results"][path] = result
+        print(f"{path:<28} n={result['requests']:<5} err={result['errors']:<4} p50={result['p50_ms']:9.2f}ms "
+              f"p99={result['p99_ms']:9.2f}ms {result['throughput_rps']:8.2f} req/s rss={result['rss_mb']:.0f}MB")
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    results["zabbix_calls"] = dict(sorted(zabbix.api.calls.items()))
+    results["llm_calls"] = llm.calls
+    print(f"peak RSS {results['peak_rss_mb']:.0f}MB, Zabbix calls {results['zabbix_calls']}, LLM calls {llm.calls}")
+
+    server.should_exit = True
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("params", {}).get("hosts") != args.hosts:
+            print("Warning: baseline was recorded with a different fleet size")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
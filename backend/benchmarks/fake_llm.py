@@ -0,0 +1,114 @@
+"""
+Stub LLM provider endpoints for benchmarks: Bedrock InvokeModel (Anthropic
+messages format), OpenAI chat completions and Gemini generateContent (REST).
+
+Each call sleeps `latency` seconds. The first `tool_turns` turns of a
+conversation answer with a get_host_details tool call so the agent loop and
+tool path are exercised; later turns answer with text. Usage/token fields are
+filled from the request size. Streaming endpoints are not implemented.
+
+    server = FakeLLMServer(latency=0.5, tool_turns=1).start()
+    # BEDROCK_ENDPOINT_URL=server.url
+    # OPENAI_BASE_URL=server.url + "/v1"
+    # GEMINI_API_ENDPOINT=server.url
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("**Resumen**: la infraestructura está estable. Hay problemas activos de severidad media "
+         "que conviene revisar; no se detectan fallos críticos en este momento.")
+
+
+class FakeLLMServer:
+    def __init__(self, latency=0.5, tool_turns=1, tool_host="Server 000001", port=0):
+        self.latency = latency
+        self.tool_turns = tool_turns
+        self.tool_host = tool_host
+        self.calls = {"bedrock": 0, "openai": 0, "gemini": 0}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                request = json.loads(raw or b"{}")
+                if self.path.startswith("/model/"):
+                    body = stub.bedrock(request, len(raw))
+                elif self.path.endswith("/chat/completions"):
+                    body = stub.openai(request, len(raw))
+                elif ":generateContent" in self.path:
+                    body = stub.gemini(request, len(raw))
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _tool_args(self):
+        return {"name": self.tool_host}
+
+    def bedrock(self, request, size):
+        self.calls["bedrock"] += 1
+        time.sleep(self.latency)
+        tool_turns_done = sum(1 for m in request.get("messages", []) if m["role"] == "user"
+                              and isinstance(m["content"], list) and any(b.get("type") == "tool_result" for b in m["content"]))
+        usage = {"input_tokens": size // 4, "output_tokens": 40}
+        if tool_turns_done < self.tool_turns and request.get("tools"):
+            return {"id": "msg_stub", "type": "message", "role": "assistant", "stop_reason": "tool_use", "usage": usage,
+                    "content": [{"type": "tool_use", "id": f"toolu_{tool_turns_done}", "name": "get_host_details",
+                                 "input": self._tool_args()}]}
+        return {"id": "msg_stub", "type": "message", "role": "assistant", "stop_reason": "end_turn", "usage": usage,
+                "content": [{"type": "text", "text": REPLY}]}
+
+    def openai(self, request, size):
+        self.calls["openai"] += 1
+        time.sleep(self.latency)
+        tool_turns_done = sum(1 for m in request.get("messages", []) if m.get("role") == "tool")
+        if tool_turns_done < self.tool_turns and request.get("tools"):
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{tool_turns_done}", "type": "function",
+                "function": {"name": "get_host_details", "arguments": json.dumps(self._tool_args())}}]}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": REPLY}
+            finish_reason = "stop"
+        return {"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": {"prompt_tokens": size // 4, "completion_tokens": 40, "total_tokens": size // 4 + 40}}
+
+    def gemini(self, request, size):
+        self.calls["gemini"] += 1
+        time.sleep(self.latency)
+        tool_turns_done = sum(1 for c in request.get("contents", [])
+                              if any("functionResponse" in p or "function_response" in p for p in c.get("parts", [])))
+        if tool_turns_done < self.tool_turns and request.get("tools"):
+            parts = [{"functionCall": {"name": "get_host_details", "args": self._tool_args()}}]
+        else:
+            parts = [{"text": REPLY}]
+        return {"candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {"promptTokenCount": size // 4, "candidatesTokenCount": 40, "totalTokenCount": size // 4 + 40}}
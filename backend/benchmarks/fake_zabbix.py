@@ -0,0 +1,375 @@
+"""
+In-process fake Zabbix JSON-RPC server backed by a synthetic fleet.
+
+Implements the subset of the API the backend uses (host/hostgroup/template/
+problem/event/item/trend/history reads and the write tools) with the
+filtering parameters it sends. Every call sleeps `latency` seconds first to
+model the Zabbix server and database.
+
+    fleet = Fleet(hosts=1000, problems=200, items_per_host=4, item_hosts=500)
+    server = FakeZabbixServer(fleet, latency=0.01).start()
+    # ZABBIX_URL=server.url
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+ITEM_KEYS = [
+    ("vfs.fs.size[/,pfree]", "Free disk space on /", "%"),
+    ("vm.memory.utilization", "Memory utilization", "%"),
+    ("system.cpu.util", "CPU utilization", "%"),
+    ("vm.memory.size[pavailable]", "Available memory", "%"),
+]
+
+PROBLEM_NAMES = [
+    "High CPU utilization", "Low free disk space on /", "High memory utilization",
+    "Zabbix agent is not available", "Service nginx is down", "Too many processes",
+]
+
+
+class Fleet:
+    """Deterministic synthetic hosts, groups, problems and numeric items"""
+
+    def __init__(self, hosts=1000, problems=None, groups=20, items_per_host=4, item_hosts=500, seed=7):
+        rng = np.random.default_rng(seed)
+        self.now = int(time.time())
+        self.groups = [{"groupid": str(g + 1), "name": f"Group {g + 1:03d}"} for g in range(groups)]
+        self.templates = [{"templateid": str(10000 + t), "name": name} for t, name in enumerate(
+            ["Linux by Zabbix agent", "Windows by Zabbix agent", "Cisco IOS by SNMP", "Docker by Zabbix agent 2"])]
+
+        self.hosts = []
+        for i in range(hosts):
+            group = self.groups[i % groups]
+            self.hosts.append({
+                "hostid": str(10000 + i),
+                "host": f"srv-{i:06d}",
+                "name": f"Server {i:06d}",
+                "status": "1" if i % 50 == 49 else "0",
+                "maintenance_status": "0",
+                "interfaces": [{"ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", "dns": f"srv-{i:06d}.example.com"}],
+                "groups": [group],
+                "tags": [{"tag": "env", "value": "prod" if i % 3 else "staging"}, {"tag": "role", "value": "db" if i % 10 == 0 else "web"}],
+            })
+        self.host_by_id = {h["hostid"]: h for h in self.hosts}
+
+        problems = hosts // 5 if problems is None else problems
+        self.problems = []
+        for p in range(problems):
+            host = self.hosts[int(rng.integers(0, hosts))] if hosts else None
+            self.problems.append({
+                "eventid": str(1000000 + p),
+                "objectid": str(50000 + p),
+                "name": f"{PROBLEM_NAMES[p % len(PROBLEM_NAMES)]} on {host['name']}",
+                "severity": str(int(rng.integers(0, 6))),
+                "acknowledged": "1" if p % 4 == 0 else "0",
+                "suppressed": "0",
+                "clock": str(self.now - int(rng.integers(60, 7 * 86400))),
+                "r_eventid": "0",
+                "hostid": host["hostid"],
+                "tags": [],
+            })
+        self.problem_by_id = {p["eventid"]: p for p in self.problems}
+
+        # Numeric items (with trends) only on the first item_hosts hosts
+        self.items = []
+        for h in self.hosts[:item_hosts]:
+            for key, name, units in ITEM_KEYS[:items_per_host]:
+                self.items.append({
+                    "itemid": str(100000 + len(self.items)),
+                    "hostid": h["hostid"],
+                    "name": name,
+                    "key_": key,
+                    "units": units,
+                    "value_type": "0",
+                    "lastvalue": "42.0",
+                })
+        self.item_by_id = {i["itemid"]: i for i in self.items}
+        self.lock = threading.Lock()
+
+    def series(self, itemid, time_from, time_till, step):
+        """Deterministic drifting series for an item: (clocks, values)"""
+        n = int(itemid)
+        start = time_from - time_from % step
+        clocks = np.arange(start, time_till + 1, step, dtype=np.int64)
+        slope = ((n * 7919) % 21 - 10) / 1000.0  # %/hour
+        base = 30 + (n * 104729) % 50
+        values = base + slope * (clocks - self.now) / 3600.0 + np.sin(clocks / 3600.0 + n) * 2
+        return clocks, np.clip(values, 0, 100)
+
+
+def _project(row, output):
+    if output in (None, "extend"):
+        return dict(row)
+    return {k: row[k] for k in output if k in row}
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    return [str(v) for v in value] if isinstance(value, (list, tuple)) else [str(value)]
+
+
+def _matches_filter(row, flt):
+    for key, wanted in (flt or {}).items():
+        values = {str(v) for v in wanted} if isinstance(wanted, list) else {str(wanted)}
+        if str(row.get(key)) not in values:
+            return False
+    return True
+
+
+def _matches_search(row, params):
+    search = params.get("search")
+    if not search:
+        return True
+    results = []
+    for key, needles in search.items():
+        haystacks = [str(row.get(key, ""))]
+        if key == "ip":
+            haystacks = [i["ip"] for i in row.get("interfaces", [])]
+        for needle in needles if isinstance(needles, list) else [needles]:
+            if params.get("searchWildcardsEnabled"):
+                regex = re.compile(".*".join(re.escape(part) for part in str(needle).split("*")), re.I)
+                results.append(any(regex.search(h) for h in haystacks))
+            else:
+                results.append(any(str(needle).lower() in h.lower() for h in haystacks))
+    return any(results) if params.get("searchByAny") else all(results)
+
+
+def _matches_tags(row, tags):
+    for tag in tags or []:
+        found = [t for t in row.get("tags", []) if t["tag"] == tag["tag"]]
+        if not found or (tag.get("value") and tag.get("operator") == 1 and not any(t["value"] == tag["value"] for t in found)):
+            return False
+    return True
+
+
+def _finish(rows, params):
+    if params.get("sortfield"):
+        fields = _as_list(params["sortfield"])
+        numeric = fields[0] in ("eventid", "clock", "hostid", "itemid")
+        rows = sorted(rows, key=lambda r: int(r[fields[0]]) if numeric else r[fields[0]],
+                      reverse=str(_as_list(params.get("sortorder") or ["ASC"])[0]).upper() == "DESC")
+    if params.get("countOutput"):
+        return str(len(rows))
+    if params.get("limit"):
+        rows = rows[:int(params["limit"])]
+    return rows
+
+
+class FakeZabbixAPI:
+    """JSON-RPC method dispatch over a Fleet"""
+
+    def __init__(self, fleet, latency=0.0):
+        self.fleet = fleet
+        self.latency = latency
+        self.calls = {}
+
+    def handle(self, method, params):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        handler = getattr(self, method.replace(".", "_"), None)
+        if handler is None:
+            raise KeyError(f"Method {method} not implemented by the fake server")
+        if isinstance(params, list) and len(params) == 1 and isinstance(params[0], dict):
+            params = params[0]  # pyzabbix sends positional arguments as a list
+        return handler(params or {})
+
+    # --- auth ---
+
+    def apiinfo_version(self, params):
+        return "6.4.0"
+
+    def user_login(self, params):
+        return "0424bd59b807674191e7d77572075f33"
+
+    def user_logout(self, params):
+        return True
+
+    # --- hosts ---
+
+    def host_get(self, params):
+        fleet = self.fleet
+        hostids = _as_list(params.get("hostids"))
+        rows = [fleet.host_by_id[h] for h in hostids if h in fleet.host_by_id] if hostids else fleet.hosts
+        groupids = set(_as_list(params.get("groupids")) or [])
+        rows = [h for h in rows
+                if (not groupids or any(g["groupid"] in groupids for g in h["groups"]))
+                and _matches_filter(h, params.get("filter"))
+                and _matches_tags(h, params.get("tags"))
+                and _matches_search(h, params)]
+        rows = _finish(rows, params)
+        if isinstance(rows, str):
+            return rows
+        output = params.get("output", "extend")
+        result = []
+        for h in rows:
+            row = _project({k: v for k, v in h.items() if k not in ("interfaces", "groups", "tags")}, output)
+            if params.get("selectInterfaces"):
+                row["interfaces"] = [_project(i, params["selectInterfaces"]) for i in h["interfaces"]]
+            if params.get("selectTags"):
+                row["tags"] = h["tags"]
+            result.append(row)
+        return result
+
+    def hostgroup_get(self, params):
+        return [_project(g, params.get("output")) for g in self.fleet.groups]
+
+    def template_get(self, params):
+        rows = [t for t in self.fleet.templates if _matches_search(t, params)]
+        return [_project(t, params.get("output")) for t in rows]
+
+    def host_create(self, params):
+        with self.fleet.lock:
+            hostid = str(10000 + len(self.fleet.hosts))
+            host = {"hostid": hostid, "host": params["host"], "name": params.get("name", params["host"]),
+                    "status": "0", "maintenance_status": "0", "interfaces": params.get("interfaces", []),
+                    "groups": params.get("groups", []), "tags": []}
+            self.fleet.hosts.append(host)
+            self.fleet.host_by_id[hostid] = host
+        return {"hostids": [hostid]}
+
+    def host_update(self, params):
+        host = self.fleet.host_by_id[str(params["hostid"])]
+        host["status"] = str(params.get("status", host["status"]))
+        return {"hostids": [host["hostid"]]}
+
+    def host_massupdate(self, params):
+        hostids = [str(h["hostid"]) for h in params.get("hosts", [])]
+        for hostid in hostids:
+            self.fleet.host_by_id[hostid]["status"] = str(params.get("status", "0"))
+        return {"hostids": hostids}
+
+    def maintenance_create(self, params):
+        hostids = params.get("hostids") or [h["hostid"] for h in params.get("hosts", [])]
+        for hostid in hostids:
+            self.fleet.host_by_id[str(hostid)]["maintenance_status"] = "1"
+        return {"maintenanceids": [str(int(time.time()))]}
+
+    # --- problems and events ---
+
+    def problem_get(self, params):
+        fleet = self.fleet
+        eventids = _as_list(params.get("eventids"))
+        rows = [fleet.problem_by_id[e] for e in eventids if e in fleet.problem_by_id] if eventids else fleet.problems
+        hostids = set(_as_list(params.get("hostids")) or [])
+        groupids = set(_as_list(params.get("groupids")) or [])
+        severities = set(_as_list(params.get("severities")) or [])
+        eventid_from = int(params.get("eventid_from") or 0)
+        acknowledged = params.get("acknowledged")
+        rows = [p for p in rows
+                if int(p["eventid"]) >= eventid_from
+                and (not hostids or p["hostid"] in hostids)
+                and (not groupids or any(g["groupid"] in groupids for g in fleet.host_by_id[p["hostid"]]["groups"]))
+                and (not severities or p["severity"] in severities)
+                and (acknowledged is None or p["acknowledged"] == ("1" if acknowledged else "0"))
+                and _matches_tags(fleet.host_by_id[p["hostid"]], params.get("tags"))
+                and _matches_search(p, params)]
+        rows = _finish(rows, params)
+        if isinstance(rows, str):
+            return rows
+        return [_project({k: v for k, v in p.items() if k != "hostid"}, params.get("output", "extend")) for p in rows]
+
+    def event_get(self, params):
+        rows = [self.fleet.problem_by_id[e] for e in _as_list(params.get("eventids")) or [] if e in self.fleet.problem_by_id]
+        result = []
+        for p in rows:
+            row = _project({k: v for k, v in p.items() if k != "hostid"}, params.get("output", "extend"))
+            if params.get("selectHosts"):
+                host = self.fleet.host_by_id[p["hostid"]]
+                row["hosts"] = [_project(host, params["selectHosts"])]
+            result.append(row)
+        return result
+
+    def event_acknowledge(self, params):
+        eventids = _as_list(params.get("eventids"))
+        for eventid in eventids:
+            if eventid in self.fleet.problem_by_id:
+                self.fleet.problem_by_id[eventid]["acknowledged"] = "1"
+        return {"eventids": eventids}
+
+    # --- items, trends and history ---
+
+    def item_get(self, params):
+        fleet = self.fleet
+        hostids = set(_as_list(params.get("hostids")) or [])
+        rows = [i for i in fleet.items
+                if (not hostids or i["hostid"] in hostids)
+                and _matches_filter(i, params.get("filter"))
+                and _matches_search(i, params)]
+        rows = _finish(rows, params)
+        result = []
+        for i in rows:
+            row = _project(i, params.get("output", "extend"))
+            if params.get("selectHosts"):
+                row["hosts"] = [_project(fleet.host_by_id[i["hostid"]], params["selectHosts"])]
+            result.append(row)
+        return result
+
+    def _series_rows(self, params, step, value_fields):
+        time_from = int(params.get("time_from", self.fleet.now - 86400))
+        time_till = int(params.get("time_till", self.fleet.now))
+        rows = []
+        for itemid in _as_list(params.get("itemids")) or []:
+            clocks, values = self.fleet.series(itemid, time_from, time_till, step)
+            for clock, value in zip(clocks.tolist(), values.tolist()):
+                row = {"itemid": itemid, "clock": str(clock)}
+                for field in value_fields:
+                    row[field] = f"{value:.4f}"
+                rows.append(row)
+        return rows
+
+    def trend_get(self, params):
+        return self._series_rows(params, 3600, ("value_min", "value_avg", "value_max"))
+
+    def history_get(self, params):
+        rows = self._series_rows(params, 60, ("value",))
+        if params.get("sortorder") == "DESC":
+            rows.reverse()
+        return rows[:int(params["limit"])] if params.get("limit") else rows
+
+
+class FakeZabbixServer:
+    """ThreadingHTTPServer serving FakeZabbixAPI on /api_jsonrpc.php"""
+
+    def __init__(self, fleet, latency=0.0, port=0):
+        self.api = FakeZabbixAPI(fleet, latency)
+        api = self.api
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                try:
+                    body = {"jsonrpc": "2.0", "result": api.handle(request["method"], request.get("params")), "id": request.get("id")}
+                except Exception as e:
+                    body = {"jsonrpc": "2.0", "error": {"code": -32602, "message": "Invalid params.", "data": str(e)},
+                            "id": request.get("id")}
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
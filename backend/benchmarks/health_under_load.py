@@ -0,0 +1,95 @@
+"""
+Measure /health latency while many /api/chat requests are in flight.
+
+The Zabbix and LLM services are replaced by stubs that sleep, so no live
+Zabbix server or provider keys are needed. Run from the backend directory:
+
+    python -m benchmarks.health_under_load --chats 50 --llm-latency 2.0
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+import uvicorn
+
+from app.main import app
+from app.services.ai_service import ai_service
+from app.services.zabbix_service import zabbix_service
+
+
+def install_stubs(llm_latency, zabbix_latency):
+    def fake_chat(message, context=None):
+        time.sleep(llm_latency)
+        return "stub reply"
+
+    def fake_zabbix_call():
+        time.sleep(zabbix_latency)
+        return []
+
+    ai_service.chat = fake_chat
+    zabbix_service.get_problems = fake_zabbix_call
+    zabbix_service.get_hosts = fake_zabbix_call
+
+
+def start_server(port):
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def sample_health(base_url, duration):
+    samples = []
+    session = requests.Session()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        session.get(f"{base_url}/health").raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<22} n={len(samples):<5} p50={statistics.median(samples):7.2f}ms "
+          f"p99={p99:7.2f}ms max={samples[-1]:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--zabbix-latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    install_stubs(args.llm_latency, args.zabbix_latency)
+    server = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    report("/health idle", sample_health(base_url, 1.0))
+
+    def send_chat():
+        requests.post(f"{base_url}/api/chat", json={"message": "status?"}, timeout=600)
+
+    chats = [threading.Thread(target=send_chat) for _ in range(args.chats)]
+    started = time.perf_counter()
+    for t in chats:
+        t.start()
+    report(f"/health {args.chats} chats", sample_health(base_url, args.llm_latency))
+    for t in chats:
+        t.join()
+    print(f"{args.chats} chats completed in {time.perf_counter() - started:.2f}s")
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
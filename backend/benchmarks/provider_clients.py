@@ -0,0 +1,67 @@
+"""
+Compare per-request provider client construction (cold) with the cached
+clients from LLMClientService (warm). No network calls are made: only the
+client setup that used to run on every chat is timed.
+
+    python -m benchmarks.provider_clients --iterations 50
+"""
+import argparse
+import statistics
+import time
+
+from app.services.llm_client_service import LLMClientService
+
+
+def measure(label, func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<18} mean={statistics.mean(samples):8.3f}ms p50={statistics.median(samples):8.3f}ms "
+          f"max={max(samples):8.3f}ms")
+
+
+def bench_bedrock(iterations):
+    try:
+        import boto3
+    except ImportError:
+        print("bedrock: boto3 not installed, skipped")
+        return
+
+    def cold():
+        boto3.client(service_name='bedrock-runtime', region_name="us-east-1",
+                     aws_access_key_id="AKIAFAKE", aws_secret_access_key="fake")
+
+    registry = LLMClientService()
+
+    def warm():
+        registry.get_bedrock("us-east-1", "AKIAFAKE", "fake")
+
+    measure("bedrock cold", cold, iterations)
+    measure("bedrock warm", warm, iterations)
+
+
+def bench_openai(iterations):
+    try:
+        from openai import OpenAI
+    except ImportError:
+        print("openai: openai not installed, skipped")
+        return
+
+    registry = LLMClientService()
+    measure("openai cold", lambda: OpenAI(api_key="sk-fake"), iterations)
+    measure("openai warm", lambda: registry.get_openai("sk-fake"), iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    bench_bedrock(args.iterations)
+    bench_openai(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
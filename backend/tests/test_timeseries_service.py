@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services import timeseries_service as module
+from app.services.timeseries_service import TimeseriesService
+
+
+def columns(rows, item_ids=("1",)):
+    """get_history_bulk() layout from (itemid, clock, value) rows"""
+    index_of = {item_id: i for i, item_id in enumerate(item_ids)}
+    return {
+        "itemids": list(item_ids),
+        "item_index": np.array([index_of[r[0]] for r in rows], dtype=np.int32),
+        "clock": np.array([r[1] for r in rows], dtype=np.int64),
+        "value": np.array([r[2] for r in rows], dtype=np.float64),
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("TIMESERIES_DIR", str(tmp_path))
+    monkeypatch.setenv("TIMESERIES_ENABLED", "True")
+    return TimeseriesService()
+
+
+def serve(monkeypatch, rows):
+    calls = []
+
+    def get_history_bulk(items, time_from, time_till=None):
+        calls.append((list(items), time_from))
+        item_ids = [str(i) for i in items]
+        return columns([r for r in rows if r[0] in item_ids and time_from <= r[1] <= time_till], item_ids)
+
+    monkeypatch.setattr(module.zabbix_service, "get_history_bulk", get_history_bulk)
+    return calls
+
+
+def test_failed_append_is_truncated_before_the_next_one(store, monkeypatch):
+    now = int(time.time())
+    rows = [("1", now - 300, 1.0), ("1", now - 200, 2.0)]
+    serve(monkeypatch, rows)
+    store.refresh(["1"])
+
+    # Fail after the clock segment was written but before the value segment
+    rows += [("1", now - 100, 3.0)]
+    original = store._append_segment
+
+    def failing(item_id, column, array, committed):
+        if column == "value":
+            raise OSError("disk full")
+        original(item_id, column, array, committed)
+
+    monkeypatch.setattr(store, "_append_segment", failing)
+    with pytest.raises(OSError):
+        store.refresh(["1"])
+    clock, value = store.read("1")
+    assert list(clock) == [now - 300, now - 200] and list(value) == [1.0, 2.0]
+
+    monkeypatch.setattr(store, "_append_segment", original)
+    rows += [("1", now - 50, 4.0)]
+    store.refresh(["1"])
+    clock, value = store.read("1")
+    assert list(clock) == [now - 300, now - 200, now - 100, now - 50]
+    assert list(value) == [1.0, 2.0, 3.0, 4.0]
+
+    # A fresh process sees the same committed rows
+    clock, value = TimeseriesService().read("1")
+    assert list(value) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_rows_in_the_last_stored_second_are_kept_once(store, monkeypatch):
+    now = int(time.time())
+    rows = [("1", now - 10, 1.0)]
+    serve(monkeypatch, rows)
+    store.refresh(["1"])
+    rows += [("1", now - 10, 5.0)]
+    store.refresh(["1"])
+    store.refresh(["1"])
+    assert list(store.read("1")[1]) == [1.0, 5.0]
+
+
+def test_silent_items_do_not_widen_the_incremental_fetch(store, monkeypatch):
+    now = int(time.time())
+    calls = serve(monkeypatch, [("1", now - 10, 1.0)])
+    store.refresh(["1", "2"])
+    calls.clear()
+    store.refresh(["1", "2"])
+    # Item 2 never reported; both are fetched together from the recent window only
+    assert len(calls) == 1
+    assert calls[0][1] >= now - store.late_seconds - 5
+
+
+def test_reconcile_recovers_rows_written_after_the_late_window(store, monkeypatch):
+    now = int(time.time())
+    rows = [("1", now - 7200, 1.0), ("1", now - 60, 4.0), ("2", now - 7200, 1.0)]
+    serve(monkeypatch, rows)
+    store.refresh(["1", "2"])
+    # Rows older than the fetch windows arrive: one behind item 1's last row, one after silent item 2's
+    rows += [("1", now - 3600, 2.0), ("2", now - 3000, 3.0)]
+    store.refresh(["1", "2"])
+    assert list(store.read("1")[1]) == [1.0, 4.0] and list(store.read("2")[1]) == [1.0]
+
+    assert store.reconcile(["1", "2"]) == 2
+    assert list(store.read("1")[0]) == [now - 7200, now - 3600, now - 60]
+    assert list(store.read("1")[1]) == [1.0, 2.0, 4.0]
+    assert list(store.read("2")[1]) == [1.0, 3.0]
+    assert store.reconcile(["1", "2"]) == 0
+
+    # Later refreshes continue from the rewritten tail
+    rows += [("1", now - 5, 5.0)]
+    store.refresh(["1"])
+    assert list(TimeseriesService().read("1")[1]) == [1.0, 2.0, 4.0, 5.0]
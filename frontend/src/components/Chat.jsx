@@ -28,6 +28,12 @@ export default function Chat({ contextMessage, onMessageSent }) {
         const initial = [{ role: 'assistant', content: 'Chat history cleared.' }];
         setMessages(initial);
         localStorage.setItem('zabbix_ai_chat_history', JSON.stringify(initial));
+        // Start a new server-side session as well
+        const sessionId = localStorage.getItem('zabbix_ai_chat_session');
+        if (sessionId) {
+            localStorage.removeItem('zabbix_ai_chat_session');
+            fetch(`${API_URL}/chat/sessions/${sessionId}`, { method: 'DELETE' }).catch(() => {});
+        }
     }
 
     // Handle context messages from parent
@@ -54,20 +60,61 @@ export default function Chat({ contextMessage, onMessageSent }) {
         setLoading(true);
 
         try {
-            const res = await fetch(`${API_URL}/chat`, {
+            const res = await fetch(`${API_URL}/chat/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: userMsg.content })
+                body: JSON.stringify({
+                    message: userMsg.content,
+                    session_id: localStorage.getItem('zabbix_ai_chat_session') || undefined
+                })
             })
-            const data = await res.json()
+            if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
 
-            // Handle potential multiple messages or complex responses
-            let responseContent = data.reply;
-            if (typeof data.reply === 'object') {
-                responseContent = JSON.stringify(data.reply);
-            }
+            // Append an empty assistant message and grow it as events arrive
+            let started = false;
+            const updateAssistant = (update) => {
+                if (!started) {
+                    started = true;
+                    setLoading(false);
+                    setMessages(prev => [...prev, update({ role: 'assistant', content: '', tools: [] })]);
+                    return;
+                }
+                setMessages(prev => [...prev.slice(0, -1), update(prev[prev.length - 1])]);
+            };
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
 
-            setMessages(prev => [...prev, { role: 'assistant', content: responseContent }])
+                // SSE events are separated by a blank line
+                const chunks = buffer.split('\n\n');
+                buffer = chunks.pop();
+                for (const chunk of chunks) {
+                    const dataLine = chunk.split('\n').find(line => line.startsWith('data: '));
+                    if (!dataLine) continue;
+                    const event = JSON.parse(dataLine.slice(6));
+
+                    if (event.type === 'token') {
+                        updateAssistant(msg => ({ ...msg, content: msg.content + event.text }));
+                    } else if (event.type === 'tool_start') {
+                        updateAssistant(msg => ({ ...msg, tools: [...msg.tools, { name: event.name, status: 'running' }] }));
+                    } else if (event.type === 'tool_result') {
+                        updateAssistant(msg => ({
+                            ...msg,
+                            tools: msg.tools.map(t => t.name === event.name && t.status === 'running'
+                                ? { ...t, status: event.ok ? 'ok' : 'error' } : t)
+                        }));
+                    } else if (event.type === 'done' && event.session_id) {
+                        localStorage.setItem('zabbix_ai_chat_session', event.session_id);
+                    } else if (event.type === 'error') {
+                        updateAssistant(msg => ({ ...msg, content: msg.content + (msg.content ? '\n\n' : '') + event.message }));
+                    }
+                }
+            }
         } catch (err) {
             setMessages(prev => [...prev, { role: 'assistant', content: "Error connecting to AI service. Please check backend connection." }])
         }
@@ -87,7 +134,14 @@ export default function Chat({ contextMessage, onMessageSent }) {
                         <div className="message-avatar">{msg.role === 'assistant' ? '🤖' : '👤'}</div>
                         <div className="message-bubble">
                             {msg.role === 'assistant' ? (
-                                <ReactMarkdown className="markdown-content">{msg.content}</ReactMarkdown>
+                                <>
+                                    {msg.tools?.map((tool, i) => (
+                                        <div key={i} className="tool-progress">
+                                            {tool.status === 'running' ? '⏳' : tool.status === 'ok' ? '✅' : '⚠️'} {tool.name}
+                                        </div>
+                                    ))}
+                                    <ReactMarkdown className="markdown-content">{msg.content}</ReactMarkdown>
+                                </>
                             ) : (
                                 msg.content
                             )}
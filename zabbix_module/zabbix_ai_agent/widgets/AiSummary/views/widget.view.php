@@ -16,7 +16,7 @@ if (isset($summary['error'])): ?>
                 <?= htmlspecialchars($summary['title'] ?? 'Resumen Diario de IA') ?>
             </h3>
             <p style="margin: 4px 0 0 32px; font-size: 12px; color: #6b7280;">
-                Generado: <?= date('d/m/Y H:i') ?>
+                Generado: <?= date('d/m/Y H:i', (int) ($summary['generated_at'] ?? time())) ?>
             </p>
         </div>
 